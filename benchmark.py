@@ -0,0 +1,411 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the hot paths of the calculator and the updaters.
+
+Everything runs offline on synthetic data:
+  - eLicznik CSV exports from one month to several years, single or multi-meter,
+  - a local stand-in for api.raporty.pse.pl serving paged `nextLink` responses
+    with ETags and configurable per-request latency,
+  - large archived RCEm HTML pages.
+
+Each benchmark reports wall time, throughput and peak Python memory (tracemalloc);
+the CLI start-up benchmarks run in a fresh interpreter and report its peak RSS instead:
+
+    python benchmark.py                  # default sizes
+    python benchmark.py --quick          # small sizes, for a smoke run
+    python benchmark.py --json results.jsonl --latency 0.05
+"""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import functools
+import hashlib
+import json
+import math
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, quote, urlsplit
+
+import http_client
+import update_rce
+import update_rcem
+
+PAGE_SIZE = 500  # items per API page served by the stand-in
+MONTH_NAMES = ['styczeń', 'luty', 'marzec', 'kwiecień', 'maj', 'czerwiec', 'lipiec', 'sierpień',
+               'wrzesień', 'październik', 'listopad', 'grudzień']
+
+
+# --- synthetic data --------------------------------------------------------
+
+def synthetic_price(dt: datetime) -> float:
+    """Deterministic zł/MWh price with a daily shape and some negative midday hours."""
+    hour = dt.hour + dt.minute / 60
+    return round(350 + 250 * math.sin((hour - 6) / 24 * 2 * math.pi) - 400 * (12 <= hour < 14) * (dt.day % 5 == 0), 2)
+
+
+def write_elicznik_csv(path: Path, start: date, days: int, step_minutes: int = 60, seed: int = 0) -> int:
+    """Write an eLicznik-style export (end-of-interval labels, '24:00' for midnight); returns rows."""
+    step = timedelta(minutes=step_minutes)
+    t = datetime.combine(start, datetime.min.time())
+    end = t + timedelta(days=days)
+    lines = ['Data; Wartość kWh;Rodzaj']
+    i = seed
+    while t < end:
+        t += step
+        label = f'{t - timedelta(days=1):%Y-%m-%d} 24:00' if t.hour == 0 and t.minute == 0 else f'{t:%Y-%m-%d %H:%M}'
+        kwh = max(0.0, math.sin((t.hour - 6) / 12 * math.pi)) * (1 + (i % 7) / 10) * step_minutes / 60
+        lines.append(f"{label};{kwh:.3f}".replace('.', ',') + ';oddanie')
+        i += 1
+    path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+    return len(lines) - 1
+
+
+def write_meter_set(directory: Path, meters: int, start: date, days: int, step_minutes: int = 60) -> list:
+    """Write one CSV per meter (multi-meter input); returns the file paths."""
+    directory.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for m in range(meters):
+        path = directory / f'licznik_{m:04d}.csv'
+        write_elicznik_csv(path, start, days, step_minutes, seed=m)
+        paths.append(path)
+    return paths
+
+
+def rcem_archive_html(years: int, first_year: int = 2010, corrections: int = 2) -> str:
+    """Build an RCEm page with one table per year and several corrections per month."""
+    tables = []
+    for y in range(first_year, first_year + years):
+        rows = [f'<tr><th>{y}</th><th>zł/MWh</th><th>data publikacji</th></tr>']
+        for m, name in enumerate(MONTH_NAMES, start=1):
+            published = date(y, m, 1) + timedelta(days=40)
+            rows.append(f'<tr><td>{name}</td><td></td><td></td></tr>')
+            rows.append(f'<tr><td>RCEm</td><td>{300 + m + y % 10},{m:02d}</td><td>{published:%d.%m.%Y}</td></tr>')
+            for c in range(corrections):
+                fixed = published + timedelta(days=30 * (c + 1))
+                rows.append(f'<tr><td>skorygowana RCEm*</td><td>{299 + m + c},50</td><td>{fixed:%d.%m.%Y}</td></tr>')
+        tables.append('<table>' + ''.join(rows) + '</table>')
+    return '<html><body>' + '\n'.join(tables) + '</body></html>'
+
+
+# --- local PSE API stand-in -------------------------------------------------
+
+_FILTER_RE = re.compile(r"business_date ge '(\d{4}-\d{2}-\d{2})' and business_date lt '(\d{4}-\d{2}-\d{2})'")
+
+
+@functools.lru_cache(maxsize=64)
+def api_items(start: date, end: date) -> list:
+    """Items shaped like /api/rce-pln `value` entries for business days [start, end).
+
+    Cached so that paging through a range does not regenerate it for every page.
+    """
+    items = []
+    day = start
+    while day < end:
+        t = datetime.combine(day, datetime.min.time())
+        for _ in range(96):
+            t += timedelta(minutes=15)
+            items.append({'dtime': f'{t:%Y-%m-%d %H:%M:%S}', 'business_date': day.isoformat(),
+                          'period': f'{t - timedelta(minutes=15):%H:%M} - {t:%H:%M}',
+                          'rce_pln': synthetic_price(t)})
+        day += timedelta(days=1)
+    return items
+
+
+class FakePseServer:
+    """Threaded HTTP server answering OData range queries with paged `nextLink` responses."""
+
+    def __init__(self, latency: float = 0.0, page_size: int = PAGE_SIZE):
+        self.latency = latency
+        self.page_size = page_size
+        self.requests = 0
+        self.not_modified = 0
+        self.bytes = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.requests += 1
+                if server.latency:
+                    time.sleep(server.latency)
+                query = parse_qs(urlsplit(self.path).query)
+                m = _FILTER_RE.search(query.get('$filter', [''])[0])
+                if not m:
+                    self.send_error(400, 'unsupported $filter')
+                    return
+                skip = int(query.get('$skip', ['0'])[0])
+                items = api_items(date.fromisoformat(m.group(1)), date.fromisoformat(m.group(2)))
+                body = {'value': items[skip:skip + server.page_size]}
+                if skip + server.page_size < len(items):
+                    body['nextLink'] = (f'{server.base}?$filter={quote(m.group(0))}'
+                                        f'&$skip={skip + server.page_size}')
+                raw = json.dumps(body).encode()
+                etag = '"%s"' % hashlib.sha1(raw).hexdigest()[:16]
+                if self.headers.get('If-None-Match') == etag:
+                    server.not_modified += 1
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.end_headers()
+                    return
+                server.bytes += len(raw)
+                self.send_response(200)
+                self.send_header('ETag', etag)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(raw)))
+                self.end_headers()
+                self.wfile.write(raw)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.base = f'http://127.0.0.1:{self.httpd.server_address[1]}/api/rce-pln'
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@contextlib.contextmanager
+def patched(obj, **attrs):
+    """Temporarily replace module attributes (file locations, API base URL)."""
+    old = {k: getattr(obj, k) for k in attrs}
+    for k, v in attrs.items():
+        setattr(obj, k, v)
+    try:
+        yield
+    finally:
+        for k, v in old.items():
+            setattr(obj, k, v)
+
+
+def rce_paths(directory: Path) -> dict:
+    """update_rce output locations redirected into `directory`."""
+    return {
+        'OUT_FILE': directory / 'rce.json',
+        'BIN_FILE': directory / 'rce.bin',
+        'JOURNAL_FILE': directory / 'rce_journal.jsonl',
+        'LEVEL_FILES': {k: (directory / p.name, slot) for k, (p, slot) in update_rce.LEVEL_FILES.items()},
+        'MONTHLY_FILE': directory / 'rce_monthly.json',
+        'CHANGES_FILE': directory / 'rce_changes.txt',
+        'SHARD_DIR': directory / 'rce',
+        'NEGATIVE_FILE': directory / 'rce_negative.json',
+    }
+
+
+# --- measurement -------------------------------------------------------------
+
+def measure(name: str, fn, items: int, unit: str = 'rows', repeat: int = 1, setup=None) -> dict:
+    """Run `fn`; report best untraced wall time of `repeat` runs, throughput and peak traced memory.
+
+    Peak memory comes from one extra run under tracemalloc, which slows allocation-heavy
+    code too much to be used for timing. `setup`, if given, runs untimed before every run.
+    """
+    print(f'  {name} ...', file=sys.stderr, flush=True)
+    best = float('inf')
+    for _ in range(repeat):
+        if setup:
+            setup()
+        t = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t)
+    if setup:
+        setup()
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {'benchmark': name, 'items': items, 'unit': unit, 'seconds': round(best, 4),
+            'throughput': round(items / best) if best > 0 else None, 'peak_mb': round(peak / 2 ** 20, 2)}
+
+
+def measure_process(name: str, code: str, repeat: int = 3) -> dict:
+    """Run `code` in a fresh interpreter; report best wall time of `repeat` runs and peak RSS of the child.
+
+    Peak RSS is read from /proc and reported as 0 where that is not available.
+    """
+    print(f'  {name} ...', file=sys.stderr, flush=True)
+    # VmHWM, not ru_maxrss: on Linux ru_maxrss survives exec and would report this process
+    code += ("\nprint(next((l.split()[1] for l in open('/proc/self/status') if l.startswith('VmHWM')), 0)"
+             " if __import__('os').path.exists('/proc/self/status') else 0)")
+    best, rss_kb = float('inf'), 0
+    for _ in range(repeat):
+        t = time.perf_counter()
+        out = subprocess.run([sys.executable, '-c', code], cwd=Path(__file__).resolve().parent,
+                             capture_output=True, text=True, check=True).stdout
+        best = min(best, time.perf_counter() - t)
+        rss_kb = max(rss_kb, int(out.split()[-1]))
+    return {'benchmark': name, 'items': 1, 'unit': 'runs', 'seconds': round(best, 4),
+            'throughput': round(1 / best) if best > 0 else None, 'peak_mb': round(rss_kb / 1024, 2)}
+
+
+def run(quick: bool = False, latency: float = 0.0) -> list:
+    import kalkulator_depozytu as kd
+    from magazyn_cen import MagazynCen
+
+    sizes = {'1 month': 31, '1 year': 366} if quick else {'1 month': 31, '1 year': 366, '3 years': 3 * 366}
+    start = date(2024, 1, 1)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp, FakePseServer(latency=latency) as server, \
+            patched(update_rce, API_BASE=server.base), patched(http_client, CACHE_DIR=Path(tmp) / 'http'):
+        tmp = Path(tmp)
+
+        def no_http_cache():
+            shutil.rmtree(http_client.CACHE_DIR, ignore_errors=True)
+
+        # CSV ingestion
+        for label, days in sizes.items():
+            path = tmp / f'elicznik_{days}.csv'
+            rows = write_elicznik_csv(path, start, days, step_minutes=15)
+            for tryb in ('szybki', 'klasyczny'):
+                results.append(measure(f'wczytaj_dane_uzytkownika[{tryb}, 15 min, {label}]',
+                                       lambda: kd.wczytaj_dane_uzytkownika(str(path), tryb), rows, repeat=3))
+
+        # price fetch: cold (API stand-in) and warm (in-memory store)
+        days = list(sizes.values())[-1]
+        end = start + timedelta(days=days - 1)
+        stores = []
+
+        def cold_store():
+            no_http_cache()
+            (tmp / 'cache.json').unlink(missing_ok=True)
+            stores[:] = [MagazynCen(tmp / 'brak_rce.json', tmp / 'cache.json', tmp / 'journal.jsonl')]
+
+        results.append(measure(f'pobierz_ceny_rynkowe[cold, {days} days]',
+                               lambda: kd.pobierz_ceny_rynkowe(start, end, stores[0]), days * 96, 'price slots',
+                               setup=cold_store))
+        magazyn = stores[0]
+        results.append(measure(f'pobierz_ceny_rynkowe[warm, {days} days]',
+                               lambda: kd.pobierz_ceny_rynkowe(start, end, magazyn), days * 96, 'price slots',
+                               repeat=3))
+
+        # deposit computation, single meter and a multi-meter long frame
+        df_energia = kd.wczytaj_dane_uzytkownika(str(tmp / f'elicznik_{days}.csv'))
+        df_ceny = kd.pobierz_ceny_rynkowe(start, end, magazyn, '15min')
+        results.append(measure(f'oblicz_wartosc_depozytu[15 min, {days} days]',
+                               lambda: kd.oblicz_wartosc_depozytu(df_energia, df_ceny), len(df_energia), repeat=3))
+        results.append(measure(f'oblicz_depozyt_strumieniowo[15 min, {days} days, read + compute]',
+                               lambda: kd.oblicz_depozyt_strumieniowo(str(tmp / f'elicznik_{days}.csv'), df_ceny,
+                                                                      wierszy=20_000),
+                               len(df_energia), repeat=3))
+        meters = 20 if quick else 200
+        files = write_meter_set(tmp / 'meters', meters, start, 31)
+        df_long = kd.wczytaj_wiele_licznikow([str(f) for f in files])
+        df_ceny_h = kd.pobierz_ceny_rynkowe(start, start + timedelta(days=31), magazyn)
+        results.append(measure(f'oblicz_wartosc_depozytu[{meters} meters, loop]',
+                               lambda: [kd.oblicz_wartosc_depozytu(g, df_ceny_h)
+                                        for _, g in df_long.groupby('meter_id', observed=True)],
+                               len(df_long), repeat=3))
+        results.append(measure(f'oblicz_depozyty_wielu[{meters} meters]',
+                               lambda: kd.oblicz_depozyty_wielu(df_long, df_ceny_h), len(df_long), repeat=3))
+
+        # update_rce.main backfill against the stand-in
+        out = tmp / 'update_rce'
+
+        def empty_output():
+            no_http_cache()
+            shutil.rmtree(out, ignore_errors=True)
+            out.mkdir()
+
+        backfill_end = update_rce.DEFAULT_START + timedelta(days=days)
+        before = server.requests
+        with patched(update_rce, **rce_paths(out)), contextlib.redirect_stdout(None):
+            results.append(measure(f'update_rce.main[backfill {days} days]',
+                                   lambda: update_rce.main(update_rce.DEFAULT_START, backfill_end, rate=1000.0),
+                                   days * 96, 'price slots', setup=empty_output))
+        results[-1]['http_requests_per_run'] = (server.requests - before) // 2
+
+        # ingestion of a fetched range into an existing series (columns, bulk key parsing, sorted merge)
+        fresh = api_items(start + timedelta(days=days), start + timedelta(days=2 * days))
+        keys, prices, _ = update_rce.items_to_columns(api_items(start, start + timedelta(days=days)))
+        history = update_rce.first_wins(keys, prices)
+        series = {}
+
+        def fresh_series():
+            series['data'] = dict(history)
+
+        def ingest():
+            keys, prices, _ = update_rce.items_to_columns(fresh)
+            update_rce.merge_sorted(series['data'], update_rce.first_wins(keys, prices))
+
+        results.append(measure(f'update_rce ingest[{days} days into {days} days]', ingest, len(fresh), 'items',
+                               repeat=3, setup=fresh_series))
+
+        # re-fetching an unchanged range: full downloads vs ETag revalidation (304 from the cache)
+        fetch_end = start + timedelta(days=31)
+        for label, setup in (('cold', no_http_cache), ('revalidated', None)):
+            before_bytes, before_304 = server.bytes, server.not_modified
+            results.append(measure(f'update_rce.fetch_range[{label}, 31 days]',
+                                   lambda: update_rce.fetch_range(start, fetch_end), 31 * 96, 'price slots',
+                                   repeat=3, setup=setup))
+            results[-1]['mb_served_per_run'] = round((server.bytes - before_bytes) / 4 / 2 ** 20, 3)
+            results[-1]['not_modified_per_run'] = (server.not_modified - before_304) // 4
+
+        # CLI start-up: bare import, one small file on the stdlib path and on the pandas path,
+        # priced from the level files the backfill above left in `out`
+        small = tmp / 'maly.csv'
+        write_elicznik_csv(small, update_rce.DEFAULT_START, 31, step_minutes=15)
+        results.append(measure_process('import kalkulator_depozytu', 'import kalkulator_depozytu'))
+        results.append(measure_process(
+            'kalkulator_depozytu[1 small file, light path]',
+            'import kalkulator_depozytu as kd\nfrom lazy_imports import loaded\n'
+            f'assert kd.oblicz_lekko([{str(small)!r}], katalog_cen={str(out)!r})\n'
+            "assert not loaded('pandas')"))
+        results.append(measure_process(
+            'kalkulator_depozytu[1 small file, pandas path]',
+            'import kalkulator_depozytu as kd\nfrom magazyn_cen import MagazynCen\n'
+            f'm = MagazynCen({str(out / "rce.json")!r}, {str(tmp / "cli_cache.json")!r}, '
+            f'{str(tmp / "cli_journal.jsonl")!r}, pobieraj=False)\n'
+            f'assert kd.przetworz_wsadowo([{str(small)!r}], procesy=1, magazyn=m)'))
+
+        # RCEm parsing of a large archived page
+        years = 5 if quick else 30
+        html = rcem_archive_html(years)
+        results.append(measure(f'update_rcem.parse_html[{years} years, {len(html) // 1024} KiB]',
+                               lambda: update_rcem.parse_html(html), years * 12, 'months', repeat=3))
+
+    http_client.close()
+    results.append({'benchmark': 'fake PSE server', 'http_requests': server.requests,
+                    'not_modified': server.not_modified,
+                    'mb_served': round(server.bytes / 2 ** 20, 2), 'latency_s': latency})
+    return results
+
+
+def print_table(results: list):
+    print(f"{'benchmark':60} {'seconds':>9} {'throughput':>16} {'peak MB':>8}")
+    for r in results:
+        if 'seconds' not in r:
+            print(f"{r['benchmark']:60} " + ', '.join(f'{k}={v}' for k, v in r.items() if k != 'benchmark'))
+            continue
+        tput = f"{r['throughput']:,} {r['unit']}/s" if r['throughput'] else '-'
+        print(f"{r['benchmark']:60} {r['seconds']:>9.4f} {tput:>16} {r['peak_mb']:>8.2f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Offline benchmarks for kalkulator_depozytu and the updaters.')
+    parser.add_argument('--quick', action='store_true', help='small sizes for a fast smoke run')
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds of latency per fake API request')
+    parser.add_argument('--json', help='also append results as JSON lines to this file')
+    args = parser.parse_args()
+    results = run(quick=args.quick, latency=args.latency)
+    print_table(results)
+    if args.json:
+        with open(args.json, 'a', encoding='utf-8') as fh:
+            stamp = datetime.now().isoformat(timespec='seconds')
+            for r in results:
+                fh.write(json.dumps({'run': stamp, **r}, ensure_ascii=False) + '\n')
+    sys.exit(0)
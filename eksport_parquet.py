@@ -0,0 +1,198 @@
+"""
+Eksport szczegółów rozliczenia i historii cen do Parquet, partycjonowany po miesiącach.
+
+Szczegóły to złączone z cenami wiersze plików eLicznika - to, co
+oblicz_wartosc_depozytu() sumuje i odrzuca:
+
+    szczegoly/rok=2025/miesiac=1/meter_id=licznik_a/part-0.parquet
+        DateTime, Energia_kWh, Cena_PLN_kWh, Wartosc_PLN
+
+Historia cen z `rce.json` (wraz z dziennikiem i pamięcią podręczną) ma postać:
+
+    ceny/rok=2025/miesiac=1/part-0.parquet
+        DateTimeUTC, DateTime, Cena_PLN_kWh, Cena_surowa_PLN_kWh
+
+Partycje są w układzie Hive, więc np. `pyarrow.dataset.dataset(katalog, partitioning='hive')`,
+DuckDB czy Spark czytają tylko potrzebne miesiące, liczniki i kolumny. Miesiąc to
+miesiąc rozliczeniowy (interwał kończący się o północy 1. dnia należy do miesiąca
+poprzedniego), DateTime to lokalny koniec interwału jak w danych eLicznika.
+Pliki CSV są czytane porcjami (jak przy `--porcje`), a każda porcja trafia do
+otwartych plików partycji jako kolejne grupy wierszy, więc pamięć nie zależy od
+długości pliku. Ponowny eksport licznika zastępuje wszystkie jego partycje.
+
+Wymaga pakietu pyarrow.
+"""
+import argparse
+import os
+import shutil
+from glob import glob
+
+import numpy as np
+import pandas as pd
+
+import kalkulator_depozytu as kd
+from magazyn_cen import MagazynCen, domyslny_magazyn
+
+KATALOG_SZCZEGOLOW = 'szczegoly'
+KATALOG_CEN = 'ceny'
+NAZWA_CZESCI = 'part-0.parquet'
+KOMPRESJA = 'zstd'
+
+
+def _pyarrow():
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    return pa, pq
+
+
+def _miesiace_rozliczeniowe(daty):
+    """Numery miesięcy rozliczeniowych (datetime64[M] jako int) dla tablicy datetime64[ns] końców interwałów."""
+    return (daty - np.timedelta64(1, 's')).astype('datetime64[M]').astype(np.int64)
+
+
+class _ZapisPartycji:
+    """Otwarte pliki Parquet partycji; każda porcja jest dopisywana jako nowa grupa wierszy."""
+
+    def __init__(self, katalog, schemat):
+        self.katalog = katalog
+        self.schemat = schemat
+        self.pliki = {}
+        self.wierszy = 0
+
+    def zapisz(self, partycja, tabela):
+        _, pq = _pyarrow()
+        plik = self.pliki.get(partycja)
+        if plik is None:
+            sciezka = os.path.join(self.katalog, *(f'{k}={v}' for k, v in partycja), NAZWA_CZESCI)
+            os.makedirs(os.path.dirname(sciezka), exist_ok=True)
+            plik = self.pliki[partycja] = pq.ParquetWriter(sciezka, self.schemat, compression=KOMPRESJA)
+        plik.write_table(tabela)
+        self.wierszy += tabela.num_rows
+
+    def zapisz_miesiacami(self, df, daty, klucze=()):
+        """Dzieli ramkę według miesiąca rozliczeniowego `daty` i dopisuje części do partycji."""
+        pa, _ = _pyarrow()
+        numery = _miesiace_rozliczeniowe(daty)
+        for numer in np.unique(numery).tolist():
+            tabela = pa.Table.from_pandas(df[numery == numer], schema=self.schemat, preserve_index=False)
+            self.zapisz((('rok', numer // 12 + 1970), ('miesiac', numer % 12 + 1), *klucze), tabela)
+
+    def zamknij(self):
+        for plik in self.pliki.values():
+            plik.close()
+        self.pliki = {}
+
+
+def _glob_doslownie(tekst):
+    return tekst.replace('[', '[[]').replace('*', '[*]').replace('?', '[?]')
+
+
+def identyfikator_licznika(nazwa_pliku):
+    """meter_id licznika: nazwa pliku bez rozszerzenia (jak w wczytaj_wiele_licznikow)."""
+    return os.path.splitext(os.path.basename(nazwa_pliku))[0]
+
+
+def eksportuj_szczegoly(pliki_csv, katalog, magazyn=None, wierszy=kd.WIERSZY_W_PORCJI):
+    """Zapisuje złączone z cenami wiersze plików do `katalog/szczegoly` (rok/miesiąc/licznik).
+
+    Zapisywane są wszystkie wiersze z poprawną datą; Cena_PLN_kWh i Wartosc_PLN są
+    puste, gdy brak ceny. Cena ma poziom rozdzielczości danych (jak w kalkulatorze).
+    Zwraca {meter_id: liczba wierszy}; pliki, których nie da się wczytać, są pomijane.
+    """
+    pa, _ = _pyarrow()
+    if magazyn is None:
+        magazyn = domyslny_magazyn()
+    schemat = pa.schema([('DateTime', pa.timestamp('ns')), ('Energia_kWh', pa.float64()),
+                         ('Cena_PLN_kWh', pa.float64()), ('Wartosc_PLN', pa.float64())])
+    katalog_szczegolow = os.path.join(katalog, KATALOG_SZCZEGOLOW)
+    wynik = {}
+    for nazwa_pliku in pliki_csv:
+        licznik = identyfikator_licznika(nazwa_pliku)
+        for stara in glob(os.path.join(_glob_doslownie(katalog_szczegolow), 'rok=*', 'miesiac=*',
+                                       f'meter_id={_glob_doslownie(licznik)}')):
+            shutil.rmtree(stara)
+        zapis = _ZapisPartycji(katalog_szczegolow, schemat)
+        try:
+            for porcja, daty, ceny, _ in kd.porcje_z_cenami(nazwa_pliku, magazyn=magazyn, wierszy=wierszy):
+                energia = porcja['Energia_kWh'].to_numpy(dtype=np.float64)
+                df = pd.DataFrame({'DateTime': daty, 'Energia_kWh': energia,
+                                   'Cena_PLN_kWh': ceny, 'Wartosc_PLN': energia * ceny})
+                zapis.zapisz_miesiacami(df, daty, (('meter_id', licznik),))
+        except FileNotFoundError:
+            print(f"❌ BŁĄD: Nie znaleziono pliku '{nazwa_pliku}'.")
+            continue
+        except Exception as e:
+            print(f"❌ BŁĄD: Wystąpił nieoczekiwany problem podczas eksportu pliku '{nazwa_pliku}': {e}")
+            continue
+        finally:
+            zapis.zamknij()
+        wynik[licznik] = zapis.wierszy
+    return wynik
+
+
+def eksportuj_ceny(katalog, magazyn=None):
+    """Zapisuje całą lokalną historię cen 15-minutowych do `katalog/ceny` (rok/miesiąc).
+
+    DateTimeUTC rozróżnia oba przejścia powtórzonej godziny; Cena_surowa_PLN_kWh
+    to cena bez obcięcia ujemnych (z rce_negative.json). API PSE nie jest pytane.
+    Zwraca liczbę zapisanych wierszy.
+    """
+    pa, _ = _pyarrow()
+    if magazyn is None:
+        magazyn = MagazynCen(pobieraj=False)
+    katalog_cen = os.path.join(katalog, KATALOG_CEN)
+    if os.path.isdir(katalog_cen):
+        shutil.rmtree(katalog_cen)
+    zakres = magazyn.zakres_dob()
+    if zakres is None:
+        return 0
+    df = magazyn.ceny_utc(*zakres)
+    surowe = magazyn.ceny_utc(*zakres, obciete=False)
+    lokalne = pd.DatetimeIndex(df['DateTimeUTC']).tz_convert(kd.STREFA).tz_localize(None)
+    df = pd.DataFrame({
+        'DateTimeUTC': df['DateTimeUTC'],
+        'DateTime': lokalne,
+        'Cena_PLN_kWh': df['Cena_PLN_kWh'].to_numpy(dtype=np.float64),
+        'Cena_surowa_PLN_kWh': surowe['Cena_PLN_kWh'].to_numpy(dtype=np.float64),
+    })
+    schemat = pa.schema([('DateTimeUTC', pa.timestamp('ns', tz='UTC')), ('DateTime', pa.timestamp('ns')),
+                         ('Cena_PLN_kWh', pa.float64()), ('Cena_surowa_PLN_kWh', pa.float64())])
+    zapis = _ZapisPartycji(katalog_cen, schemat)
+    try:
+        zapis.zapisz_miesiacami(df, lokalne.to_numpy(dtype='datetime64[ns]'))
+    finally:
+        zapis.zamknij()
+    return zapis.wierszy
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Eksport szczegółów rozliczenia i historii cen RCE do Parquet.')
+    parser.add_argument('katalog', help='katalog docelowy (podkatalogi szczegoly/ i ceny/)')
+    parser.add_argument('wejscie', nargs='?',
+                        help='katalog z plikami CSV lub wzorzec glob (bez niego eksportowane są tylko ceny)')
+    parser.add_argument('--ceny', action='store_true', help='eksportuj też historię cen z rce.json')
+    parser.add_argument('--porcje', type=int, default=kd.WIERSZY_W_PORCJI, metavar='WIERSZE',
+                        help=f'liczba wierszy CSV w jednej porcji (domyślnie: {kd.WIERSZY_W_PORCJI})')
+    args = parser.parse_args(argv)
+    try:
+        _pyarrow()
+    except ImportError:
+        print("❌ BŁĄD: Eksport do Parquet wymaga pakietu pyarrow (pip install pyarrow).")
+        return 1
+
+    if args.wejscie:
+        pliki_csv = kd.znajdz_pliki(args.wejscie)
+        if not pliki_csv:
+            print("Nie znaleziono żadnych plików CSV.")
+        wiersze = eksportuj_szczegoly(pliki_csv, args.katalog, wierszy=args.porcje)
+        for licznik, liczba in wiersze.items():
+            print(f" {licznik}: {liczba} wierszy")
+        print(f"Szczegóły {len(wiersze)} liczników zapisano w {os.path.join(args.katalog, KATALOG_SZCZEGOLOW)}.")
+    if args.ceny or not args.wejscie:
+        liczba = eksportuj_ceny(args.katalog)
+        print(f"Historię cen ({liczba} wierszy) zapisano w {os.path.join(args.katalog, KATALOG_CEN)}.")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
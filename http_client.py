@@ -0,0 +1,225 @@
+"""
+Shared HTTP client for the PSE fetchers.
+
+Every request to PSE goes through `get()`. That covers update_rce.fetch_range(),
+which MagazynCen also uses for missing days, and update_rcem.scrape().
+
+- Connections: one keep-alive `requests.Session` per process (`shared_session()`), with a
+  pool large enough for the concurrent backfill workers.
+- Caching: `.cache/http/` keeps every 200 response that carries an ETag or
+  Last-Modified, together with those validators. The next request for the same URL
+  sends If-None-Match / If-Modified-Since. A 304 answer is served from the stored
+  body, so unchanged data is not downloaded again. Responses without validators
+  are not stored. A stored body is never used without asking the server first.
+  The cache keeps the MAX_CACHE_ENTRIES most recently used URLs; older entries
+  are pruned whenever a new one is stored.
+- Timeouts and retries: one (connect, read) timeout for all calls. Connection
+  errors, timeouts, 429 and 5xx are retried with exponential backoff, honouring
+  a numeric Retry-After up to MAX_RETRY_DELAY. Callers with their own retry loop
+  pass `retries=0`.
+- Metrics: one `http` event per request with url, status, seconds, bytes on the
+  wire, cache outcome ('miss', 'stored', 'revalidated') and attempt.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+import metrics
+from lazy_imports import lazy_import
+
+requests = lazy_import('requests')
+
+CACHE_DIR = Path(__file__).parent / '.cache' / 'http'
+TIMEOUT = (10, 30)  # seconds: connect, read
+RETRIES = 3
+BACKOFF = 1.0  # seconds, doubled after every failed attempt
+MAX_RETRY_DELAY = 60.0  # seconds; caps Retry-After so a bad header cannot stall a scheduled run
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+MAX_CACHE_ENTRIES = 2000  # URLs kept in CACHE_DIR, least recently used pruned first
+POOL_SIZE = 8  # keep-alive connections per host, at least the backfill worker count
+USER_AGENT = 'rce-updater/1.0 (+https://github.com)'
+
+_lock = threading.Lock()
+_session = None
+_session_pid = None
+
+
+def new_session(pool_size: int = POOL_SIZE, headers: dict | None = None) -> requests.Session:
+    """Session with a keep-alive connection pool of `pool_size` connections per host."""
+    from requests.adapters import HTTPAdapter
+
+    s = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(pool_size, 1))
+    s.mount('https://', adapter)
+    s.mount('http://', adapter)
+    s.headers['User-Agent'] = USER_AGENT
+    s.headers.update(headers or {})
+    return s
+
+
+def shared_session() -> requests.Session:
+    """The process-wide session (created on first use, and again in a forked child)."""
+    global _session, _session_pid
+    with _lock:
+        if _session is None or _session_pid != os.getpid():
+            _session, _session_pid = new_session(), os.getpid()
+        return _session
+
+
+def close():
+    """Close the process-wide session and its connections."""
+    global _session
+    with _lock:
+        if _session is not None and _session_pid == os.getpid():
+            _session.close()
+        _session = None
+
+
+class ResponseCache:
+    """Response bodies with their validators, one `<sha256 of url>.json` + `.body` pair per URL.
+
+    At most `max_entries` pairs are kept; the meta file's mtime marks the last use.
+    """
+
+    def __init__(self, directory: Path, max_entries: int = MAX_CACHE_ENTRIES):
+        self.directory = Path(directory)
+        self.max_entries = max_entries
+
+    def _paths(self, url: str) -> tuple[Path, Path]:
+        key = hashlib.sha256(url.encode()).hexdigest()[:32]
+        return self.directory / f'{key}.json', self.directory / f'{key}.body'
+
+    def lookup(self, url: str) -> dict | None:
+        """Stored entry {url, etag, last_modified, content_type} for `url`, or None."""
+        meta_path, body_path = self._paths(url)
+        try:
+            entry = json.loads(meta_path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return None
+        if entry.get('url') != url or not body_path.exists():
+            return None
+        return entry
+
+    def body(self, url: str) -> bytes:
+        meta_path, body_path = self._paths(url)
+        try:
+            os.utime(meta_path)  # revalidated entries count as recently used
+        except OSError:
+            pass
+        return body_path.read_bytes()
+
+    def store(self, url: str, resp) -> bool:
+        """Store a 200 response if it carries a validator; returns True when stored."""
+        etag, last_modified = resp.headers.get('ETag'), resp.headers.get('Last-Modified')
+        if resp.status_code != 200 or not (etag or last_modified):
+            return False
+        meta_path, body_path = self._paths(url)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        suffix = f'.{os.getpid()}.{threading.get_ident()}.tmp'
+        # body first: a meta file always points at a complete body
+        for path, data in ((body_path, resp.content),
+                           (meta_path, json.dumps({'url': url, 'etag': etag, 'last_modified': last_modified,
+                                                   'content_type': resp.headers.get('Content-Type')}).encode())):
+            tmp = path.with_name(path.name + suffix)
+            tmp.write_bytes(data)
+            os.replace(tmp, path)
+        self.prune()
+        return True
+
+    def prune(self) -> int:
+        """Delete the least recently used entries beyond `max_entries`; returns how many."""
+        entries = []
+        for meta_path in self.directory.glob('*.json'):
+            try:
+                entries.append((meta_path.stat().st_mtime, meta_path))
+            except OSError:  # removed by a concurrent prune
+                pass
+        excess = len(entries) - self.max_entries
+        if excess <= 0:
+            return 0
+        entries.sort()
+        for _, meta_path in entries[:excess]:
+            # meta first: a lookup never finds a meta file without its body
+            meta_path.unlink(missing_ok=True)
+            meta_path.with_suffix('.body').unlink(missing_ok=True)
+        return excess
+
+
+def _from_cache(resp, cache: ResponseCache, url: str, entry: dict):
+    """Turn a 304 into the stored 200 response (headers of the 304 on top of the stored ones)."""
+    cached = requests.Response()
+    cached.status_code = 200
+    cached.url = url
+    cached.request = resp.request
+    cached.headers = requests.structures.CaseInsensitiveDict(
+        {k: v for k, v in (('ETag', entry['etag']), ('Last-Modified', entry['last_modified']),
+                           ('Content-Type', entry['content_type'])) if v})
+    cached.headers.update(resp.headers)
+    cached._content = cache.body(url)
+    cached.from_cache = True
+    return cached
+
+
+def _retry_delay(resp, attempt: int, backoff: float) -> float:
+    retry_after = resp.headers.get('Retry-After', '') if resp is not None else ''
+    if retry_after.isdigit():
+        return min(float(retry_after), MAX_RETRY_DELAY)
+    return min(backoff * 2 ** (attempt - 1), MAX_RETRY_DELAY)
+
+
+def get(url: str, headers: dict | None = None, *, session: requests.Session | None = None,
+        cache: bool = True, timeout=TIMEOUT, retries: int = RETRIES, backoff: float = BACKOFF,
+        **metric_fields):
+    """GET `url` with the shared session, conditional revalidation and retries.
+
+    Returns the response (`from_cache` is True when a 304 was answered from the
+    cache). The last error is raised once the retries are exhausted; a final 4xx/5xx
+    response is returned as is, so callers still decide via `raise_for_status()`.
+    Extra keyword arguments are added to the `http` metrics event (e.g. page=2).
+    """
+    s = session if session is not None else shared_session()
+    store = ResponseCache(CACHE_DIR) if cache else None
+    entry = store.lookup(url) if store else None
+    headers = dict(headers or {})
+    if entry:
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+
+    attempt = 0
+    while True:
+        attempt += 1
+        t = time.perf_counter()
+        resp = error = None
+        try:
+            resp = s.get(url, headers=headers, timeout=timeout)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as exc:
+            error = exc
+        seconds = round(time.perf_counter() - t, 6)
+        retry = error is not None or resp.status_code in RETRY_STATUSES
+        if resp is not None and not retry:
+            outcome = 'miss'
+            if resp.status_code == 304 and entry:
+                resp, outcome = _from_cache(resp, store, url, entry), 'revalidated'
+                wire = 0
+            else:
+                wire = len(resp.content)
+                if store and store.store(url, resp):
+                    outcome = 'stored'
+            metrics.emit('http', url=url, status=resp.status_code, seconds=seconds, bytes=wire, cache=outcome,
+                         attempt=attempt, **metric_fields)
+            return resp
+        metrics.emit('http', url=url, status=resp.status_code if resp is not None else None, seconds=seconds,
+                     error=repr(error) if error else None, attempt=attempt, final=attempt > retries,
+                     **metric_fields)
+        if attempt > retries:
+            if error is not None:
+                raise error
+            return resp
+        time.sleep(_retry_delay(resp, attempt, backoff))
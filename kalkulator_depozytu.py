@@ -1,43 +1,193 @@
-import pandas as pd
-import requests
+import time
+
+# Początek importu modułu; main() raportuje czas startu w metrykach (zdarzenie 'startup')
+_START = time.perf_counter()
+
 import sys
 import glob # Biblioteka do wyszukiwania plików
 import os   # Biblioteka do operacji na systemie plików
 import locale # Biblioteka do ustawień regionalnych (dla polskich nazw miesięcy)
+import argparse
+import csv
+import hashlib
+import importlib.util
+import json
+import statistics
+from collections import Counter, OrderedDict
+from datetime import date, datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import metrics
+import rce_bin
+from lazy_imports import lazy_import, loaded
+from magazyn_cen import CACHE_DIR, MIN_SLOTOW_DOBY, POZIOMY, RCE_FILE, STREFA, MagazynCen, domyslny_magazyn
+
+# pandas, NumPy i requests są importowane dopiero przy pierwszym użyciu, więc lekka
+# ścieżka dla małych plików (_uruchom_lekko) startuje bez nich
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+requests = lazy_import('requests')
 
-# Ustawienie polskiego języka dla nazw miesięcy w podsumowaniu
-try:
-    locale.setlocale(locale.LC_TIME, 'pl_PL.UTF-8')
-except locale.Error:
-    print("Ostrzeżenie: Nie udało się ustawić polskich nazw miesięcy. Podsumowanie może być w języku angielskim.")
+_LOCALE_USTAWIONE = False
 
 
-def wczytaj_dane_uzytkownika(nazwa_pliku):
-    """Wczytuje i przetwarza pojedynczy plik CSV od użytkownika."""
+def ustaw_polskie_miesiace():
+    """Ustawia polski język nazw miesięcy w podsumowaniu (raz na proces)."""
+    global _LOCALE_USTAWIONE
+    if _LOCALE_USTAWIONE:
+        return
+    _LOCALE_USTAWIONE = True
     try:
-        # print(f"\n--- Przetwarzanie pliku: {nazwa_pliku} ---")
-        # print("Krok 1: Wczytywanie Twoich danych...")
+        locale.setlocale(locale.LC_TIME, 'pl_PL.UTF-8')
+    except locale.Error:
+        print("Ostrzeżenie: Nie udało się ustawić polskich nazw miesięcy. Podsumowanie może być w języku angielskim.")
+
 
-        df = pd.read_csv(nazwa_pliku, sep=';', decimal=',', encoding='utf-8')
+# Nazwy kolumn eksportu eLicznika (po usunięciu spacji) i ich odpowiedniki w ramkach danych
+KOLUMNA_DATY = 'Data'
+KOLUMNA_ENERGII = 'Wartość kWh'
 
-        # Usuń nadmiarowe spacje w nazwach kolumn (np. ' Wartość kWh') żeby dopasować mapowanie nazw
-        df.columns = df.columns.str.strip()
+# Silnik pyarrow jest używany w szybkiej ścieżce tylko wtedy, gdy jest zainstalowany
+PYARROW_DOSTEPNY = importlib.util.find_spec('pyarrow') is not None
 
-        df.rename(columns={'Data': 'TimestampStr', 'Wartość kWh': 'Energia_kWh'}, inplace=True)
+# Pozycje separatorów i cyfr w stałym formacie 'RRRR-MM-DD GG:MM'
+_SEPARATORY = {4: ord('-'), 7: ord('-'), 10: ord(' '), 13: ord(':')}
+_CYFRY = [0, 1, 2, 3, 5, 6, 8, 9, 11, 12, 14, 15]
 
-        # Usunięcie wierszy, które mogą nie mieć daty
-        df.dropna(subset=['TimestampStr'], inplace=True)
 
-        df['DateTime'] = pd.to_datetime(df['TimestampStr'].str.replace(' 24:00', ' 00:00'), errors='coerce')
-        df.loc[df['TimestampStr'].str.contains(' 24:00'), 'DateTime'] += pd.Timedelta(days=1)
+def parsuj_znaczniki_czasu(znaczniki, szybko=True):
+    """Zamienia napisy z kolumny 'Data' na DateTime; godzina '24:00' oznacza północ dnia następnego.
+
+    Najpierw próbuje wektorowego parsera stałego formatu, a dla innych formatów
+    (lub przy `szybko=False`) używa ogólnego `pd.to_datetime`.
+    """
+    if szybko:
+        try:
+            return pd.Series(parsuj_znaczniki_szybko(znaczniki.to_numpy()), index=znaczniki.index)
+        except ValueError:
+            pass
+    daty = pd.to_datetime(znaczniki.str.replace(' 24:00', ' 00:00'), errors='coerce')
+    daty.loc[znaczniki.str.contains(' 24:00')] += pd.Timedelta(days=1)
+    return daty
+
+
+def parsuj_znaczniki_szybko(znaczniki):
+    """Wektorowo parsuje znaczniki w stałym formacie 'RRRR-MM-DD GG:MM' w jednym przebiegu.
+
+    Godzina jest dodawana do daty jako przesunięcie, więc '24:00' samo przechodzi na
+    następny dzień. Rzuca ValueError, jeśli którykolwiek znacznik ma inny format.
+    """
+    # jeden bajt zapasu: dłuższy znacznik (sekundy, strefa) nie może zostać po cichu obcięty
+    bajty = np.asarray(znaczniki, dtype='S17')
+    if bajty.size == 0:
+        return bajty.astype('datetime64[ns]')
+    znaki = bajty.view(np.uint8).reshape(-1, 17)
+    if znaki[:, 16].any():
+        raise ValueError('nieobsługiwany format daty')
+    for pozycja, separator in _SEPARATORY.items():
+        if not (znaki[:, pozycja] == separator).all():
+            raise ValueError('nieobsługiwany format daty')
+    cyfry = znaki[:, _CYFRY].astype(np.int64) - ord('0')
+    if ((cyfry < 0) | (cyfry > 9)).any():
+        raise ValueError('nieobsługiwany format daty')
+    rok = cyfry[:, 0] * 1000 + cyfry[:, 1] * 100 + cyfry[:, 2] * 10 + cyfry[:, 3]
+    miesiac = cyfry[:, 4] * 10 + cyfry[:, 5]
+    dzien = cyfry[:, 6] * 10 + cyfry[:, 7]
+    godzina = cyfry[:, 8] * 10 + cyfry[:, 9]
+    minuta = cyfry[:, 10] * 10 + cyfry[:, 11]
+    if ((miesiac < 1) | (miesiac > 12) | (dzien < 1) | (dzien > 31) | (godzina > 24) | (minuta > 59)
+            | ((godzina == 24) & (minuta != 0))).any():
+        raise ValueError('nieobsługiwany format daty')
+    miesiace = ((rok - 1970) * 12 + miesiac - 1).astype('datetime64[M]')
+    dni = miesiace.astype('datetime64[D]') + (dzien - 1)
+    if (dni.astype('datetime64[M]') != miesiace).any():
+        raise ValueError('nieistniejący dzień miesiąca')
+    return dni.astype('datetime64[ns]') + (godzina * 60 + minuta).astype('timedelta64[m]')
+
+
+def _nazwy_kolumn(nazwa_pliku):
+    """Zwraca oryginalne nazwy kolumn daty i energii z nagłówka (mogą zawierać spacje).
+
+    Zamiast nazwy można podać plik binarny w pamięci (np. io.BytesIO); jest przewijany na początek.
+    """
+    if hasattr(nazwa_pliku, 'readline'):
+        naglowek = nazwa_pliku.readline().decode('utf-8').rstrip('\r\n').split(';')
+        nazwa_pliku.seek(0)
+    else:
+        with open(nazwa_pliku, encoding='utf-8') as plik:
+            naglowek = plik.readline().rstrip('\r\n').split(';')
+    kolumny = {kolumna.strip().lstrip('\ufeff'): kolumna for kolumna in naglowek}
+    return kolumny[KOLUMNA_DATY], kolumny[KOLUMNA_ENERGII]
+
+
+def _wczytaj_szybko(nazwa_pliku, silnik=None):
+    """Szybka ścieżka dla formatu eLicznika: tylko dwie kolumny, jawne typy i stały format daty."""
+    kolumna_daty, kolumna_energii = _nazwy_kolumn(nazwa_pliku)
+    if silnik is None:
+        silnik = 'pyarrow' if PYARROW_DOSTEPNY else 'c'
+    df = pd.read_csv(nazwa_pliku, sep=';', decimal=',', encoding='utf-8', engine=silnik,
+                     usecols=[kolumna_daty, kolumna_energii],
+                     dtype={kolumna_daty: str, kolumna_energii: 'float64'})
+    df = df.rename(columns={kolumna_daty: 'TimestampStr', kolumna_energii: 'Energia_kWh'})
+    df = df[df['TimestampStr'].notna()]
+    return pd.DataFrame({
+        'DateTime': parsuj_znaczniki_szybko(df['TimestampStr'].to_numpy()),
+        'Energia_kWh': df['Energia_kWh'].to_numpy(),
+    })
+
+
+def _wczytaj_klasycznie(nazwa_pliku, szybkie_daty=True):
+    df = pd.read_csv(nazwa_pliku, sep=';', decimal=',', encoding='utf-8')
+
+    # Usuń nadmiarowe spacje w nazwach kolumn (np. ' Wartość kWh') żeby dopasować mapowanie nazw
+    df.columns = df.columns.str.strip()
+
+    df.rename(columns={KOLUMNA_DATY: 'TimestampStr', KOLUMNA_ENERGII: 'Energia_kWh'}, inplace=True)
+
+    # Usunięcie wierszy, które mogą nie mieć daty
+    df.dropna(subset=['TimestampStr'], inplace=True)
+
+    df['DateTime'] = parsuj_znaczniki_czasu(df['TimestampStr'], szybko=szybkie_daty)
+    return df[['DateTime', 'Energia_kWh']]
+
+
+def wczytaj_dane_uzytkownika(nazwa_pliku, tryb='szybki', silnik=None):
+    """Wczytuje i przetwarza pojedynczy plik CSV od użytkownika.
+
+    Tryb 'szybki' czyta tylko kolumny daty i energii (opcjonalnie silnikiem pyarrow)
+    i parsuje daty wektorowo; przy nietypowym pliku przechodzi na tryb 'klasyczny'.
+    Liczba wierszy na sekundę jest zapisywana w `df.attrs['wierszy_na_s']`.
+    """
+    try:
+        # print(f"\n--- Przetwarzanie pliku: {nazwa_pliku} ---")
+        # print("Krok 1: Wczytywanie Twoich danych...")
+        start = time.perf_counter()
+
+        df = None
+        if tryb == 'szybki':
+            try:
+                df = _wczytaj_szybko(nazwa_pliku, silnik)
+            except FileNotFoundError:
+                raise
+            except Exception:
+                df = None
+        if df is None:
+            if hasattr(nazwa_pliku, 'seek'):
+                nazwa_pliku.seek(0)
+            df = _wczytaj_klasycznie(nazwa_pliku, szybkie_daty=(tryb == 'szybki'))
 
         # Sprawdzenie, czy są jakieś dane po przetworzeniu
         if df.empty or df['DateTime'].isnull().all():
             print(f"❌ BŁĄD: Plik '{nazwa_pliku}' nie zawiera poprawnych danych z datami.")
             return None
 
+        czas = time.perf_counter() - start
+        df.attrs['wierszy_na_s'] = len(df) / czas if czas > 0 else float('inf')
+        metrics.emit('stage', stage='csv_read', seconds=round(czas, 6), rows=len(df), plik=str(nazwa_pliku))
+
         # print("✅ Twoje dane zostały wczytane i przetworzone.")
-        return df[['DateTime', 'Energia_kWh']]
+        return df
 
     except FileNotFoundError:
         print(f"❌ BŁĄD: Nie znaleziono pliku '{nazwa_pliku}'.")
@@ -46,66 +196,42 @@ def wczytaj_dane_uzytkownika(nazwa_pliku):
         print(f"❌ BŁĄD: Wystąpił nieoczekiwany problem podczas wczytywania pliku '{nazwa_pliku}': {e}")
         return None
 
-def pobierz_ceny_rynkowe(start_date, end_date):
-    """Pobiera Rynkową Cenę Energii (RCE) z API PSE i uśrednia ją do wartości godzinowych."""
-    
-    # Dodajemy jeden dzień do daty końcowej, aby na pewno pobrać wszystkie dane dla ostatniego dnia
-    end_date_api = end_date + pd.Timedelta(days=1)
-    
-    start_str = start_date.strftime('%Y-%m-%d')
-    end_str = end_date_api.strftime('%Y-%m-%d')
-    
-    # Nowy URL do API PSE dla RCE z filtrem OData
-    # Używamy 'ge' (greater or equal) i 'lt' (less than) do filtrowania po business_date
-    # Ważne: daty muszą być w pojedynczych cudzysłowach
-    url = f"https://api.raporty.pse.pl/api/rce-pln?$filter=business_date ge '{start_str}' and business_date lt '{end_str}'"
-    
-    # print(f"Krok 2: Pobieranie cen RCE z PSE dla okresu od {start_str} do {end_str}...")
-    
-    all_data = []
-    
+def rozdzielczosc_danych(daty):
+    """Zwraca poziom cen pasujący do danych: '15min' dla odczytów 15-minutowych, inaczej 'h'."""
+    kroki = pd.Series(daty.dropna().unique()).sort_values().diff().dropna()
+    if not kroki.empty and kroki.median() <= pd.Timedelta(minutes=15):
+        return '15min'
+    return 'h'
+
+
+def pobierz_ceny_rynkowe(start_date, end_date, magazyn=None, poziom='h'):
+    """Zwraca Rynkową Cenę Energii (RCE) na danym poziomie: godzinowym ('h') lub 15-minutowym ('15min').
+
+    Ceny są brane z lokalnego magazynu (poziomy przygotowane przez update_rce.py,
+    rce.json i pamięć podręczna na dysku), a z API PSE pobierane są tylko brakujące
+    doby. Bez przekazanego magazynu używany jest magazyn współdzielony w obrębie procesu.
+    """
+    if magazyn is None:
+        magazyn = domyslny_magazyn()
+
+    # print(f"Krok 2: Pobieranie cen RCE dla okresu od {start_date} do {end_date}...")
+
     try:
-        while url:
-            # print(f"   -> Pobieranie danych z: {url[:100]}...")
-            response = requests.get(url, timeout=30)
-            
-            if response.status_code != 200:
-                print(f"❌ BŁĄD: Serwer PSE zwrócił błąd (Status: {response.status_code}).")
-                print(f"   Treść odpowiedzi: {response.text[:200]}")
-                return None
-
-            json_response = response.json()
-            data = json_response.get('value')
-            
-            if data:
-                all_data.extend(data)
-            
-            # Sprawdzenie, czy jest link do następnej strony
-            url = json_response.get('nextLink')
-
-        if not all_data:
+        with metrics.stage('price_fetch', start=start_date, end=end_date, poziom=poziom) as m:
+            df_ceny = magazyn.ceny(start_date, end_date, poziom)
+            m['rows'] = len(df_ceny)
+
+        if df_ceny.empty:
             print("❌ BŁĄD: API PSE nie zwróciło danych dla tego okresu.")
             return None
 
-        df_ceny_15min = pd.DataFrame(all_data)
-        
-        # Przetwarzanie danych
-        # Poprawka na "godzinę duch" (zmiana czasu) - API zwraca np. "02a:00"
-        df_ceny_15min['dtime_cleaned'] = df_ceny_15min['dtime'].str.replace('a', '').str.replace('b', '')
-        df_ceny_15min['DateTime'] = pd.to_datetime(df_ceny_15min['dtime_cleaned'], errors='coerce')
-        df_ceny_15min['Cena_PLN_kWh'] = df_ceny_15min['rce_pln'] / 1000
-        
-        # Uśrednianie cen 15-minutowych do cen godzinowych
-        # print("   -> Uśrednianie cen do interwałów godzinowych...")
-        df_ceny_h = df_ceny_15min.set_index('DateTime').resample('h')['Cena_PLN_kWh'].mean().reset_index()
-        
-        # Filtrowanie po stronie serwera jest już aktywne, więc ta linia nie jest już potrzebna.
-        # df_ceny_h = df_ceny_h[(df_ceny_h['DateTime'] >= pd.to_datetime(start_date)) & (df_ceny_h['DateTime'] < pd.to_datetime(end_date_api))]
-
-
-        # print("✅ Ceny giełdowe zostały pobrane i uśrednione.")
-        return df_ceny_h[['DateTime', 'Cena_PLN_kWh']]
+        # print("✅ Ceny giełdowe zostały pobrane.")
+        return df_ceny[['DateTime', 'Cena_PLN_kWh']]
 
+    except requests.exceptions.HTTPError as e:
+        print(f"❌ BŁĄD: Serwer PSE zwrócił błąd (Status: {e.response.status_code}).")
+        print(f"   Treść odpowiedzi: {e.response.text[:200]}")
+        return None
     except requests.exceptions.RequestException as e:
         print(f"❌ BŁĄD: Problem z połączeniem z serwerem PSE. Sprawdź internet. ({e})")
         return None
@@ -117,61 +243,962 @@ def oblicz_wartosc_depozytu(df_energia, df_ceny):
     """Łączy dane i oblicza końcową wartość depozytu."""
     # print("Krok 3: Obliczanie wartości depozytu...")
     
-    df_polaczone = pd.merge(df_energia, df_ceny, on='DateTime', how='inner')
-    df_polaczone['Wartosc_PLN'] = df_polaczone['Energia_kWh'] * df_polaczone['Cena_PLN_kWh']
-    
-    energia_oddana = df_polaczone[df_polaczone['Energia_kWh'] > 0]
-    
-    calkowita_wartosc = energia_oddana['Wartosc_PLN'].sum()
-    calkowita_energia = energia_oddana['Energia_kWh'].sum()
-    
+    with metrics.stage('merge', rows=len(df_energia)) as m:
+        df_polaczone = pd.merge(df_energia, df_ceny, on='DateTime', how='inner')
+        m['dopasowane'] = len(df_polaczone)
+    with metrics.stage('sum', rows=len(df_polaczone)):
+        df_polaczone['Wartosc_PLN'] = df_polaczone['Energia_kWh'] * df_polaczone['Cena_PLN_kWh']
+
+        energia_oddana = df_polaczone[df_polaczone['Energia_kWh'] > 0]
+
+        calkowita_wartosc = energia_oddana['Wartosc_PLN'].sum()
+        calkowita_energia = energia_oddana['Energia_kWh'].sum()
+
     return calkowita_wartosc, calkowita_energia
 
-def main():
-    """Główna funkcja: wyszukuje wszystkie pliki CSV, przetwarza je i na końcu wyświetla posortowane podsumowanie."""
+
+# Długość slotu osi czasu (w sekundach) dla poziomów cen używanych przy złączeniu po slotach
+KROKI_SLOTOW = {'15min': 900, 'h': 3600}
+
+
+def sloty_utc(daty, krok_s):
+    """Zamienia lokalne znaczniki czasu na numery slotów osi UTC (sekundy UTC od 1970 // krok_s).
+
+    Znaczniki oznaczają koniec interwału, więc etykieta nieistniejąca przy zmianie
+    czasu na letni (np. 02:00) jest przesuwana na chwilę faktycznego końca (03:00).
+    W powtórzonej godzinie przy zmianie na czas zimowy pierwsze wystąpienie danej
+    etykiety to czas letni, a kolejne - zimowy. Puste znaczniki dostają slot -1.
+    """
+    indeks = pd.DatetimeIndex(daty)
+    lokalne = indeks.tz_localize(STREFA, ambiguous='NaT', nonexistent='shift_forward')
+    sekundy = lokalne.as_unit('s').asi8.copy()
+    sporne = np.asarray(lokalne.isna() & indeks.notna())
+    if sporne.any():
+        etykiety = pd.Series(indeks[sporne])
+        kolejne = etykiety.groupby(etykiety).cumcount().to_numpy() > 0
+        rozstrzygniete = pd.DatetimeIndex(etykiety).tz_localize(STREFA, ambiguous=~kolejne)
+        sekundy[sporne] = rozstrzygniete.as_unit('s').asi8
+    return np.where(np.asarray(indeks.isna()), -1, sekundy // krok_s)
+
+
+class IndeksCen:
+    """Ceny w ciągłej tablicy indeksowanej numerem slotu osi UTC; brak ceny to NaN."""
+
+    def __init__(self, pierwszy_slot, krok_s, ceny):
+        self.pierwszy_slot = int(pierwszy_slot)
+        self.krok_s = krok_s
+        self.ceny = np.asarray(ceny, dtype=np.float64)
+
+    @classmethod
+    def z_cen_utc(cls, df_ceny_utc, poziom='15min'):
+        """Buduje indeks z ramki (DateTimeUTC, Cena_PLN_kWh); ceny w slocie są uśredniane."""
+        krok_s = KROKI_SLOTOW[poziom]
+        sekundy = pd.DatetimeIndex(df_ceny_utc['DateTimeUTC']).as_unit('s').asi8
+        sloty = sekundy // krok_s
+        if sloty.size == 0:
+            return cls(0, krok_s, [])
+        pierwszy = sloty.min()
+        pozycje = sloty - pierwszy
+        sumy = np.bincount(pozycje, weights=df_ceny_utc['Cena_PLN_kWh'].to_numpy(dtype=np.float64))
+        liczby = np.bincount(pozycje)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return cls(pierwszy, krok_s, sumy / liczby)
+
+    def ceny_slotow(self, sloty):
+        """Ceny dla podanych numerów slotów; NaN poza zakresem indeksu, w lukach i dla slotu -1."""
+        pozycje = np.asarray(sloty, dtype=np.int64) - self.pierwszy_slot
+        poprawne = (np.asarray(sloty) >= 0) & (pozycje >= 0) & (pozycje < self.ceny.size)
+        wynik = np.full(pozycje.shape, np.nan)
+        wynik[poprawne] = self.ceny[pozycje[poprawne]]
+        return wynik
+
+
+def indeks_cen(start_date, end_date, magazyn=None, poziom='15min'):
+    """Buduje IndeksCen dla dób od start_date do end_date z magazynu cen."""
+    if magazyn is None:
+        magazyn = domyslny_magazyn()
+    return IndeksCen.z_cen_utc(magazyn.ceny_utc(start_date, end_date), poziom)
+
+
+def oblicz_wartosc_depozytu_sloty(df_energia, indeks):
+    """Liczy depozyt przez bezpośrednie indeksowanie cen numerem slotu zamiast pd.merge.
+
+    Zwraca (wartość, energia, niedopasowane), gdzie `niedopasowane` to wiersze
+    (DateTime, Energia_kWh), dla których nie znaleziono ceny.
+    """
+    with metrics.stage('merge', rows=len(df_energia), zlaczenie='sloty'):
+        ceny = indeks.ceny_slotow(sloty_utc(df_energia['DateTime'], indeks.krok_s))
+    with metrics.stage('sum', rows=len(df_energia)):
+        energia = df_energia['Energia_kWh'].to_numpy(dtype=np.float64)
+        dopasowane = ~np.isnan(ceny)
+        oddana = dopasowane & (energia > 0)
+        calkowita_wartosc = float(np.dot(energia[oddana], ceny[oddana]))
+        calkowita_energia = float(energia[oddana].sum())
+    niedopasowane = df_energia.loc[~dopasowane, ['DateTime', 'Energia_kWh']]
+    return calkowita_wartosc, calkowita_energia, niedopasowane
+
+
+def miesiac_rozliczeniowy(daty):
+    """Miesiąc (Period 'M') interwału kończącego się w chwili `daty`; północ 1. dnia należy do miesiąca poprzedniego."""
+    return (daty - pd.Timedelta(seconds=1)).dt.to_period('M')
+
+
+def oblicz_depozyty_wielu(df_liczniki, df_ceny):
+    """Liczy depozyt wielu liczników naraz: jedno złączenie z cenami i jedno grupowanie.
+
+    `df_liczniki` to ramka w formacie długim z kolumnami meter_id, DateTime, Energia_kWh.
+    Zwraca ramkę z kolumnami meter_id, Miesiac, Energia_kWh, Wartosc_PLN - energię
+    oddaną do sieci i wartość depozytu dla każdego licznika i miesiąca (jak w
+    oblicz_wartosc_depozytu, liczone są tylko interwały z dostępną ceną).
+    """
+    oddana = df_liczniki.loc[df_liczniki['Energia_kWh'] > 0, ['meter_id', 'DateTime', 'Energia_kWh']]
+    df_polaczone = oddana.merge(df_ceny[['DateTime', 'Cena_PLN_kWh']], on='DateTime', how='inner')
+    df_polaczone['Wartosc_PLN'] = df_polaczone['Energia_kWh'] * df_polaczone['Cena_PLN_kWh']
+    df_polaczone['Miesiac'] = miesiac_rozliczeniowy(df_polaczone['DateTime'])
+    return (df_polaczone
+            .groupby(['meter_id', 'Miesiac'], sort=True, observed=True)[['Energia_kWh', 'Wartosc_PLN']]
+            .sum()
+            .reset_index())
+
+
+# Scenariusze rozliczenia: źródło ceny x obcięcie cen ujemnych x mnożnik depozytu
+ZRODLA_CEN = ('RCE_h', 'RCE_15min', 'RCEm')
+MNOZNIK_DEPOZYTU = 1.23
+# Mnożnik dotyczy miesięcy rozliczeniowych od stycznia 2025 (jak w script.js)
+MIESIAC_MNOZNIKA = '2025-01'
+RCEM_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'rcem.json')
+
+
+def wczytaj_rcem(plik=RCEM_FILE):
+    """Wczytuje rcem.json ({rok: {miesiąc: zł/MWh}}) jako {numer miesiąca datetime64[M]: PLN/kWh}."""
+    try:
+        with open(plik, encoding='utf-8') as f:
+            dane = json.load(f)
+    except FileNotFoundError:
+        print(f"Ostrzeżenie: Brak pliku '{plik}', scenariusz RCEm zostanie pominięty.")
+        return {}
+    return {(int(rok) - 1970) * 12 + int(miesiac) - 1: cena / 1000.0
+            for rok, miesiace in dane.items() for miesiac, cena in miesiace.items()}
+
+
+def ceny_rcem(rcem, numery):
+    """Ceny RCEm (PLN/kWh) dla tablicy numerów miesięcy od 1970; NaN dla miesięcy spoza `rcem`."""
+    klucze = np.array(sorted(rcem), dtype=np.int64)
+    return _ceny_wg_znacznikow(numery, klucze, np.array([rcem[k] for k in klucze.tolist()], dtype=np.float64))
+
+
+def _srednia_kwadransow(daty, klucze, ceny):
+    """Średnia cen czterech kwadransów godziny kończącej się w `daty`; NaN, gdy brakuje któregokolwiek."""
+    suma = np.zeros(daty.shape)
+    for minuty in (45, 30, 15, 0):
+        suma += _ceny_wg_znacznikow(daty - np.timedelta64(minuty, 'm'), klucze, ceny)
+    return suma / 4
+
+
+def oblicz_scenariusze(df_liczniki, magazyn=None, rcem=None, mnoznik=MNOZNIK_DEPOZYTU,
+                       od_miesiaca=MIESIAC_MNOZNIKA):
+    """Liczy depozyt w wielu wariantach rozliczenia w jednym przebiegu po tych samych danych.
+
+    Warianty to źródło ceny (ZRODLA_CEN: RCE godzinowa, RCE 15-minutowa, RCEm
+    z rcem.json), ceny ujemne obcięte do zera lub nie i wynik z mnożnikiem lub bez.
+    Dla danych godzinowych cena 15-minutowa to średnia czterech kwadransów danej
+    godziny, dla danych 15-minutowych cena godzinowa to cena godziny, w której
+    wypada znacznik. Mnożnik dotyczy miesięcy od `od_miesiaca`.
+
+    `df_liczniki` ma kolumny DateTime, Energia_kWh i opcjonalnie meter_id.
+    Zwraca ramkę w formacie długim: [meter_id,] Miesiac, Ceny, Obciete,
+    Z_mnoznikiem, Energia_kWh (energia z dostępną ceną), Wartosc_PLN.
+    """
+    if magazyn is None:
+        magazyn = domyslny_magazyn()
+    if rcem is None:
+        rcem = wczytaj_rcem()
+    od_miesiaca = pd.Period(od_miesiaca, freq='M')
+    klucze_grup = ['meter_id'] if 'meter_id' in df_liczniki.columns else []
+    df = df_liczniki[(df_liczniki['Energia_kWh'] > 0) & df_liczniki['DateTime'].notna()]
+    kolumny = klucze_grup + ['Miesiac', 'Ceny', 'Obciete', 'Z_mnoznikiem', 'Energia_kWh', 'Wartosc_PLN']
+    if df.empty:
+        return pd.DataFrame(columns=kolumny)
+
+    daty = df['DateTime'].to_numpy(dtype='datetime64[ns]')
+    energia = df['Energia_kWh'].to_numpy(dtype=np.float64)
+    if klucze_grup:
+        poziomy = df.groupby('meter_id', observed=True)['DateTime'].agg(rozdzielczosc_danych)
+        godzinowe = (df['meter_id'].map(poziomy) == 'h').to_numpy(dtype=bool)
+    else:
+        godzinowe = np.full(daty.shape, rozdzielczosc_danych(df['DateTime']) == 'h')
+    od = (pd.Timestamp(daty.min()) - pd.Timedelta(seconds=1)).date()
+    do = pd.Timestamp(daty.max()).date()
+    miesiace = (daty - np.timedelta64(1, 's')).astype('datetime64[M]')
+
+    ceny = {}
+    with metrics.stage('price_fetch', start=od, end=do, scenariusze=True):
+        for obciete in (True, False):
+            # godzina kończąca się o T to kwadranse T-45..T, tak jak w _srednia_kwadransow(),
+            # więc oba warianty godzinowe wyceniają tę samą godzinę
+            df_15min = magazyn.ceny(od, do, '15min', obciete)
+            df_h = (df_15min.set_index('DateTime').resample('h', closed='right', label='right')['Cena_PLN_kWh']
+                    .mean().dropna().reset_index())
+            kh, ph = _posortowane_ceny(df_h)
+            kq, pq = _posortowane_ceny(df_15min)
+            # znacznik kwadransa (koniec interwału) należy do godziny kończącej się o jego sufit
+            koniec_godziny = ((daty - np.timedelta64(1, 'ns')).astype('datetime64[h]')
+                              + np.timedelta64(1, 'h')).astype(daty.dtype)
+            ceny[('RCE_h', obciete)] = np.where(godzinowe, _ceny_wg_znacznikow(daty, kh, ph),
+                                                _ceny_wg_znacznikow(koniec_godziny, kh, ph))
+            ceny[('RCE_15min', obciete)] = np.where(godzinowe, _srednia_kwadransow(daty, kq, pq),
+                                                    _ceny_wg_znacznikow(daty, kq, pq))
+        bez_surowych = magazyn.bez_surowych(od, do)
+        if bez_surowych:
+            print(f"Ostrzeżenie: {len(bez_surowych)} kwadransów z ceną 0 między {bez_surowych[0][:10]} "
+                  f"a {bez_surowych[-1][:10]} nie ma surowej ceny; warianty bez obcięcia liczą je jako 0 "
+                  f"(uzupełnij: python update_rce.py --negative-backfill).")
+        rcem_miesiecy = ceny_rcem(rcem, miesiace.astype(np.int64))
+        ceny[('RCEm', True)] = np.maximum(rcem_miesiecy, 0)
+        ceny[('RCEm', False)] = rcem_miesiecy
+
+    with metrics.stage('sum', rows=len(df), scenariusze=len(ceny)):
+        sumy = {klucz: df[klucz].to_numpy() for klucz in klucze_grup}
+        sumy['Miesiac'] = pd.PeriodIndex(miesiace, freq='M')
+        warianty = [(zrodlo, obciete) for zrodlo in ZRODLA_CEN for obciete in (True, False)]
+        for j, wariant in enumerate(warianty):
+            cena = ceny[wariant]
+            dopasowane = ~np.isnan(cena)
+            sumy[f'e{j}'] = np.where(dopasowane, energia, 0.0)
+            sumy[f'w{j}'] = np.where(dopasowane, energia * np.nan_to_num(cena), 0.0)
+        zgrupowane = pd.DataFrame(sumy).groupby(klucze_grup + ['Miesiac'], sort=True, observed=True).sum()
+
+    czesci = []
+    czynnik = np.where(zgrupowane.index.get_level_values('Miesiac') >= od_miesiaca, mnoznik, 1.0)
+    for j, (zrodlo, obciete) in enumerate(warianty):
+        for z_mnoznikiem in (False, True):
+            czesc = zgrupowane.index.to_frame(index=False)
+            czesc['Ceny'] = zrodlo
+            czesc['Obciete'] = obciete
+            czesc['Z_mnoznikiem'] = z_mnoznikiem
+            czesc['Energia_kWh'] = zgrupowane[f'e{j}'].to_numpy()
+            czesc['Wartosc_PLN'] = zgrupowane[f'w{j}'].to_numpy() * (czynnik if z_mnoznikiem else 1.0)
+            czesci.append(czesc)
+    return pd.concat(czesci, ignore_index=True)[kolumny]
+
+
+def wczytaj_wiele_licznikow(pliki_csv, tryb='szybki'):
+    """Wczytuje pliki CSV do jednej ramki w formacie długim; meter_id to nazwa pliku bez rozszerzenia."""
+    czesci = []
+    for nazwa_pliku in pliki_csv:
+        df = wczytaj_dane_uzytkownika(nazwa_pliku, tryb)
+        if df is None or df.empty:
+            continue
+        df = df[['DateTime', 'Energia_kWh']].copy()
+        df.insert(0, 'meter_id', os.path.splitext(os.path.basename(nazwa_pliku))[0])
+        czesci.append(df)
+    if not czesci:
+        return pd.DataFrame(columns=['meter_id', 'DateTime', 'Energia_kWh'])
+    df_liczniki = pd.concat(czesci, ignore_index=True)
+    df_liczniki['meter_id'] = df_liczniki['meter_id'].astype('category')
+    return df_liczniki
+
+
+# Domyślna liczba wierszy CSV w jednej porcji trybu strumieniowego
+WIERSZY_W_PORCJI = 100_000
+
+
+def wczytaj_porcjami(nazwa_pliku, wierszy=WIERSZY_W_PORCJI):
+    """Czyta plik eLicznika porcjami po `wierszy` wierszy; zwraca generator ramek (DateTime, Energia_kWh).
+
+    W pamięci jest naraz tylko jedna porcja, a w niej tylko kolumny daty i energii.
+    """
+    kolumna_daty, kolumna_energii = _nazwy_kolumn(nazwa_pliku)
+    czytnik = pd.read_csv(nazwa_pliku, sep=';', decimal=',', encoding='utf-8', engine='c',
+                          usecols=[kolumna_daty, kolumna_energii],
+                          dtype={kolumna_daty: str, kolumna_energii: 'float64'}, chunksize=wierszy)
+    with czytnik:
+        for porcja in czytnik:
+            porcja = porcja[porcja[kolumna_daty].notna()]
+            yield pd.DataFrame({
+                'DateTime': parsuj_znaczniki_czasu(porcja[kolumna_daty]).to_numpy(),
+                'Energia_kWh': porcja[kolumna_energii].to_numpy(),
+            })
+
+
+def _ceny_wg_znacznikow(daty, klucze, ceny):
+    """Ceny dla znaczników `daty` z posortowanej tablicy `klucze` (jak złączenie 'inner'); NaN bez dopasowania."""
+    pozycje = np.searchsorted(klucze, daty)
+    pozycje[pozycje >= klucze.size] = 0
+    wynik = np.full(daty.shape, np.nan)
+    if klucze.size:
+        trafione = klucze[pozycje] == daty
+        wynik[trafione] = ceny[pozycje[trafione]]
+    return wynik
+
+
+def _posortowane_ceny(df_ceny):
+    klucze = df_ceny['DateTime'].to_numpy(dtype='datetime64[ns]')
+    ceny = df_ceny['Cena_PLN_kWh'].to_numpy(dtype=np.float64)
+    if klucze.size > 1 and not (klucze[1:] >= klucze[:-1]).all():
+        kolejnosc = np.argsort(klucze, kind='stable')
+        klucze, ceny = klucze[kolejnosc], ceny[kolejnosc]
+    return klucze, ceny
+
+
+def porcje_z_cenami(nazwa_pliku, df_ceny=None, magazyn=None, wierszy=WIERSZY_W_PORCJI):
+    """Czyta plik porcjami i dołącza do każdego wiersza cenę; generator krotek (porcja, daty, ceny, poziom).
+
+    `porcja` to ramka (DateTime, Energia_kWh) bez wierszy z pustą datą, `daty` jej
+    znaczniki jako datetime64[ns], a `ceny` - tablica cen PLN/kWh (NaN bez ceny).
+    `df_ceny` jak w oblicz_depozyt_strumieniowo(); poziom cen jest ustalany z
+    pierwszej porcji. Błędy odczytu pliku są przekazywane dalej.
+    """
+    poziom = None
+    ceny_porcji = None  # (od, do, klucze, ceny) ostatnio pobranego zakresu z magazynu
+    for porcja in wczytaj_porcjami(nazwa_pliku, wierszy):
+        daty = porcja['DateTime'].to_numpy(dtype='datetime64[ns]')
+        poprawne = ~np.isnat(daty)
+        if not poprawne.any():
+            continue
+        porcja = porcja[poprawne]
+        daty = daty[poprawne]
+        if poziom is None:
+            poziom = rozdzielczosc_danych(porcja['DateTime'])
+        ceny_zrodlo = df_ceny.get(poziom) if isinstance(df_ceny, dict) else df_ceny
+
+        with metrics.stage('merge', rows=len(porcja), tryb='strumieniowy'):
+            if isinstance(ceny_zrodlo, IndeksCen):
+                ceny = ceny_zrodlo.ceny_slotow(sloty_utc(porcja['DateTime'], ceny_zrodlo.krok_s))
+            else:
+                if ceny_zrodlo is None:
+                    # północ należy do doby poprzedniej, stąd przesunięcie o sekundę
+                    od = (pd.Timestamp(daty.min()) - pd.Timedelta(seconds=1)).date()
+                    do = pd.Timestamp(daty.max()).date()
+                    if ceny_porcji is None or od < ceny_porcji[0] or do > ceny_porcji[1]:
+                        df = pobierz_ceny_rynkowe(od, do, magazyn, poziom)
+                        if df is None:
+                            df = pd.DataFrame({'DateTime': pd.Series(dtype='datetime64[ns]'),
+                                               'Cena_PLN_kWh': pd.Series(dtype='float64')})
+                        ceny_porcji = (od, do, *_posortowane_ceny(df))
+                elif ceny_porcji is None:
+                    ceny_porcji = (None, None, *_posortowane_ceny(ceny_zrodlo))
+                ceny = _ceny_wg_znacznikow(daty, ceny_porcji[2], ceny_porcji[3])
+        yield porcja, daty, ceny, poziom
+
+
+def oblicz_depozyt_strumieniowo(nazwa_pliku, df_ceny=None, magazyn=None, wierszy=WIERSZY_W_PORCJI):
+    """Liczy depozyt pliku porcjami, trzymając w pamięci tylko sumy miesięczne.
+
+    `df_ceny` to ramka cen, słownik {poziom: ramka lub IndeksCen} albo IndeksCen;
+    bez niego ceny dla zakresu każdej porcji są brane z magazynu. Poziom cen jest
+    ustalany z pierwszej porcji. Zwraca ramkę (Miesiac, Energia_kWh, Wartosc_PLN)
+    z `attrs` start_date, end_date, rozdzielczosc, wierszy, niedopasowane i
+    wierszy_na_s albo None, gdy pliku nie da się wczytać.
+    """
+    start = time.perf_counter()
+    sumy = {}  # numer miesiąca (datetime64[M] jako int) -> [energia, wartość]
+    poziom = None
+    wierszy_razem = niedopasowane = 0
+    pierwsza = ostatnia = None
+    try:
+        for porcja, daty, ceny, poziom in porcje_z_cenami(nazwa_pliku, df_ceny, magazyn, wierszy):
+            with metrics.stage('sum', rows=len(porcja), tryb='strumieniowy'):
+                energia = porcja['Energia_kWh'].to_numpy(dtype=np.float64)
+                dopasowane = ~np.isnan(ceny)
+                oddana = dopasowane & (energia > 0)
+                miesiace = (daty[oddana] - np.timedelta64(1, 's')).astype('datetime64[M]').astype(np.int64)
+                if miesiace.size:
+                    numery, pozycje = np.unique(miesiace, return_inverse=True)
+                    kwh = np.bincount(pozycje, weights=energia[oddana])
+                    pln = np.bincount(pozycje, weights=energia[oddana] * ceny[oddana])
+                    for numer, e, w in zip(numery.tolist(), kwh, pln):
+                        suma = sumy.setdefault(numer, [0.0, 0.0])
+                        suma[0] += e
+                        suma[1] += w
+
+            wierszy_razem += len(porcja)
+            niedopasowane += int((~dopasowane).sum())
+            pierwsza = daty.min() if pierwsza is None else min(pierwsza, daty.min())
+            ostatnia = daty.max() if ostatnia is None else max(ostatnia, daty.max())
+    except FileNotFoundError:
+        print(f"❌ BŁĄD: Nie znaleziono pliku '{nazwa_pliku}'.")
+        return None
+    except Exception as e:
+        print(f"❌ BŁĄD: Wystąpił nieoczekiwany problem podczas wczytywania pliku '{nazwa_pliku}': {e}")
+        return None
+
+    numery = sorted(sumy)
+    wynik = pd.DataFrame({
+        'Miesiac': pd.PeriodIndex(np.array(numery, dtype='int64').astype('datetime64[M]'), freq='M'),
+        'Energia_kWh': [sumy[n][0] for n in numery],
+        'Wartosc_PLN': [sumy[n][1] for n in numery],
+    })
+    czas = time.perf_counter() - start
+    wynik.attrs.update({
+        'start_date': pd.Timestamp(pierwsza).date() if pierwsza is not None else None,
+        'end_date': pd.Timestamp(ostatnia).date() if ostatnia is not None else None,
+        'rozdzielczosc': poziom,
+        'wierszy': wierszy_razem,
+        'niedopasowane': niedopasowane,
+        'wierszy_na_s': wierszy_razem / czas if czas > 0 else float('inf'),
+    })
+    return wynik
+
+
+def znajdz_pliki(wejscie='*.csv'):
+    """Zwraca posortowaną listę plików CSV z katalogu lub pasujących do wzorca glob."""
+    if os.path.isdir(wejscie):
+        wejscie = os.path.join(wejscie, '*.csv')
+    return sorted(glob.glob(wejscie))
+
+
+def zakres_dat_pliku(nazwa_pliku, porcja=None):
+    """Zwraca (pierwsza_doba, ostatnia_doba, poziom_cen) pliku, czytając tylko kolumnę z datą, lub None.
+
+    Z `porcja` kolumna jest czytana porcjami, a poziom cen ustalany z pierwszej porcji.
+    """
+    try:
+        if porcja:
+            pierwsza = ostatnia = poziom = None
+            for df in wczytaj_porcjami(nazwa_pliku, porcja):
+                daty = df['DateTime'].dropna()
+                if daty.empty:
+                    continue
+                poziom = poziom or rozdzielczosc_danych(daty)
+                pierwsza = daty.min() if pierwsza is None else min(pierwsza, daty.min())
+                ostatnia = daty.max() if ostatnia is None else max(ostatnia, daty.max())
+            return (pierwsza.date(), ostatnia.date(), poziom) if poziom else None
+        df = pd.read_csv(nazwa_pliku, sep=';', encoding='utf-8', dtype=str,
+                         usecols=lambda kolumna: kolumna.strip() == KOLUMNA_DATY)
+        daty = parsuj_znaczniki_czasu(df.iloc[:, 0].dropna()).dropna()
+        if daty.empty:
+            return None
+        return daty.min().date(), daty.max().date(), rozdzielczosc_danych(daty)
+    except Exception:
+        return None
+
+
+def scal_zakresy(zakresy):
+    """Łączy nakładające się lub sąsiadujące zakresy dób w sumę zbiorów [(od, do)]."""
+    scalone = []
+    for od, do in sorted(zakresy):
+        if scalone and od <= scalone[-1][1] + timedelta(days=1):
+            scalone[-1] = (scalone[-1][0], max(scalone[-1][1], do))
+        else:
+            scalone.append((od, do))
+    return scalone
+
+
+# Ceny ({poziom: ramka}) przekazywane raz do każdego procesu roboczego (zob. _inicjuj_pracownika)
+_CENY_PRACOWNIKA = None
+
+
+def _inicjuj_pracownika(df_ceny):
+    global _CENY_PRACOWNIKA
+    _CENY_PRACOWNIKA = df_ceny
+    ustaw_polskie_miesiace()
+
+
+def przetworz_plik(nazwa_pliku, df_ceny=None, porcja=None):
+    """Wczytuje plik i liczy depozyt na gotowych cenach; zwraca słownik wyniku.
+
+    `df_ceny` to ramka cen albo słownik {poziom: ramka}, z którego wybierany jest
+    poziom zgodny z rozdzielczością danych licznika. Z `porcja` plik jest czytany
+    strumieniowo po tyle wierszy (oblicz_depozyt_strumieniowo).
+    """
+    if df_ceny is None:
+        df_ceny = _CENY_PRACOWNIKA
+    if porcja:
+        return _przetworz_plik_strumieniowo(nazwa_pliku, df_ceny, porcja)
+    df_energia = wczytaj_dane_uzytkownika(nazwa_pliku)
+    if df_energia is None or df_energia.empty:
+        return {'nazwa_pliku': nazwa_pliku, 'blad': 'błąd wczytywania lub brak danych'}
+
+    start_date = df_energia['DateTime'].min().date()
+    end_date = df_energia['DateTime'].max().date()
+    poziom = rozdzielczosc_danych(df_energia['DateTime'])
+    if isinstance(df_ceny, dict):
+        df_ceny = df_ceny.get(poziom)
+    if df_ceny is None or (isinstance(df_ceny, IndeksCen) and not df_ceny.ceny.size) or \
+            (isinstance(df_ceny, pd.DataFrame) and df_ceny.empty):
+        return {'nazwa_pliku': nazwa_pliku, 'start_date': start_date, 'blad': 'brak cen RCE'}
+
+    dodatkowe = {}
+    if isinstance(df_ceny, IndeksCen):
+        wartosc, energia, niedopasowane = oblicz_wartosc_depozytu_sloty(df_energia, df_ceny)
+        dodatkowe['niedopasowane'] = len(niedopasowane)
+    else:
+        wartosc, energia = oblicz_wartosc_depozytu(df_energia, df_ceny)
+    return {
+        **dodatkowe,
+        'start_date': start_date,
+        'end_date': end_date,
+        'nazwa_pliku': nazwa_pliku,
+        'miesiac_rok': start_date.strftime('%B %Y').capitalize(),
+        'energia': float(energia),
+        'wartosc': float(wartosc),
+        'rozdzielczosc': poziom,
+        'wierszy_na_s': round(df_energia.attrs.get('wierszy_na_s', 0.0)),
+    }
+
+
+def _przetworz_plik_strumieniowo(nazwa_pliku, df_ceny, porcja):
+    miesiace = oblicz_depozyt_strumieniowo(nazwa_pliku, df_ceny, wierszy=porcja)
+    if miesiace is None or miesiace.attrs['start_date'] is None:
+        return {'nazwa_pliku': nazwa_pliku, 'blad': 'błąd wczytywania lub brak danych'}
+    start_date = miesiace.attrs['start_date']
+    return {
+        'start_date': start_date,
+        'end_date': miesiace.attrs['end_date'],
+        'nazwa_pliku': nazwa_pliku,
+        'miesiac_rok': start_date.strftime('%B %Y').capitalize(),
+        'energia': float(miesiace['Energia_kWh'].sum()),
+        'wartosc': float(miesiace['Wartosc_PLN'].sum()),
+        'rozdzielczosc': miesiace.attrs['rozdzielczosc'],
+        'niedopasowane': miesiace.attrs['niedopasowane'],
+        'wierszy_na_s': round(miesiace.attrs['wierszy_na_s']),
+    }
+
+
+# Pamięć wyników plików między uruchomieniami; zmiana WERSJA_WYNIKOW unieważnia wszystkie wpisy
+WYNIKI_CACHE_FILE = CACHE_DIR / 'wyniki_cache.json'
+WERSJA_WYNIKOW = 1
+MAX_WPISOW_PAMIECI = 20_000
+
+
+def skrot_pliku(nazwa_pliku):
+    """SHA-256 zawartości pliku (czytanego blokami)."""
+    skrot = hashlib.sha256()
+    with open(nazwa_pliku, 'rb') as plik:
+        for blok in iter(lambda: plik.read(1 << 20), b''):
+            skrot.update(blok)
+    return skrot.hexdigest()
+
+
+def odcisk_cen(df_ceny):
+    """Skrót wycinka cen (znaczniki czasu i ceny); zmienia się przy każdej korekcie lub uzupełnieniu ceny."""
+    skrot = hashlib.sha256()
+    for kolumna in df_ceny.columns:
+        wartosci = df_ceny[kolumna]
+        if pd.api.types.is_datetime64_any_dtype(wartosci):
+            wartosci = wartosci.dt.tz_localize(None) if wartosci.dt.tz is not None else wartosci
+            skrot.update(wartosci.to_numpy(dtype='datetime64[ns]').tobytes())
+        else:
+            skrot.update(wartosci.to_numpy(dtype=np.float64).tobytes())
+    return skrot.hexdigest()[:32]
+
+
+def _odcisk_zakresu(magazyn, zakres, zlaczenie):
+    od, do, poziom = zakres
+    return odcisk_cen(magazyn.ceny_utc(od, do) if zlaczenie == 'sloty' else magazyn.ceny(od, do, poziom))
+
+
+class PamiecWynikow:
+    """Trwała pamięć wyników plików w JSON z usuwaniem najdawniej używanych wpisów (LRU).
+
+    Klucz to skrót zawartości CSV i parametrów obliczeń. Wpis pamięta zakres dób
+    i poziom cen pliku oraz odcisk wycinka cen, na którym liczono wynik, więc po
+    korekcie cen w tym zakresie wynik jest liczony ponownie.
+    """
+
+    def __init__(self, sciezka=WYNIKI_CACHE_FILE, max_wpisow=MAX_WPISOW_PAMIECI):
+        self.sciezka = sciezka
+        self.max_wpisow = max_wpisow
+        self.wpisy = OrderedDict()
+        self.zmieniona = False
+        try:
+            with open(sciezka, encoding='utf-8') as plik:
+                dane = json.load(plik)
+            if dane.get('wersja') == WERSJA_WYNIKOW:
+                self.wpisy = OrderedDict(dane.get('wpisy', []))
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Ostrzeżenie: Nie udało się odczytać pamięci wyników '{sciezka}': {e}")
+
+    @staticmethod
+    def klucz(skrot, **parametry):
+        return '|'.join([skrot] + [f'{k}={parametry[k]}' for k in sorted(parametry)])
+
+    def pobierz(self, klucz):
+        """Zwraca wpis (i oznacza go jako ostatnio użyty) albo None."""
+        wpis = self.wpisy.get(klucz)
+        if wpis is not None:
+            self.wpisy.move_to_end(klucz)
+            self.zmieniona = True
+        return wpis
+
+    def zapisz(self, klucz, zakres, odcisk, wynik):
+        wynik = {k: (v.isoformat() if isinstance(v, date) else v) for k, v in wynik.items()}
+        self.wpisy[klucz] = {'zakres': [zakres[0].isoformat(), zakres[1].isoformat(), zakres[2]],
+                             'odcisk_cen': odcisk, 'wynik': wynik}
+        self.wpisy.move_to_end(klucz)
+        while len(self.wpisy) > self.max_wpisow:
+            self.wpisy.popitem(last=False)
+        self.zmieniona = True
+
+    @staticmethod
+    def zakres(wpis):
+        od, do, poziom = wpis['zakres']
+        return date.fromisoformat(od), date.fromisoformat(do), poziom
+
+    @staticmethod
+    def wynik(wpis, nazwa_pliku):
+        wynik = dict(wpis['wynik'], nazwa_pliku=nazwa_pliku, z_pamieci=True)
+        for pole in ('start_date', 'end_date'):
+            wynik[pole] = date.fromisoformat(wynik[pole])
+        return wynik
+
+    def zamknij(self):
+        if not self.zmieniona:
+            return
+        os.makedirs(os.path.dirname(self.sciezka), exist_ok=True)
+        tmp = f'{self.sciezka}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as plik:
+            json.dump({'wersja': WERSJA_WYNIKOW, 'wpisy': list(self.wpisy.items())}, plik, ensure_ascii=False)
+        os.replace(tmp, self.sciezka)
+        self.zmieniona = False
+
+
+class ZapisWynikow:
+    """Strumieniowy zapis wyników do CSV lub JSONL (według rozszerzenia), wiersz po wierszu."""
+
+    POLA = ['nazwa_pliku', 'start_date', 'end_date', 'miesiac_rok', 'energia', 'wartosc', 'rozdzielczosc',
+            'niedopasowane', 'wierszy_na_s', 'z_pamieci', 'blad']
+
+    def __init__(self, sciezka):
+        self.jsonl = sciezka.lower().endswith(('.jsonl', '.json'))
+        self.plik = open(sciezka, 'w', encoding='utf-8', newline='')
+        if not self.jsonl:
+            self.csv = csv.DictWriter(self.plik, fieldnames=self.POLA, delimiter=';')
+            self.csv.writeheader()
+
+    def zapisz(self, wynik):
+        wiersz = {k: (v.isoformat() if hasattr(v, 'isoformat') else v) for k, v in wynik.items()}
+        if self.jsonl:
+            self.plik.write(json.dumps(wiersz, ensure_ascii=False) + '\n')
+        else:
+            self.csv.writerow(wiersz)
+        self.plik.flush()
+
+    def zamknij(self):
+        self.plik.close()
+
+
+def przetworz_wsadowo(pliki_csv, procesy=None, wyjscie=None, magazyn=None, zlaczenie='merge', porcja=None,
+                      pamiec=None):
+    """Przetwarza wiele plików: jedno pobranie cen dla sumy zakresów, obliczenia w puli procesów.
+
+    Wyniki są zapisywane do `wyjscie` (CSV/JSONL) w miarę kończenia kolejnych plików.
+    Przy `zlaczenie='sloty'` ceny są łączone po numerach slotów osi UTC (IndeksCen),
+    a liczba wierszy bez ceny trafia do pola 'niedopasowane'. Z `porcja` pliki są
+    liczone strumieniowo w stałej pamięci, po `porcja` wierszy naraz.
+
+    Z `pamiec` (PamiecWynikow) pliki o niezmienionej zawartości, dla których ceny
+    w ich zakresie też się nie zmieniły, nie są liczone ponownie; takie wyniki
+    mają pole 'z_pamieci'.
+    Zwraca listę słowników wyników (także tych z kluczem 'blad').
+    """
+    if magazyn is None:
+        magazyn = MagazynCen()
+    procesy = procesy or os.cpu_count() or 1
+    procesy = min(procesy, len(pliki_csv)) or 1
+    pula = ProcessPoolExecutor(max_workers=procesy) if procesy > 1 else None
+
+    try:
+        # Krok 0: skróty plików i wpisy z pamięci wyników (znany zakres dat pozwala pominąć czytanie pliku)
+        mapuj = pula.map if pula else map
+        klucze, trafienia = {}, {}
+        if pamiec is not None:
+            tryb = 'porcje' if porcja else 'calosc'
+            for nazwa, skrot in zip(pliki_csv, mapuj(skrot_pliku, pliki_csv)):
+                klucze[nazwa] = pamiec.klucz(skrot, zlaczenie=zlaczenie, tryb=tryb)
+                wpis = pamiec.pobierz(klucze[nazwa])
+                if wpis is not None:
+                    trafienia[nazwa] = wpis
+
+        # Krok 1: zakresy dat pozostałych plików (czytana jest tylko kolumna z datą)
+        do_wczytania = [nazwa for nazwa in pliki_csv if nazwa not in trafienia]
+        zakresy_plikow = dict(zip(do_wczytania, mapuj(zakres_dat_pliku, do_wczytania, [porcja] * len(do_wczytania))))
+        zakresy_plikow.update({nazwa: pamiec.zakres(wpis) for nazwa, wpis in trafienia.items()})
+        zakresy = [z for z in zakresy_plikow.values() if z]
+
+        # Krok 2: jedno pobranie cen dla sumy zakresów, osobno dla każdej potrzebnej rozdzielczości
+        df_ceny = {}
+        for poziom in sorted({z[2] for z in zakresy}):
+            czesci = []
+            for od, do in scal_zakresy([(od, do) for od, do, p in zakresy if p == poziom]):
+                if zlaczenie == 'sloty':
+                    czesci.append(magazyn.ceny_utc(od, do))
+                    continue
+                df = pobierz_ceny_rynkowe(od, do, magazyn, poziom)
+                if df is not None:
+                    czesci.append(df)
+            if czesci and zlaczenie == 'sloty':
+                df_ceny[poziom] = IndeksCen.z_cen_utc(pd.concat(czesci, ignore_index=True), poziom)
+            elif czesci:
+                df_ceny[poziom] = pd.concat(czesci, ignore_index=True)
+    finally:
+        if pula:
+            pula.shutdown()
+
+    # Krok 2a: wynik z pamięci jest ważny tylko przy niezmienionych cenach w zakresie pliku
+    odciski = {}
+    for nazwa in list(trafienia):
+        odciski[nazwa] = _odcisk_zakresu(magazyn, zakresy_plikow[nazwa], zlaczenie)
+        if odciski[nazwa] != trafienia[nazwa]['odcisk_cen']:
+            del trafienia[nazwa]
+
+    # Krok 3: obliczenia równolegle, wyniki zapisywane strumieniowo
+    zapis = ZapisWynikow(wyjscie) if wyjscie else None
+    wyniki = []
+
+    def dodaj(wynik):
+        nazwa = wynik['nazwa_pliku']
+        if pamiec is not None and 'blad' not in wynik and not wynik.get('z_pamieci'):
+            zakres = zakresy_plikow.get(nazwa) or (wynik['start_date'], wynik['end_date'], wynik['rozdzielczosc'])
+            odcisk = odciski.get(nazwa) or _odcisk_zakresu(magazyn, zakres, zlaczenie)
+            pamiec.zapisz(klucze[nazwa], zakres, odcisk, wynik)
+        wyniki.append(wynik)
+        if zapis:
+            zapis.zapisz(wynik)
+
+    do_obliczenia = [nazwa for nazwa in pliki_csv if nazwa not in trafienia]
+    try:
+        for nazwa, wpis in trafienia.items():
+            dodaj(pamiec.wynik(wpis, nazwa))
+        if procesy > 1 and len(do_obliczenia) > 1:
+            with ProcessPoolExecutor(max_workers=procesy, initializer=_inicjuj_pracownika,
+                                     initargs=(df_ceny,)) as pula:
+                zadania = [pula.submit(przetworz_plik, nazwa, None, porcja) for nazwa in do_obliczenia]
+                for zadanie in as_completed(zadania):
+                    dodaj(zadanie.result())
+        else:
+            for nazwa in do_obliczenia:
+                dodaj(przetworz_plik(nazwa, df_ceny, porcja))
+    finally:
+        if zapis:
+            zapis.zamknij()
+        if pamiec is not None:
+            pamiec.zamknij()
+    return wyniki
+
+
+# Ścieżka lekka: małe pliki są liczone bez pandas i NumPy, na cenach z plików poziomów
+# (rce.bin, rce_h.bin); przy czymkolwiek nietypowym main() przechodzi na ścieżkę pandas
+PROG_LEKKI_BAJTY = 2 * 1024 * 1024
+_DZIEN_1970 = date(1970, 1, 1).toordinal()
+
+
+def _sekundy_znacznika(znacznik):
+    """Sekundy od 1970 (czas lokalny bez strefy) dla 'RRRR-MM-DD GG:MM'; ValueError jak w parsuj_znaczniki_szybko."""
+    if len(znacznik) != 16 or any(znacznik[i] != chr(z) for i, z in _SEPARATORY.items()) or \
+            not all(znacznik[i].isdigit() for i in _CYFRY):
+        raise ValueError('nieobsługiwany format daty')
+    godzina, minuta = int(znacznik[11:13]), int(znacznik[14:16])
+    if godzina > 24 or minuta > 59 or (godzina == 24 and minuta != 0):
+        raise ValueError('nieobsługiwany format daty')
+    doba = date(int(znacznik[:4]), int(znacznik[5:7]), int(znacznik[8:10]))
+    return (doba.toordinal() - _DZIEN_1970) * 86400 + godzina * 3600 + minuta * 60
+
+
+def wczytaj_lekko(nazwa_pliku):
+    """Czyta plik eLicznika modułem csv: lista (sekundy, kWh) albo None, gdy plik wymaga ścieżki pandas."""
+    try:
+        with open(nazwa_pliku, encoding='utf-8', newline='') as plik:
+            czytnik = csv.reader(plik, delimiter=';')
+            naglowek = [kolumna.strip().lstrip('\ufeff') for kolumna in next(czytnik)]
+            i_daty, i_energii = naglowek.index(KOLUMNA_DATY), naglowek.index(KOLUMNA_ENERGII)
+            wiersze = []
+            for wiersz in czytnik:
+                if not wiersz or not wiersz[i_daty]:
+                    continue
+                energia = wiersz[i_energii].strip()
+                wiersze.append((_sekundy_znacznika(wiersz[i_daty]),
+                                float(energia.replace(',', '.')) if energia else float('nan')))
+    except (OSError, ValueError, IndexError, StopIteration):
+        return None
+    return wiersze or None
+
+
+def _poziom_lekko(sekundy):
+    """Jak rozdzielczosc_danych(): mediana kroków między kolejnymi znacznikami."""
+    unikalne = sorted(set(sekundy))
+    kroki = [b - a for a, b in zip(unikalne, unikalne[1:])]
+    return '15min' if kroki and statistics.median(kroki) <= 900 else 'h'
+
+
+def _ceny_lekko(zakresy, poziom, katalog=None):
+    """Ceny z pliku poziomu dla zakresów dób, jak MagazynCen._z_poziomu(); None przy luce.
+
+    Zwraca słownik {sekundy końca interwału: cena} dla znanych slotów zakresów. Luką
+    jest zakres poza plikiem, brak w pliku godzinowym lub doba z niepełnym kompletem
+    slotów 15-minutowych (pełna ścieżka pobrałaby ją z API).
+    """
+    katalog = Path(katalog) if katalog else Path(RCE_FILE).parent
+    plik = katalog / POZIOMY[poziom][0].name
+    if not plik.exists():
+        return None
+    epoka, krok, liczba = rce_bin.read_header(plik)
+    ceny = {}
+    for od, do in zakresy:
+        pierwszy = (od.toordinal() - _DZIEN_1970) * 86400 + 900
+        ostatni = (do.toordinal() + 1 - _DZIEN_1970) * 86400
+        start, stop = (pierwszy - epoka) // krok, (ostatni - epoka) // krok + 1
+        if start < 0 or stop > liczba:
+            return None
+        _, _, wartosci = rce_bin.read_slots(plik, start, stop)
+        sloty_doby = Counter()
+        for i, wartosc in enumerate(wartosci):
+            if wartosc == wartosc:
+                sekundy = epoka + (start + i) * krok
+                ceny[sekundy] = wartosc
+                sloty_doby[(sekundy - 1) // 86400] += 1
+        if sum(sloty_doby.values()) == len(wartosci):
+            continue
+        # luki poziomu 15-minutowego to tylko brakujące klucze (np. zmiana czasu na letni);
+        # pełna ścieżka bierze wtedy klucze rce.json bez pobierania, o ile doby są kompletne
+        if poziom != '15min' or any(sloty_doby[d - _DZIEN_1970] < MIN_SLOTOW_DOBY
+                                    for d in range(od.toordinal(), do.toordinal() + 1)):
+            return None
+    return ceny
+
+
+def oblicz_lekko(pliki_csv, katalog_cen=None):
+    """Liczy wyniki plików bez pandas i NumPy, tak jak przetworz_wsadowo() z `zlaczenie='merge'`.
+
+    Zwraca listę słowników wyników albo None, gdy któryś plik wymaga pełnej ścieżki
+    (nietypowy format, brak danych lub ceny spoza przygotowanych plików poziomów).
+    """
+    dane = {}
+    for nazwa in pliki_csv:
+        start = time.perf_counter()
+        wiersze = wczytaj_lekko(nazwa)
+        if wiersze is None:
+            return None
+        czas = time.perf_counter() - start
+        sekundy = [t for t, _ in wiersze]
+        metrics.emit('stage', stage='csv_read', seconds=round(czas, 6), rows=len(wiersze), plik=str(nazwa),
+                     tryb='lekki')
+        dane[nazwa] = (wiersze, min(sekundy), max(sekundy), _poziom_lekko(sekundy),
+                       len(wiersze) / czas if czas > 0 else float('inf'))
+
+    # te same zakresy cen, co w przetworz_wsadowo(): suma zakresów dób plików dla każdego poziomu
+    ceny = {}
+    for poziom in {d[3] for d in dane.values()}:
+        zakresy = scal_zakresy([(date.fromordinal(d[1] // 86400 + _DZIEN_1970),
+                                 date.fromordinal(d[2] // 86400 + _DZIEN_1970))
+                                for d in dane.values() if d[3] == poziom])
+        ceny[poziom] = _ceny_lekko(zakresy, poziom, katalog_cen)
+        if ceny[poziom] is None:
+            return None
+
+    wyniki = []
+    with metrics.stage('sum', rows=sum(len(d[0]) for d in dane.values()), tryb='lekki'):
+        for nazwa, (wiersze, pierwszy, ostatni, poziom, wierszy_na_s) in dane.items():
+            energia = wartosc = 0.0
+            for t, kwh in wiersze:
+                cena = ceny[poziom].get(t)
+                if cena is not None and kwh > 0:
+                    energia += kwh
+                    wartosc += kwh * cena
+            start_date = date.fromordinal(pierwszy // 86400 + _DZIEN_1970)
+            wyniki.append({
+                'start_date': start_date,
+                'end_date': date.fromordinal(ostatni // 86400 + _DZIEN_1970),
+                'nazwa_pliku': nazwa,
+                'miesiac_rok': start_date.strftime('%B %Y').capitalize(),
+                'energia': energia,
+                'wartosc': wartosc,
+                'rozdzielczosc': poziom,
+                'wierszy_na_s': round(wierszy_na_s),
+            })
+    return wyniki
+
+
+def main(argv=None):
+    """Główna funkcja: wyszukuje pliki CSV, przetwarza je i na końcu wyświetla posortowane podsumowanie."""
+    parser = argparse.ArgumentParser(description='Kalkulator wartości depozytu prosumenckiego (RCE).')
+    parser.add_argument('wejscie', nargs='?', default='*.csv',
+                        help='katalog z plikami CSV lub wzorzec glob (domyślnie: *.csv w bieżącym folderze)')
+    parser.add_argument('--procesy', type=int, default=None,
+                        help='liczba procesów roboczych (domyślnie: liczba rdzeni, 1 = bez puli)')
+    parser.add_argument('--wyjscie', help='plik wyników .csv lub .jsonl zapisywany na bieżąco')
+    parser.add_argument('--zlaczenie', choices=['merge', 'sloty'], default='merge',
+                        help="sposób łączenia energii z cenami: 'merge' (pd.merge) lub 'sloty' (indeks osi UTC)")
+    parser.add_argument('--porcje', type=int, default=None, metavar='WIERSZE',
+                        help='licz strumieniowo, czytając pliki porcjami po tyle wierszy (stała pamięć)')
+    parser.add_argument('--bez-pamieci', action='store_true',
+                        help='nie używaj pamięci wyników (.cache/wyniki_cache.json), licz wszystkie pliki od nowa')
+    parser.add_argument('--scenariusze', metavar='PLIK',
+                        help='zamiast pojedynczego wyniku policz wszystkie warianty rozliczenia (RCE godzinowa '
+                             'i 15-minutowa, RCEm, ceny ujemne obcięte lub nie, z mnożnikiem i bez) do pliku CSV')
+    parser.add_argument('--metryki', metavar='PLIK',
+                        help="zapisuj czasy etapów i zapytań HTTP jako linie JSON ('-' = stderr)")
+    parser.add_argument('--profil', metavar='PLIK', help='zapisz statystyki cProfile przebiegu do PLIK')
+    parser.add_argument('--pelny', action='store_true',
+                        help='zawsze licz ścieżką pandas (bez lekkiej ścieżki dla małych plików)')
+    args = parser.parse_args(argv)
+    if args.metryki:
+        metrics.enable(args.metryki)
+    metrics.emit('startup', seconds=round(time.perf_counter() - _START, 6))
+    ustaw_polskie_miesiace()
+    try:
+        with metrics.profile(args.profil):
+            _uruchom(args)
+    finally:
+        metrics.emit('finish', seconds=round(time.perf_counter() - _START, 6), pandas=loaded('pandas'))
+        metrics.disable()
+
+
+def _uruchom_scenariusze(pliki_csv, sciezka):
+    """Liczy wszystkie warianty rozliczenia dla plików, zapisuje je do CSV i drukuje sumy."""
+    df_scenariusze = oblicz_scenariusze(wczytaj_wiele_licznikow(pliki_csv))
+    df_scenariusze.to_csv(sciezka, sep=';', index=False)
+    print("\n================== PORÓWNANIE WARIANTÓW ===================")
+    sumy = df_scenariusze.groupby(['Ceny', 'Obciete', 'Z_mnoznikiem'], sort=True)[['Energia_kWh', 'Wartosc_PLN']].sum()
+    for (ceny, obciete, z_mnoznikiem), wiersz in sumy.iterrows():
+        opis = f"{ceny}, ceny ujemne {'obcięte' if obciete else 'bez obcięcia'}" + (', ×1.23' if z_mnoznikiem else '')
+        print(f" {opis:<50} {wiersz['Energia_kWh']:>12.3f} kWh {wiersz['Wartosc_PLN']:>12.2f} PLN")
+    print("============================================================")
+    print(f"Warianty zapisano do pliku {sciezka}.")
+
+
+def _uruchom(args):
+    """Przetwarza pliki według argumentów z main() i drukuje podsumowanie."""
     print("Rozpoczynam przetwarzanie plików...")
-    # Wyszukanie wszystkich plików z rozszerzeniem .csv w bieżącym folderze
-    pliki_csv = glob.glob('*.csv')
-    
+    pliki_csv = znajdz_pliki(args.wejscie)
+
     if not pliki_csv:
         print("Nie znaleziono żadnych plików CSV w tym folderze.")
         print("Upewnij się, że skrypt jest w tym samym folderze co Twoje pliki z danymi.")
         return
 
     print(f"Znaleziono {len(pliki_csv)} plików do przetworzenia.")
-    
-    wyniki = []
 
-    # Pętla przetwarzająca każdy znaleziony plik
-    for nazwa_pliku in pliki_csv:
-        df_energia = wczytaj_dane_uzytkownika(nazwa_pliku)
-        
-        if df_energia is None or df_energia.empty:
-            print(f"Pominięto plik {nazwa_pliku} z powodu błędu lub braku danych.")
-            continue
-            
-        start_date = df_energia['DateTime'].min().date()
-        end_date = df_energia['DateTime'].max().date()
-        
-        df_ceny = pobierz_ceny_rynkowe(start_date, end_date)
-        
-        if df_ceny is None:
-            print(f"Nie udało się pobrać cen dla pliku {nazwa_pliku}. Pomijam.")
-            continue
-            
-        wartosc, energia = oblicz_wartosc_depozytu(df_energia, df_ceny)
-        
-        # Zapisanie wyników do późniejszego wyświetlenia
-        wyniki.append({
-            'start_date': start_date,
-            'nazwa_pliku': nazwa_pliku,
-            'miesiac_rok': start_date.strftime('%B %Y').capitalize(),
-            'energia': energia,
-            'wartosc': wartosc
-        })
+    if args.scenariusze:
+        _uruchom_scenariusze(pliki_csv, args.scenariusze)
+        return
+
+    wyniki_lekkie = None
+    if not (args.pelny or args.porcje or args.zlaczenie != 'merge') and \
+            sum(os.path.getsize(nazwa) for nazwa in pliki_csv) <= PROG_LEKKI_BAJTY:
+        wyniki_lekkie = oblicz_lekko(pliki_csv)
+    if wyniki_lekkie is not None and args.wyjscie:
+        zapis = ZapisWynikow(args.wyjscie)
+        for wynik in wyniki_lekkie:
+            zapis.zapisz(wynik)
+        zapis.zamknij()
+
+    pamiec = None if args.bez_pamieci or wyniki_lekkie is not None else PamiecWynikow()
+    wyniki = []
+    for wynik in wyniki_lekkie or przetworz_wsadowo(pliki_csv, procesy=args.procesy, wyjscie=args.wyjscie,
+                                                    zlaczenie=args.zlaczenie, porcja=args.porcje, pamiec=pamiec):
+        if 'blad' in wynik:
+            print(f"Pominięto plik {wynik['nazwa_pliku']}: {wynik['blad']}.")
+        else:
+            if wynik.get('niedopasowane'):
+                print(f"Uwaga: {wynik['nazwa_pliku']} - {wynik['niedopasowane']} wierszy bez ceny RCE.")
+            wyniki.append(wynik)
 
     # Sortowanie wyników chronologicznie
-    wyniki.sort(key=lambda x: x['start_date'])
+    wyniki.sort(key=lambda x: (x['start_date'], x['nazwa_pliku']))
 
     # Wyświetlanie podsumowania
     print("\n\n================== PODSUMOWANIE KOŃCOWE ===================")
@@ -185,7 +1212,12 @@ def main():
             print(f" Całkowita energia oddana do sieci: {wynik['energia']:.3f} kWh")
             print(f" Obliczona wartość depozytu: {wynik['wartosc']:.2f} PLN")
     print("============================================================")
+    z_pamieci = sum(1 for wynik in wyniki if wynik.get('z_pamieci'))
+    if z_pamieci:
+        print(f"Wyniki {z_pamieci} z {len(wyniki)} plików wzięto z pamięci wyników (bez zmian w danych i cenach).")
+    if args.wyjscie:
+        print(f"Wyniki zapisano do pliku {args.wyjscie}.")
     print("\nZakończono przetwarzanie wszystkich plików.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
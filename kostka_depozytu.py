@@ -0,0 +1,258 @@
+"""
+Kostka agregatów depozytu: licznik × miesiąc × dzień tygodnia × godzina doby.
+
+Dla każdego licznika i miesiąca rozliczeniowego kostka trzyma blok 7 × 24 komórek
+z trzema miarami liczonymi tak jak w oblicz_wartosc_depozytu() (tylko energia
+oddana, z ceną):
+
+    Energia_kWh          energia oddana
+    Wartosc_PLN          jej wartość po cenach RCE
+    Energia_zerowa_kWh   energia oddana w interwałach z ceną 0 (także ujemną obciętą do 0)
+
+Dzień tygodnia i godzina to początek interwału (znacznik eLicznika to jego koniec,
+więc interwał kończący się o 13:00 należy do godziny 12), dzień tygodnia 0 to
+poniedziałek. Licznik to nazwa pliku bez rozszerzenia, jak w wczytaj_wiele_licznikow().
+
+Kostka jest zapisywana w `.cache/kostka.npz` i aktualizowana przyrostowo: plik CSV
+jest czytany ponownie tylko wtedy, gdy zmieniła się jego zawartość albo ceny w jego
+zakresie dat, a jego bloki zastępują poprzednie bloki tego licznika z tych miesięcy.
+Zapytania (wycinek()) sumują gotowe bloki i nie sięgają do danych interwałowych:
+
+    python kostka_depozytu.py pliki/                           # dodaj nowe i zmienione pliki
+    python kostka_depozytu.py --wymiary godzina --od 2025-04   # wartość wg godziny doby
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+import kalkulator_depozytu as kd
+import metrics
+from eksport_parquet import identyfikator_licznika
+from magazyn_cen import CACHE_DIR, domyslny_magazyn
+
+KOSTKA_FILE = CACHE_DIR / 'kostka.npz'
+WERSJA_KOSTKI = 1
+WYMIARY = ('licznik', 'miesiac', 'dzien_tygodnia', 'godzina')
+MIARY = ('Energia_kWh', 'Wartosc_PLN', 'Energia_zerowa_kWh')
+DNI, GODZINY = 7, 24
+
+
+def _komorki(daty):
+    """Numer miesiąca (datetime64[M] jako int) i komórki dzień tygodnia × godzina początku interwału."""
+    poczatek = daty - np.timedelta64(1, 's')
+    doby = poczatek.astype('datetime64[D]')
+    dzien_tygodnia = (doby.astype(np.int64) + 3) % DNI  # 1970-01-01 był czwartkiem
+    godzina = (poczatek - doby).astype('timedelta64[h]').astype(np.int64)
+    return poczatek.astype('datetime64[M]').astype(np.int64), dzien_tygodnia * GODZINY + godzina
+
+
+def _nazwa_miesiaca(numer):
+    return f'{numer // 12 + 1970}-{numer % 12 + 1:02d}'
+
+
+class KostkaDepozytu:
+    """Bloki {(licznik, 'RRRR-MM'): tablica 7 × 24 × 3} z opisem plików, z których powstały."""
+
+    def __init__(self, sciezka=KOSTKA_FILE):
+        self.sciezka = sciezka
+        self.bloki = {}
+        self.pliki = {}  # nazwa pliku -> skrot, odcisk_cen, zakres, licznik, miesiace
+        self.zmieniona = False
+        try:
+            with np.load(sciezka, allow_pickle=False) as dane:
+                opis = json.loads(str(dane['opis']))
+                if opis.get('wersja') == WERSJA_KOSTKI:
+                    self.pliki = opis['pliki']
+                    klucze = zip(dane['liczniki'].tolist(), dane['miesiace'].tolist())
+                    self.bloki = dict(zip(klucze, dane['wartosci']))
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Ostrzeżenie: Nie udało się odczytać kostki '{sciezka}': {e}")
+
+    def _policz_plik(self, nazwa_pliku, magazyn, wierszy):
+        """Bloki miesięcy pliku {numer miesiąca: 7 × 24 × 3} i jego zakres (od, do, poziom) albo None."""
+        sumy = {}
+        pierwsza = ostatnia = poziom = None
+        for porcja, daty, ceny, poziom in kd.porcje_z_cenami(nazwa_pliku, magazyn=magazyn, wierszy=wierszy):
+            pierwsza = daty.min() if pierwsza is None else min(pierwsza, daty.min())
+            ostatnia = daty.max() if ostatnia is None else max(ostatnia, daty.max())
+            energia = porcja['Energia_kWh'].to_numpy(dtype=np.float64)
+            oddana = ~np.isnan(ceny) & (energia > 0)
+            if not oddana.any():
+                continue
+            miesiace, komorki = _komorki(daty[oddana])
+            energia, ceny = energia[oddana], ceny[oddana]
+            numery, pozycje = np.unique(miesiace, return_inverse=True)
+            indeks = pozycje * (DNI * GODZINY) + komorki
+            rozmiar = len(numery) * DNI * GODZINY
+            miary = np.stack([np.bincount(indeks, weights=w, minlength=rozmiar)
+                              for w in (energia, energia * ceny, np.where(ceny <= 0, energia, 0.0))], axis=-1)
+            for numer, blok in zip(numery.tolist(), miary.reshape(len(numery), DNI, GODZINY, len(MIARY))):
+                if numer in sumy:
+                    sumy[numer] += blok
+                else:
+                    sumy[numer] = blok.copy()
+        if poziom is None:
+            return None
+        zakres = (pd.Timestamp(pierwsza).date(), pd.Timestamp(ostatnia).date(), poziom)
+        return sumy, zakres
+
+    def aktualizuj(self, pliki_csv, magazyn=None, wierszy=kd.WIERSZY_W_PORCJI):
+        """Dodaje nowe i zmienione pliki; zwraca listę plików przeliczonych (pominięte się nie zmieniły)."""
+        if magazyn is None:
+            magazyn = domyslny_magazyn()
+        przeliczone = []
+        for nazwa_pliku in pliki_csv:
+            klucz = os.path.abspath(nazwa_pliku)
+            try:
+                skrot = kd.skrot_pliku(nazwa_pliku)
+            except FileNotFoundError:
+                print(f"❌ BŁĄD: Nie znaleziono pliku '{nazwa_pliku}'.")
+                continue
+            licznik = identyfikator_licznika(nazwa_pliku)
+            # bloki są kluczowane licznikiem (nazwą pliku bez rozszerzenia), więc jeden licznik = jeden plik
+            inny = next((k for k, o in self.pliki.items() if o['licznik'] == licznik and k != klucz), None)
+            if inny is not None and os.path.exists(inny):
+                print(f"❌ BŁĄD: Plik '{nazwa_pliku}' ma ten sam identyfikator licznika '{licznik}' "
+                      f"co '{inny}'; zmień nazwę jednego z plików.")
+                continue
+            # plik przeniesiony w inne miejsce przejmuje bloki swojego licznika
+            opis = self.pliki.get(inny if inny is not None else klucz)
+            if opis is not None and opis['skrot'] == skrot:
+                od, do, poziom = opis['zakres']
+                zakres = (pd.Timestamp(od).date(), pd.Timestamp(do).date(), poziom)
+                if kd._odcisk_zakresu(magazyn, zakres, 'merge') == opis['odcisk_cen']:
+                    if inny is not None:
+                        self.pliki[klucz] = self.pliki.pop(inny)
+                        self.zmieniona = True
+                    continue
+
+            with metrics.stage('cube_update', plik=str(nazwa_pliku)):
+                try:
+                    wynik = self._policz_plik(nazwa_pliku, magazyn, wierszy)
+                except Exception as e:
+                    print(f"❌ BŁĄD: Wystąpił nieoczekiwany problem podczas wczytywania pliku '{nazwa_pliku}': {e}")
+                    continue
+            if wynik is None:
+                print(f"❌ BŁĄD: Plik '{nazwa_pliku}' nie zawiera danych z poprawną datą.")
+                continue
+            sumy, zakres = wynik
+
+            if opis is not None:
+                for miesiac in opis['miesiace']:
+                    self.bloki.pop((opis['licznik'], miesiac), None)
+            if inny is not None:
+                del self.pliki[inny]
+            miesiace = [_nazwa_miesiaca(numer) for numer in sorted(sumy)]
+            for numer, miesiac in zip(sorted(sumy), miesiace):
+                self.bloki[(licznik, miesiac)] = sumy[numer]
+            self.pliki[klucz] = {'skrot': skrot, 'odcisk_cen': kd._odcisk_zakresu(magazyn, zakres, 'merge'),
+                                 'zakres': [zakres[0].isoformat(), zakres[1].isoformat(), zakres[2]],
+                                 'licznik': licznik, 'miesiace': miesiace}
+            self.zmieniona = True
+            przeliczone.append(nazwa_pliku)
+        return przeliczone
+
+    def wycinek(self, wymiary=(), liczniki=None, miesiace=None, dni_tygodnia=None, godziny=None):
+        """Sumy miar wycinka kostki pogrupowane po `wymiary` (podzbiór WYMIARY).
+
+        Pozostałe argumenty zawężają wycinek: kolekcje liczników, miesięcy 'RRRR-MM',
+        dni tygodnia (0 = poniedziałek) i godzin doby; None to brak ograniczenia.
+        Zwraca ramkę z kolumnami wymiarów, MIARY i Cena_srednia_PLN_kWh.
+        """
+        wymiary = list(wymiary)
+        nieznane = set(wymiary) - set(WYMIARY)
+        if nieznane:
+            raise ValueError(f"nieznane wymiary: {', '.join(sorted(nieznane))}")
+        klucze = sorted(k for k in self.bloki
+                        if (liczniki is None or k[0] in liczniki) and (miesiace is None or k[1] in miesiace))
+        dni = np.array(sorted(dni_tygodnia) if dni_tygodnia is not None else range(DNI), dtype=np.int64)
+        godz = np.array(sorted(godziny) if godziny is not None else range(GODZINY), dtype=np.int64)
+
+        if klucze:
+            kostka = np.stack([self.bloki[k] for k in klucze])[:, dni][:, :, godz]
+        else:
+            kostka = np.zeros((0, len(dni), len(godz), len(MIARY)))
+        # wymiary spoza grupowania są sumowane od razu na blokach
+        if 'dzien_tygodnia' not in wymiary:
+            kostka, dni = kostka.sum(axis=1, keepdims=True), np.array([-1])
+        if 'godzina' not in wymiary:
+            kostka, godz = kostka.sum(axis=2, keepdims=True), np.array([-1])
+
+        na_blok = len(dni) * len(godz)
+        df = pd.DataFrame({
+            'licznik': np.repeat([k[0] for k in klucze], na_blok).astype(str),
+            'miesiac': np.repeat([k[1] for k in klucze], na_blok).astype(str),
+            'dzien_tygodnia': np.tile(np.repeat(dni, len(godz)), len(klucze)),
+            'godzina': np.tile(godz, len(klucze) * len(dni)),
+        })
+        df[list(MIARY)] = kostka.reshape(-1, len(MIARY))
+        if wymiary:
+            df = df.groupby(wymiary, sort=True)[list(MIARY)].sum().reset_index()
+        else:
+            df = df[list(MIARY)].sum().to_frame().T
+        df['Cena_srednia_PLN_kWh'] = df['Wartosc_PLN'] / df['Energia_kWh'].where(df['Energia_kWh'] > 0)
+        return df
+
+    def zamknij(self):
+        """Zapisuje kostkę (atomowo), jeśli się zmieniła."""
+        if not self.zmieniona:
+            return
+        os.makedirs(os.path.dirname(self.sciezka), exist_ok=True)
+        klucze = sorted(self.bloki)
+        tmp = f'{self.sciezka}.tmp'
+        with open(tmp, 'wb') as plik:
+            np.savez(plik,
+                     opis=np.array(json.dumps({'wersja': WERSJA_KOSTKI, 'pliki': self.pliki}, ensure_ascii=False)),
+                     liczniki=np.array([k[0] for k in klucze], dtype=str),
+                     miesiace=np.array([k[1] for k in klucze], dtype=str),
+                     wartosci=np.array([self.bloki[k] for k in klucze]).reshape(-1, DNI, GODZINY, len(MIARY)))
+        os.replace(tmp, self.sciezka)
+        self.zmieniona = False
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Kostka agregatów depozytu: licznik × miesiąc × dzień tygodnia × godzina.')
+    parser.add_argument('wejscie', nargs='?',
+                        help='katalog z plikami CSV lub wzorzec glob do dodania (bez niego tylko zapytanie)')
+    parser.add_argument('--kostka', default=str(KOSTKA_FILE), help=f'plik kostki (domyślnie: {KOSTKA_FILE})')
+    parser.add_argument('--wymiary', default='godzina',
+                        help=f"wymiary grupowania oddzielone przecinkami, z: {', '.join(WYMIARY)} (domyślnie: godzina)")
+    parser.add_argument('--licznik', action='append', help='tylko ten licznik (można powtarzać)')
+    parser.add_argument('--od', metavar='RRRR-MM', help='pierwszy miesiąc wycinka')
+    parser.add_argument('--do', metavar='RRRR-MM', help='ostatni miesiąc wycinka')
+    parser.add_argument('--porcje', type=int, default=kd.WIERSZY_W_PORCJI, metavar='WIERSZE',
+                        help=f'liczba wierszy CSV w jednej porcji (domyślnie: {kd.WIERSZY_W_PORCJI})')
+    args = parser.parse_args(argv)
+
+    kostka = KostkaDepozytu(args.kostka)
+    if args.wejscie:
+        pliki_csv = kd.znajdz_pliki(args.wejscie)
+        if not pliki_csv:
+            print("Nie znaleziono żadnych plików CSV.")
+        try:
+            przeliczone = kostka.aktualizuj(pliki_csv, wierszy=args.porcje)
+        finally:
+            kostka.zamknij()
+        print(f"Przeliczono {len(przeliczone)} z {len(pliki_csv)} plików; pozostałe bez zmian.")
+
+    miesiace = None
+    if args.od or args.do:
+        miesiace = {m for _, m in kostka.bloki if (not args.od or m >= args.od) and (not args.do or m <= args.do)}
+    wymiary = [w.strip() for w in args.wymiary.split(',') if w.strip()]
+    try:
+        wycinek = kostka.wycinek(wymiary, liczniki=args.licznik, miesiace=miesiace)
+    except ValueError as e:
+        print(f"❌ BŁĄD: {e}")
+        return 1
+    with pd.option_context('display.max_rows', None, 'display.width', 200):
+        print(wycinek.round(3).to_string(index=False))
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
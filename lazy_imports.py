@@ -0,0 +1,42 @@
+"""
+Deferred imports of heavy modules (pandas, NumPy, requests) for fast CLI start-up.
+
+`lazy_import('pandas')` returns a module object at once and executes the real import
+on first attribute access, so a module can keep `pd = lazy_import('pandas')` at the
+top and call `pd.DataFrame` as usual, while a run that never touches pandas never
+pays for importing it. A module that is already imported is returned unchanged.
+"""
+from __future__ import annotations
+
+import importlib.util
+import sys
+from types import ModuleType
+
+# names registered by lazy_import(); their module's type becomes ModuleType once executed
+_registered: set[str] = set()
+
+
+def lazy_import(name: str) -> ModuleType:
+    """Return `name` from sys.modules, or a lazily executed module registered there."""
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f'No module named {name!r}', name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    _registered.add(name)
+    return module
+
+
+def loaded(name: str) -> bool:
+    """True once `name` has really been executed (not just registered lazily)."""
+    module = sys.modules.get(name)
+    if module is None:
+        return False
+    # type(), not module.__class__: any attribute access on a lazy module executes it
+    return name not in _registered or type(module) is ModuleType
@@ -0,0 +1,320 @@
+"""
+Lokalny magazyn cen RCE współdzielony przez wszystkie pliki przetwarzane w jednym uruchomieniu.
+
+Ceny są wyszukiwane kolejno w:
+  1. `rce.json` z repozytorium (utrzymywanym przez update_rce.py) wraz z dziennikiem
+     `rce_journal.jsonl`, jeśli update_rce.py działa w trybie `--journal`,
+  2. pamięci podręcznej na dysku (`.cache/rce_cache.json`) z wcześniej pobranymi dobami,
+  3. API PSE - wyłącznie dla brakujących dób, najwyżej raz na uruchomienie.
+
+Klucze mają ten sam format co w `rce.json` (ISO, koniec 15-minutowego interwału),
+ceny są w PLN/kWh, a ceny ujemne są zerowane - tak samo jak w `rce.json` i `script.js`.
+
+Ceny 15-minutowe, godzinowe, dobowe i miesięczne są w pierwszej kolejności czytane
+z poziomów przygotowanych przez update_rce.py (`rce.bin`, `rce_h.bin`, `rce_d.bin`,
+`rce_monthly.json`); uśrednianie w chwili zapytania dotyczy tylko dób spoza nich.
+"""
+from __future__ import annotations
+
+import bisect
+import json
+from collections import Counter
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import metrics
+import rce_bin
+import update_rce
+from lazy_imports import lazy_import
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+RCE_FILE = update_rce.OUT_FILE
+CACHE_DIR = Path(__file__).parent / '.cache'
+CACHE_FILE = CACHE_DIR / 'rce_cache.json'
+JOURNAL_FILE = update_rce.JOURNAL_FILE
+
+# Poziomy cen: nazwa -> (plik przygotowany przez update_rce.py, reguła resample)
+POZIOMY = {
+    '15min': (update_rce.BIN_FILE, None),
+    'h': (update_rce.LEVEL_FILES['h'][0], 'h'),
+    'D': (update_rce.LEVEL_FILES['D'][0], 'D'),
+}
+MONTHLY_FILE = update_rce.MONTHLY_FILE
+NEGATIVE_FILE = update_rce.NEGATIVE_FILE
+
+# Strefa czasowa kluczy bez przesunięcia (czas polski, z przejściami letni/zimowy)
+STREFA = 'Europe/Warsaw'
+
+# Doba ze zmianą czasu na letni ma 23 godziny, czyli 92 interwały 15-minutowe.
+# Doba z mniejszą liczbą cen jest traktowana jako niekompletna i pobierana ponownie.
+MIN_SLOTOW_DOBY = 92
+
+
+def doba_handlowa(klucz: str) -> date:
+    """Zwraca dobę handlową dla klucza końca interwału (północ należy do doby poprzedniej)."""
+    doba = date.fromisoformat(klucz[:10])
+    if klucz[11:19] == '00:00:00':
+        doba -= timedelta(days=1)
+    return doba
+
+
+def klucz_poczatku_doby(doba: date) -> str:
+    """Najmniejszy klucz ISO, który już nie należy do doby `doba` (koniec doby poprzedniej)."""
+    return f'{doba.isoformat()}T00:00:00'
+
+
+def zakresy_ciagle(doby: list[date]) -> list[tuple[date, date]]:
+    """Łączy posortowane doby w ciągłe przedziały [od, do) gotowe do zapytania OData."""
+    zakresy = []
+    for doba in doby:
+        if zakresy and zakresy[-1][1] == doba:
+            zakresy[-1] = (zakresy[-1][0], doba + timedelta(days=1))
+        else:
+            zakresy.append((doba, doba + timedelta(days=1)))
+    return zakresy
+
+
+class MagazynCen:
+    """Ceny RCE z `rce.json`, pamięci podręcznej i API PSE, udostępniane zakresami dób."""
+
+    def __init__(self, plik_rce: Path = RCE_FILE, plik_cache: Path = CACHE_FILE,
+                 plik_dziennika: Path = JOURNAL_FILE, pliki_poziomow: dict | None = None,
+                 plik_miesieczny: Path | None = None, plik_ujemnych: Path | None = None,
+                 pobieraj: bool = True):
+        self.plik_rce = Path(plik_rce)
+        self.plik_cache = Path(plik_cache)
+        self.plik_dziennika = Path(plik_dziennika)
+        # poziomy leżą obok rce.json, z którego zostały wyliczone
+        if pliki_poziomow is None:
+            pliki_poziomow = {poziom: self.plik_rce.parent / plik.name for poziom, (plik, _) in POZIOMY.items()}
+        self.pliki_poziomow = {poziom: Path(plik) for poziom, plik in pliki_poziomow.items()}
+        self.plik_miesieczny = Path(plik_miesieczny) if plik_miesieczny else self.plik_rce.parent / MONTHLY_FILE.name
+        self.plik_ujemnych = Path(plik_ujemnych) if plik_ujemnych else self.plik_rce.parent / NEGATIVE_FILE.name
+        self._ujemne: dict[str, float] | None = None
+        self._serie: dict = {}
+        self._ceny: dict[str, float] | None = None
+        self._klucze: list[str] = []
+        self._sloty_doby: Counter = Counter()
+        self._z_cache: dict[str, float] = {}
+        # doby, o które w tym uruchomieniu pytano już API (także te, dla których nic nie zwróciło)
+        self._sprawdzone: set[date] = set()
+        self.zapytan_api = 0
+        # False: tylko dane lokalne, brakujące doby nie są pobierane z API PSE
+        self.pobieraj = pobieraj
+
+    def _wczytaj(self):
+        if self._ceny is not None:
+            return
+        self._ceny = {}
+        for plik in (self.plik_rce, self.plik_cache):
+            if not plik.exists():
+                continue
+            try:
+                dane = json.loads(plik.read_text(encoding='utf-8'))
+            except Exception as e:
+                print(f"Ostrzeżenie: Nie udało się odczytać pliku z cenami '{plik}': {e}")
+                continue
+            if plik == self.plik_cache:
+                self._z_cache = dane
+            for k, v in dane.items():
+                self._ceny.setdefault(k, v)
+        for k, v in update_rce.read_journal(self.plik_dziennika):
+            self._ceny.setdefault(k, v)
+        self._klucze = sorted(self._ceny)
+        self._sloty_doby = Counter(doba_handlowa(k) for k in self._klucze)
+
+    def _dodaj(self, nowe: dict[str, float]):
+        for k, v in nowe.items():
+            if k in self._ceny:
+                continue
+            self._ceny[k] = v
+            self._z_cache[k] = v
+            self._sloty_doby[doba_handlowa(k)] += 1
+        self._klucze = sorted(self._ceny)
+
+    def _zapisz_cache(self):
+        self.plik_cache.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.plik_cache.with_suffix('.tmp.json')
+        tmp.write_text(json.dumps(self._z_cache, ensure_ascii=False), encoding='utf-8')
+        tmp.replace(self.plik_cache)
+
+    def brakujace_zakresy(self, start_date: date, end_date: date) -> list[tuple[date, date]]:
+        """Zwraca przedziały [od, do) dób z zakresu [start_date, end_date] bez kompletu cen."""
+        self._wczytaj()
+        brakujace = []
+        doba = start_date
+        while doba <= end_date:
+            if self._sloty_doby[doba] < MIN_SLOTOW_DOBY and doba not in self._sprawdzone:
+                brakujace.append(doba)
+            doba += timedelta(days=1)
+        return zakresy_ciagle(brakujace)
+
+    def uzupelnij(self, start_date: date, end_date: date):
+        """Pobiera z API PSE tylko te doby z [start_date, end_date], których brakuje lokalnie."""
+        zakresy = self.brakujace_zakresy(start_date, end_date)
+        if not zakresy or not self.pobieraj:
+            return
+        nowe = {}
+        for od, do in zakresy:
+            kolumny = update_rce.items_to_columns(update_rce.fetch_range_with_retry(od, do)[0])
+            self.zapytan_api += 1
+            # surowe ceny ujemne z API są trzymane tylko w pamięci tego magazynu
+            self.ceny_ujemne().update(update_rce.negative_prices(columns=kolumny))
+            for k, v in update_rce.first_wins(*kolumny[:2]).items():
+                nowe.setdefault(k, v)
+            doba = od
+            while doba < do:
+                self._sprawdzone.add(doba)
+                doba += timedelta(days=1)
+        if nowe:
+            self._dodaj(nowe)
+            self._zapisz_cache()
+
+    def zakres_dob(self) -> tuple[date, date] | None:
+        """Pierwsza i ostatnia doba handlowa z jakąkolwiek ceną lokalną (None, gdy brak cen)."""
+        self._wczytaj()
+        if not self._klucze:
+            return None
+        return doba_handlowa(self._klucze[0]), doba_handlowa(self._klucze[-1])
+
+    def ceny_ujemne(self) -> dict[str, float]:
+        """Surowe (nieobcięte do zera) ceny ujemnych slotów: {klucz: PLN/kWh}."""
+        if self._ujemne is None:
+            self._ujemne = {}
+            if self.plik_ujemnych.exists():
+                try:
+                    self._ujemne = json.loads(self.plik_ujemnych.read_text(encoding='utf-8'))
+                except Exception as e:
+                    print(f"Ostrzeżenie: Nie udało się odczytać pliku z cenami '{self.plik_ujemnych}': {e}")
+        return self._ujemne
+
+    def bez_surowych(self, start_date: date, end_date: date) -> list[str]:
+        """Klucze z ceną 0 bez surowej wartości w ceny_ujemne() dla dób od start_date do end_date.
+
+        Surowa cena takich slotów nie została pobrana (np. historia sprzed `rce_negative.json`),
+        więc warianty bez obcięcia liczą je jako 0; uzupełnia je `update_rce.py --negative-backfill`.
+        """
+        ujemne = self.ceny_ujemne()
+        return [k for k in self._klucze_zakresu(start_date, end_date) if self._ceny[k] == 0 and k not in ujemne]
+
+    def _klucze_zakresu(self, start_date: date, end_date: date) -> list[str]:
+        self.uzupelnij(start_date, end_date)
+        od = bisect.bisect_right(self._klucze, klucz_poczatku_doby(start_date))
+        do = bisect.bisect_right(self._klucze, klucz_poczatku_doby(end_date + timedelta(days=1)))
+        return self._klucze[od:do]
+
+    def ceny_15min(self, start_date: date, end_date: date, obciete: bool = True) -> pd.DataFrame:
+        """Zwraca 15-minutowe ceny (DateTime, Cena_PLN_kWh) dla dób od start_date do end_date włącznie.
+
+        DateTime to czas lokalny bez strefy; z powtórzonej godziny przy zmianie czasu
+        na zimowy zostaje tylko pierwsze przejście (pełną oś daje ceny_utc()).
+        Z `obciete=False` ceny ujemne mają surową wartość z ceny_ujemne() zamiast zera.
+        """
+        klucze = [k for k in self._klucze_zakresu(start_date, end_date) if len(k) == 19]
+        ujemne = {} if obciete else self.ceny_ujemne()
+        return pd.DataFrame({
+            'DateTime': pd.to_datetime(klucze),
+            'Cena_PLN_kWh': [ujemne.get(k, self._ceny[k]) for k in klucze],
+        })
+
+    def ceny_utc(self, start_date: date, end_date: date, obciete: bool = True) -> pd.DataFrame:
+        """Zwraca 15-minutowe ceny na osi UTC (DateTimeUTC, Cena_PLN_kWh), z obiema kopiami powtórzonej godziny.
+
+        Klucze bez przesunięcia są czasem polskim (w powtórzonej godzinie - pierwszym
+        przejściem, czasem letnim); klucze z przesunięciem wskazują drugie przejście.
+        Klucze oznaczają koniec interwału, więc nieistniejąca etykieta 02:00 przy zmianie
+        na czas letni to chwila 03:00 czasu letniego. `obciete` jak w ceny_15min().
+        """
+        klucze = self._klucze_zakresu(start_date, end_date)
+        ujemne = {} if obciete else self.ceny_ujemne()
+        lokalne = [k for k in klucze if len(k) == 19]
+        z_przesunieciem = [k for k in klucze if len(k) != 19]
+        utc = pd.DatetimeIndex(pd.to_datetime(lokalne)).tz_localize(
+            STREFA, ambiguous=np.ones(len(lokalne), dtype=bool), nonexistent='shift_forward').tz_convert('UTC')
+        if z_przesunieciem:
+            utc = utc.append(pd.DatetimeIndex(pd.to_datetime(z_przesunieciem, utc=True)))
+        df = pd.DataFrame({
+            'DateTimeUTC': utc,
+            'Cena_PLN_kWh': [ujemne.get(k, self._ceny[k]) for k in lokalne + z_przesunieciem],
+        })
+        return df.dropna(subset=['DateTimeUTC']).sort_values('DateTimeUTC', ignore_index=True)
+
+    def _seria(self, poziom: str):
+        plik = self.pliki_poziomow.get(poziom)
+        if plik is None or not plik.exists():
+            return None
+        if poziom not in self._serie:
+            try:
+                self._serie[poziom] = rce_bin.open_series(plik)
+            except ValueError:
+                return None
+        return self._serie[poziom]
+
+    def _z_poziomu(self, start_date: date, end_date: date, poziom: str) -> pd.DataFrame | None:
+        """Ceny z przygotowanego poziomu, jeśli obejmuje on cały zakres bez luk; inaczej None."""
+        seria = self._seria(poziom)
+        if seria is None:
+            return None
+        # te same kubełki, co resample() kluczy z przedziału (start 00:00, end+1 00:00]
+        pierwszy = datetime.combine(start_date, datetime.min.time()) + timedelta(minutes=15)
+        ostatni = datetime.combine(end_date + timedelta(days=1), datetime.min.time())
+        od = seria.slot_time(seria.slot(pierwszy))
+        do = seria.slot_time(seria.slot(ostatni) + 1)
+        if seria.slot(od) < 0 or seria.slot(do) > len(seria):
+            return None
+        wartosci = seria.range(od, do)
+        if np.isnan(wartosci).any():
+            return None
+        return pd.DataFrame({
+            'DateTime': pd.to_datetime(seria.timestamps(od, do)),
+            'Cena_PLN_kWh': np.array(wartosci),
+        })
+
+    def ceny(self, start_date: date, end_date: date, poziom: str = 'h', obciete: bool = True) -> pd.DataFrame:
+        """Zwraca ceny (DateTime, Cena_PLN_kWh) na poziomie '15min', 'h', 'D' lub 'M' dla dób od start_date do end_date.
+
+        Zakres w całości obecny w przygotowanym poziomie jest zwracany bez uśredniania;
+        w przeciwnym razie ceny są uśredniane z danych 15-minutowych. Ceny bez obcięcia
+        ujemnych (`obciete=False`) są zawsze uśredniane z danych 15-minutowych.
+        """
+        if poziom == 'M' and obciete:
+            return self.ceny_miesieczne(start_date, end_date)
+        df = self._z_poziomu(start_date, end_date, poziom) if obciete else None
+        if df is not None:
+            return df
+        df_ceny_15min = self.ceny_15min(start_date, end_date, obciete)
+        regula = POZIOMY[poziom][1] if poziom in POZIOMY else 'MS'
+        if regula is None or df_ceny_15min.empty:
+            return df_ceny_15min
+        with metrics.stage('resample', poziom=poziom, rows=len(df_ceny_15min)):
+            return df_ceny_15min.set_index('DateTime').resample(regula)['Cena_PLN_kWh'].mean().dropna().reset_index()
+
+    def ceny_godzinowe(self, start_date: date, end_date: date) -> pd.DataFrame:
+        """Zwraca ceny uśrednione do godzin (DateTime, Cena_PLN_kWh) dla dób od start_date do end_date."""
+        return self.ceny(start_date, end_date, 'h')
+
+    def ceny_miesieczne(self, start_date: date, end_date: date) -> pd.DataFrame:
+        """Zwraca średnie miesięczne RCE (DateTime = pierwszy dzień miesiąca, Cena_PLN_kWh)."""
+        miesiace = pd.period_range(start_date, end_date, freq='M').strftime('%Y-%m').tolist()
+        if self.plik_miesieczny.exists():
+            dane = json.loads(self.plik_miesieczny.read_text(encoding='utf-8'))
+            if all(m in dane for m in miesiace):
+                return pd.DataFrame({'DateTime': pd.to_datetime(miesiace),
+                                     'Cena_PLN_kWh': [dane[m] for m in miesiace]})
+        df_ceny_15min = self.ceny_15min(start_date, end_date)
+        if df_ceny_15min.empty:
+            return df_ceny_15min
+        return df_ceny_15min.set_index('DateTime').resample('MS')['Cena_PLN_kWh'].mean().dropna().reset_index()
+
+
+_domyslny = None
+
+
+def domyslny_magazyn() -> MagazynCen:
+    """Magazyn współdzielony w obrębie procesu (używany, gdy nie przekazano własnego)."""
+    global _domyslny
+    if _domyslny is None:
+        _domyslny = MagazynCen()
+    return _domyslny
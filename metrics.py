@@ -0,0 +1,84 @@
+"""
+Opt-in stage timings and HTTP metrics as JSON lines, plus an optional cProfile dump.
+
+Nothing is recorded until `enable()` is called, and then every event is one JSON
+object per line:
+
+    {"ts": 1760000000.1, "pid": 4242, "event": "stage", "stage": "csv_read", "seconds": 0.012, "rows": 2976}
+    {"ts": 1760000000.3, "pid": 4242, "event": "http", "url": "...", "status": 200, "seconds": 0.21, "bytes": 48213, "page": 1}
+
+Stages are timed with `stage()`; callers add counts to the yielded dict. Lines are
+written with one append per event, so worker processes forked after `enable()`
+can share the same file.
+"""
+from __future__ import annotations
+
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+_sink = None
+_lock = threading.Lock()
+
+
+def enable(target: str):
+    """Send events to `target`: a file path (appended to) or '-' for stderr."""
+    global _sink
+    disable()
+    _sink = sys.stderr if target == '-' else open(target, 'a', encoding='utf-8')
+
+
+def disable():
+    global _sink
+    if _sink is not None and _sink is not sys.stderr:
+        _sink.close()
+    _sink = None
+
+
+def enabled() -> bool:
+    return _sink is not None
+
+
+def emit(event: str, **fields):
+    """Write one event line; a no-op while metrics are disabled."""
+    if _sink is None:
+        return
+    line = json.dumps({'ts': round(time.time(), 3), 'pid': os.getpid(), 'event': event, **fields},
+                      ensure_ascii=False, default=str)
+    with _lock:
+        _sink.write(line + '\n')
+        _sink.flush()
+
+
+@contextmanager
+def stage(name: str, **fields):
+    """Time a block and emit it as a 'stage' event; counts can be added to the yielded dict."""
+    if _sink is None:
+        yield {}
+        return
+    record = dict(fields)
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        emit('stage', stage=name, seconds=round(time.perf_counter() - start, 6), **record)
+
+
+@contextmanager
+def profile(path: str | None):
+    """Run the block under cProfile and dump the stats to `path` (nothing when `path` is None)."""
+    if not path:
+        yield
+        return
+    import cProfile
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
@@ -0,0 +1,191 @@
+"""
+Compact fixed-stride binary format for the RCE price series (`rce.bin`).
+
+Layout (little-endian):
+
+    offset  size  field
+    0       4     magic b'RCEB'
+    4       2     format version (1)
+    6       2     reserved (0)
+    8       8     epoch: seconds from 1970-01-01T00:00:00 to the first slot (int64)
+    16      4     slot length in seconds (uint32, 900 for 15-minute prices)
+    20      4     reserved (0)
+    24      8     number of slots (int64)
+    32      ...   prices as float64, one per slot, NaN where no price is known
+
+Timestamps are the same naive wall-clock keys as in `rce.json` (end of interval),
+so slot `i` holds the price for `epoch + i * slot`. Keys with an explicit UTC offset
+(the second pass of the repeated hour when DST ends) share their wall-clock slot
+with the first pass and are not stored. Writing needs only the standard
+library; reading memory-maps the file with NumPy and returns zero-copy views.
+"""
+from __future__ import annotations
+
+import struct
+import sys
+from array import array
+from datetime import datetime, timedelta
+from pathlib import Path
+
+MAGIC = b'RCEB'
+VERSION = 1
+HEADER = struct.Struct('<4sHHqIIq')
+HEADER_SIZE = HEADER.size  # 32 bytes, keeps the float64 payload aligned
+SLOT_SECONDS = 900
+
+_EPOCH0 = datetime(1970, 1, 1)
+
+
+def _to_seconds(dt: datetime) -> int:
+    return int((dt - _EPOCH0).total_seconds())
+
+
+def _wall_clock_stamps(data: dict) -> dict:
+    return {_to_seconds(datetime.fromisoformat(k)): v for k, v in data.items() if len(k) == 19}
+
+
+def write(data: dict, path: Path, slot_seconds: int = SLOT_SECONDS):
+    """Write a `{iso: price}` mapping as a fixed-stride binary series (atomic replace)."""
+    stamps = _wall_clock_stamps(data)
+    if stamps:
+        epoch = min(stamps)
+        count = (max(stamps) - epoch) // slot_seconds + 1
+    else:
+        epoch, count = 0, 0
+    values = array('d', [float('nan')]) * count
+    for sec, v in stamps.items():
+        offset, rest = divmod(sec - epoch, slot_seconds)
+        if rest == 0:
+            values[offset] = v
+    if sys.byteorder != 'little':
+        values.byteswap()
+    path = Path(path)
+    tmp = path.with_suffix('.tmp' + path.suffix)
+    with tmp.open('wb') as fh:
+        fh.write(HEADER.pack(MAGIC, VERSION, 0, epoch, slot_seconds, 0, count))
+        values.tofile(fh)
+    tmp.replace(path)
+
+
+def append(data: dict, path: Path) -> int:
+    """Append `{iso: price}` entries past the current end of an existing series file.
+
+    Gaps are padded with NaN and only the header count is rewritten, so the cost
+    depends on the appended span, not on the stored history. Entries that fall
+    inside the stored span are ignored. Returns the number of slots written.
+    """
+    path = Path(path)
+    epoch, slot_seconds, count = read_header(path)
+    stamps = {}
+    for sec, v in _wall_clock_stamps(data).items():
+        offset, rest = divmod(sec - epoch, slot_seconds)
+        if rest == 0 and offset >= count:
+            stamps[offset] = v
+    if not stamps:
+        return 0
+    new_count = max(stamps) + 1
+    values = array('d', [float('nan')]) * (new_count - count)
+    for offset, v in stamps.items():
+        values[offset - count] = v
+    if sys.byteorder != 'little':
+        values.byteswap()
+    with path.open('r+b') as fh:
+        fh.seek(HEADER_SIZE + count * 8)
+        values.tofile(fh)
+        fh.seek(0)
+        fh.write(HEADER.pack(MAGIC, VERSION, 0, epoch, slot_seconds, 0, new_count))
+    return len(stamps)
+
+
+def read_header(path: Path) -> tuple[int, int, int]:
+    """Return (epoch_seconds, slot_seconds, count) from a series file header."""
+    with Path(path).open('rb') as fh:
+        raw = fh.read(HEADER_SIZE)
+    if len(raw) < HEADER_SIZE:
+        raise ValueError(f'{path}: file too short for an RCE series header')
+    magic, version, _, epoch, slot_seconds, _, count = HEADER.unpack(raw)
+    if magic != MAGIC:
+        raise ValueError(f'{path}: not an RCE series file')
+    if version != VERSION:
+        raise ValueError(f'{path}: unsupported format version {version}')
+    return epoch, slot_seconds, count
+
+
+def read_slots(path: Path, start: int, stop: int) -> tuple[int, int, array]:
+    """Read slots [start, stop) with the standard library only (no NumPy, no mmap).
+
+    `start`/`stop` are slot offsets from the epoch and are clipped to the stored span.
+    Returns (epoch_seconds, slot_seconds, values), where values[0] is slot max(start, 0).
+    Meant for short ranges in processes that should not import NumPy.
+    """
+    epoch, slot_seconds, count = read_header(path)
+    start = min(max(start, 0), count)
+    stop = min(max(stop, start), count)
+    values = array('d')
+    if stop > start:
+        with Path(path).open('rb') as fh:
+            fh.seek(HEADER_SIZE + start * 8)
+            values.frombytes(fh.read((stop - start) * 8))
+        if sys.byteorder != 'little':
+            values.byteswap()
+    return epoch, slot_seconds, values
+
+
+class RceSeries:
+    """Read-only, memory-mapped view of a series written by `write()`."""
+
+    def __init__(self, path: Path):
+        import numpy as np
+
+        self.path = Path(path)
+        epoch, self.slot_seconds, self.count = read_header(self.path)
+        self._epoch_seconds = epoch
+        self.epoch = _EPOCH0 + timedelta(seconds=epoch)
+        if self.count:
+            self.values = np.memmap(self.path, dtype='<f8', mode='r', offset=HEADER_SIZE, shape=(self.count,))
+        else:
+            self.values = np.empty(0, dtype='<f8')
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def end(self) -> datetime:
+        """Timestamp one slot past the last stored slot."""
+        return self.slot_time(self.count)
+
+    def slot(self, dt: datetime) -> int:
+        """Slot offset of `dt` from the epoch (may be negative or past the end)."""
+        return (_to_seconds(dt) - self._epoch_seconds) // self.slot_seconds
+
+    def slot_time(self, i: int) -> datetime:
+        return self.epoch + timedelta(seconds=i * self.slot_seconds)
+
+    def price(self, dt: datetime) -> float:
+        """Price of the slot containing `dt`, NaN when it is outside the series or unknown."""
+        i = self.slot(dt)
+        if 0 <= i < self.count:
+            return float(self.values[i])
+        return float('nan')
+
+    def range(self, start: datetime, end: datetime):
+        """Zero-copy view of the slots in [start, end), clipped to the stored span.
+
+        The first returned element corresponds to `slot_time(max(0, slot(start)))`.
+        """
+        i = min(max(self.slot(start), 0), self.count)
+        j = min(max(self.slot(end), i), self.count)
+        return self.values[i:j]
+
+    def timestamps(self, start: datetime, end: datetime):
+        """datetime64 labels matching `range(start, end)`."""
+        import numpy as np
+
+        i = min(max(self.slot(start), 0), self.count)
+        j = min(max(self.slot(end), i), self.count)
+        base = np.datetime64(self.epoch, 's')
+        return base + np.arange(i, j, dtype='int64') * np.timedelta64(self.slot_seconds, 's')
+
+
+def open_series(path: Path) -> RceSeries:
+    return RceSeries(path)
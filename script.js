@@ -306,8 +306,46 @@ document.addEventListener('DOMContentLoaded', () => {
         return { minDate, maxDate };
     }
 
+    // Miesięczne fragmenty rce.json publikowane przez update_rce.py: rce/manifest.json
+    // opisuje każdy fragment (plik, sha256, zakres dób handlowych). Manifest pobieramy
+    // zawsze świeży, a fragmenty z hashem w adresie, więc przeglądarka może je trzymać
+    // w pamięci podręcznej do czasu zmiany zawartości.
+    async function fetchPriceShards(startDate, endDate) {
+        let manifest;
+        try {
+            const resp = await fetch('rce/manifest.json', { cache: 'no-store' });
+            if (!resp.ok) return null;
+            manifest = await resp.json();
+        } catch (e) {
+            return null;
+        }
+        const shards = manifest.shards || {};
+        // klucz 00:00 pierwszego dnia miesiąca należy do doby handlowej poprzedniego miesiąca
+        const cursor = new Date(startDate.getFullYear(), startDate.getMonth() - 1, 1);
+        const last = new Date(endDate.getFullYear(), endDate.getMonth(), 1);
+        const wanted = [];
+        while (cursor <= last) {
+            const month = `${cursor.getFullYear()}-${String(cursor.getMonth() + 1).padStart(2, '0')}`;
+            if (shards[month]) wanted.push(shards[month]);
+            cursor.setMonth(cursor.getMonth() + 1);
+        }
+        if (wanted.length === 0) return null;
+        try {
+            const parts = await Promise.all(wanted.map(async (shard) => {
+                const resp = await fetch(`rce/${shard.file}?v=${shard.sha256.slice(0, 16)}`, { cache: 'force-cache' });
+                if (!resp.ok) throw new Error(`${shard.file}: status ${resp.status}`);
+                return resp.json();
+            }));
+            return Object.assign({}, ...parts);
+        } catch (e) {
+            console.warn('Nie udało się pobrać miesięcznych plików cen, używam rce.json:', e);
+            return null;
+        }
+    }
+
     async function fetchHourlyMarketPrices(startDate, endDate) {
-        // Najpierw spróbuj skorzystać z lokalnego rce.json (jeśli jest dostępny obok strony)
+        // Najpierw spróbuj skorzystać z lokalnych cen: miesięcznych fragmentów z rce/,
+        // a gdy ich brak - z całego rce.json (jeśli jest dostępny obok strony)
         // Format rce.json: map ISO datetime -> price (PLN/kWh)
         const toIso = (d) => d.toISOString().replace(/\.\d+Z$/, 'Z');
         const startIsoDate = new Date(startDate);
@@ -315,14 +353,16 @@ document.addEventListener('DOMContentLoaded', () => {
         // end exclusive for iteration convenience
         endIsoDate.setHours(23, 59, 59, 999);
 
-        let localData = null;
-        try {
-            const resp = await fetch('rce.json', { cache: 'no-store' });
-            if (resp.ok) {
-                localData = await resp.json();
+        let localData = await fetchPriceShards(startDate, endDate);
+        if (!localData) {
+            try {
+                const resp = await fetch('rce.json', { cache: 'no-store' });
+                if (resp.ok) {
+                    localData = await resp.json();
+                }
+            } catch (e) {
+                // ignore - file may not exist
             }
-        } catch (e) {
-            // ignore - file may not exist
         }
 
         const results = [];
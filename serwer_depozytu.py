@@ -0,0 +1,364 @@
+"""
+Długo działający serwer HTTP liczący depozyt z przesłanych plików CSV eLicznika.
+
+Serwer trzyma ceny w pamięci jako indeksy slotów osi UTC (IndeksCen: RCE 15-minutowa
+i godzinowa) oraz RCEm z `rcem.json`, więc zapytanie nie płaci za start interpretera,
+import pandas ani wczytanie cen. Pliki cen (`rce.json`, dziennik, pamięć podręczna,
+`rcem.json`) są sprawdzane co `--interwal` sekund; po zmianie ceny są wczytywane
+w tle, a pula procesów liczących jest zastępowana nową z nową migawką cen
+(zapytania już przyjęte kończą się na starej).
+
+Punkty końcowe:
+  GET  /zdrowie   - stan serwera i zakres cen w pamięci,
+  POST /depozyt   - plik CSV jako treść zapytania (text/csv) albo pole formularza
+                    multipart/form-data; odpowiedź JSON z wynikami miesięcznymi.
+
+    curl --data-binary @licznik.csv http://127.0.0.1:8080/depozyt
+
+Parsowanie CSV i złączenie z cenami odbywa się w puli procesów (--procesy), pętla
+asyncio obsługuje tylko protokół, więc wiele zapytań może być obsługiwanych naraz.
+Serwer korzysta tylko z danych lokalnych - nie pyta API PSE.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import io
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from email.parser import BytesParser
+from email.policy import HTTP
+from http import HTTPStatus
+
+import numpy as np
+import pandas as pd
+
+import kalkulator_depozytu as kd
+import metrics
+from magazyn_cen import CACHE_FILE, JOURNAL_FILE, RCE_FILE, MagazynCen
+
+# Pliki, z których budowana jest migawka cen; zmiana któregokolwiek wywołuje przeładowanie
+PLIKI_CEN = {'rce': RCE_FILE, 'cache': CACHE_FILE, 'dziennik': JOURNAL_FILE, 'rcem': kd.RCEM_FILE}
+
+INTERWAL_S = 2.0
+MAX_ROZMIAR = 64 * 1024 * 1024
+MAX_NAGLOWKI = 64 * 1024
+
+
+class GoraceCeny:
+    """Migawka cen trzymana w pamięci serwera: indeksy slotów RCE dla poziomów '15min' i 'h' oraz RCEm."""
+
+    def __init__(self, indeksy, rcem, zakres, sygnatura, wersja=1):
+        self.indeksy = indeksy
+        self.rcem = rcem
+        self.zakres = zakres
+        self.sygnatura = sygnatura
+        self.wersja = wersja
+        self.wczytano = time.time()
+
+    @staticmethod
+    def sygnatura_plikow(pliki):
+        """(czas modyfikacji, rozmiar) każdego pliku cen; None dla brakującego."""
+        sygnatura = {}
+        for nazwa, sciezka in sorted(pliki.items()):
+            try:
+                stat = os.stat(sciezka)
+                sygnatura[nazwa] = (stat.st_mtime_ns, stat.st_size)
+            except FileNotFoundError:
+                sygnatura[nazwa] = None
+        return sygnatura
+
+    @classmethod
+    def wczytaj(cls, pliki=PLIKI_CEN, wersja=1):
+        """Buduje migawkę z plików lokalnych (bez zapytań do API PSE)."""
+        sygnatura = cls.sygnatura_plikow(pliki)
+        magazyn = MagazynCen(pliki['rce'], pliki['cache'], pliki['dziennik'], pobieraj=False)
+        zakres = magazyn.zakres_dob()
+        df_utc = magazyn.ceny_utc(*zakres) if zakres else pd.DataFrame(columns=['DateTimeUTC', 'Cena_PLN_kWh'])
+        indeksy = {poziom: kd.IndeksCen.z_cen_utc(df_utc, poziom) for poziom in kd.KROKI_SLOTOW}
+        return cls(indeksy, kd.wczytaj_rcem(pliki['rcem']), zakres, sygnatura, wersja)
+
+    def opis(self):
+        return {
+            'wersja': self.wersja,
+            'wczytano': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.wczytano)),
+            'od': self.zakres[0].isoformat() if self.zakres else None,
+            'do': self.zakres[1].isoformat() if self.zakres else None,
+            'miesiecy_rcem': len(self.rcem),
+        }
+
+
+_CENY_PRACOWNIKA = None
+
+
+def _inicjuj_pracownika(ceny):
+    global _CENY_PRACOWNIKA
+    _CENY_PRACOWNIKA = ceny
+
+
+def oblicz_miesiecznie(dane, ceny=None):
+    """Liczy depozyt pliku CSV (bajty) na cenach z migawki; zwraca słownik gotowy do JSON.
+
+    Wartość RCE to suma energii oddanej razy cena slotu (jak przy `--zlaczenie sloty`),
+    wartość RCEm - energia oddana razy cena miesięczna (gdy jest w rcem.json).
+    """
+    if ceny is None:
+        ceny = _CENY_PRACOWNIKA
+    df = kd.wczytaj_dane_uzytkownika(io.BytesIO(dane))
+    if df is None or df.empty:
+        return {'blad': 'błąd wczytywania lub brak danych'}
+    df = df[df['DateTime'].notna()]
+    poziom = kd.rozdzielczosc_danych(df['DateTime'])
+    indeks = ceny.indeksy[poziom]
+    cena = indeks.ceny_slotow(kd.sloty_utc(df['DateTime'], indeks.krok_s))
+
+    energia = df['Energia_kWh'].to_numpy(dtype=np.float64)
+    oddana = energia > 0
+    dopasowane = ~np.isnan(cena)
+    miesiace = (df['DateTime'].to_numpy(dtype='datetime64[ns]') - np.timedelta64(1, 's')).astype('datetime64[M]')
+    numery = miesiace.astype(np.int64)
+    cena_rcem = kd.ceny_rcem(ceny.rcem, numery)
+    z_rcem = ~np.isnan(cena_rcem)
+
+    zgrupowane = pd.DataFrame({
+        'Miesiac': numery,
+        'energia_kWh': np.where(oddana & dopasowane, energia, 0.0),
+        'wartosc_PLN': np.where(oddana & dopasowane, energia * np.nan_to_num(cena), 0.0),
+        'wartosc_rcem_PLN': np.where(oddana & z_rcem, energia * np.nan_to_num(cena_rcem), 0.0),
+    }).groupby('Miesiac', sort=True).sum()
+
+    wyniki = []
+    for numer, wiersz in zgrupowane.iterrows():
+        wyniki.append({
+            'miesiac': str(np.datetime64(int(numer), 'M')),
+            'energia_kWh': round(float(wiersz['energia_kWh']), 6),
+            'wartosc_PLN': round(float(wiersz['wartosc_PLN']), 6),
+            'cena_rcem_PLN_kWh': ceny.rcem.get(int(numer)),
+            'wartosc_rcem_PLN': round(float(wiersz['wartosc_rcem_PLN']), 6),
+        })
+    return {
+        'rozdzielczosc': poziom,
+        'od': df['DateTime'].min().date().isoformat(),
+        'do': df['DateTime'].max().date().isoformat(),
+        'wierszy': len(df),
+        'niedopasowane': int((oddana & ~dopasowane).sum()),
+        'miesiace': wyniki,
+        'suma': {pole: round(sum(m[pole] for m in wyniki), 6)
+                 for pole in ('energia_kWh', 'wartosc_PLN', 'wartosc_rcem_PLN')},
+    }
+
+
+def plik_z_formularza(typ, cialo):
+    """Zawartość pierwszego pola z plikiem (albo pierwszego pola) formularza multipart/form-data."""
+    wiadomosc = BytesParser(policy=HTTP).parsebytes(f'Content-Type: {typ}\r\n\r\n'.encode('latin-1') + cialo)
+    czesci = sorted(wiadomosc.iter_parts(), key=lambda czesc: czesc.get_filename() is None)
+    if not czesci:
+        return None, None
+    return czesci[0].get_filename(), czesci[0].get_payload(decode=True)
+
+
+class BladZapytania(Exception):
+    def __init__(self, status, opis):
+        super().__init__(opis)
+        self.status = status
+        self.opis = opis
+
+
+class SerwerDepozytu:
+    """Serwer asyncio z gorącą migawką cen i pulą procesów liczących."""
+
+    def __init__(self, pliki=PLIKI_CEN, procesy=None, interwal=INTERWAL_S, max_rozmiar=MAX_ROZMIAR):
+        self.pliki = dict(pliki)
+        self.procesy = procesy or os.cpu_count() or 1
+        self.interwal = interwal
+        self.max_rozmiar = max_rozmiar
+        self.ceny = None
+        self.pula = None
+        self._serwer = None
+        self._obserwator = None
+
+    def _nowa_pula(self):
+        stara = self.pula
+        # forkserver: pętla asyncio ma działające wątki, a fork() procesu z wątkami może się zakleszczyć
+        self.pula = ProcessPoolExecutor(max_workers=self.procesy, mp_context=multiprocessing.get_context('forkserver'),
+                                        initializer=_inicjuj_pracownika, initargs=(self.ceny,))
+        if stara is not None:
+            stara.shutdown(wait=False)
+
+    async def przeladuj_jesli_zmienione(self):
+        """Wczytuje ceny ponownie, jeśli pliki cen zmieniły się od ostatniego wczytania; True po przeładowaniu."""
+        if GoraceCeny.sygnatura_plikow(self.pliki) == self.ceny.sygnatura:
+            return False
+        petla = asyncio.get_running_loop()
+        try:
+            with metrics.stage('price_reload') as m:
+                nowe = await petla.run_in_executor(None, GoraceCeny.wczytaj, self.pliki, self.ceny.wersja + 1)
+                m['wersja'] = nowe.wersja
+        except Exception as e:
+            print(f"Ostrzeżenie: Nie udało się przeładować cen, zostają ceny w wersji {self.ceny.wersja}: {e}")
+            return False
+        self.ceny = nowe
+        self._nowa_pula()
+        print(f"Przeładowano ceny (wersja {nowe.wersja}, doby {nowe.zakres[0]} - {nowe.zakres[1]})."
+              if nowe.zakres else f"Przeładowano ceny (wersja {nowe.wersja}, brak cen RCE).")
+        return True
+
+    async def _obserwuj(self):
+        while True:
+            await asyncio.sleep(self.interwal)
+            await self.przeladuj_jesli_zmienione()
+
+    async def start(self, host='127.0.0.1', port=8080):
+        """Wczytuje ceny, uruchamia pulę i nasłuchuje; zwraca asyncio.Server (port 0 = dowolny wolny)."""
+        petla = asyncio.get_running_loop()
+        self.ceny = await petla.run_in_executor(None, GoraceCeny.wczytaj, self.pliki)
+        self._nowa_pula()
+        self._serwer = await asyncio.start_server(self._obsluz, host, port, limit=MAX_NAGLOWKI)
+        if self.interwal:
+            self._obserwator = asyncio.create_task(self._obserwuj())
+        return self._serwer
+
+    async def zamknij(self):
+        if self._obserwator:
+            self._obserwator.cancel()
+        if self._serwer:
+            self._serwer.close()
+            await self._serwer.wait_closed()
+        if self.pula:
+            self.pula.shutdown(wait=True)
+
+    async def _obsluz(self, reader, writer):
+        """Obsługuje połączenie HTTP/1.1 (z keep-alive) do jego zamknięcia przez klienta."""
+        try:
+            while True:
+                try:
+                    naglowek = await reader.readuntil(b'\r\n\r\n')
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    return
+                except asyncio.LimitOverrunError:
+                    await self._odpowiedz(writer, HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE,
+                                          {'blad': 'za długie nagłówki'}, zamknij=True)
+                    return
+                linie = naglowek.decode('latin-1').split('\r\n')
+                try:
+                    metoda, sciezka, wersja = linie[0].split(' ', 2)
+                except ValueError:
+                    await self._odpowiedz(writer, HTTPStatus.BAD_REQUEST, {'blad': 'niepoprawne zapytanie'},
+                                          zamknij=True)
+                    return
+                naglowki = {}
+                for linia in linie[1:]:
+                    if ':' in linia:
+                        nazwa, wartosc = linia.split(':', 1)
+                        naglowki[nazwa.strip().lower()] = wartosc.strip()
+                zamknij = naglowki.get('connection', '').lower() == 'close' or wersja == 'HTTP/1.0'
+
+                start = time.perf_counter()
+                try:
+                    cialo = await self._czytaj_cialo(reader, naglowki)
+                    status, odpowiedz = await self._obsluz_zapytanie(metoda, sciezka.split('?', 1)[0],
+                                                                     naglowki, cialo)
+                except BladZapytania as e:
+                    status, odpowiedz = e.status, {'blad': e.opis}
+                    zamknij = zamknij or status in (HTTPStatus.REQUEST_ENTITY_TOO_LARGE, HTTPStatus.LENGTH_REQUIRED)
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    # klient rozłączył się w trakcie wysyłania treści
+                    return
+                except Exception as e:
+                    # np. BrokenProcessPool albo błąd obliczeń w trakcie wymiany puli po przeładowaniu cen
+                    print(f"❌ BŁĄD: {metoda} {sciezka}: {e!r}")
+                    status, odpowiedz, zamknij = HTTPStatus.INTERNAL_SERVER_ERROR, {'blad': 'błąd serwera'}, True
+                metrics.emit('request', method=metoda, path=sciezka, status=int(status),
+                             seconds=round(time.perf_counter() - start, 6))
+                await self._odpowiedz(writer, status, odpowiedz, zamknij)
+                if zamknij:
+                    return
+        finally:
+            writer.close()
+
+    async def _czytaj_cialo(self, reader, naglowki):
+        if 'chunked' in naglowki.get('transfer-encoding', '').lower():
+            raise BladZapytania(HTTPStatus.LENGTH_REQUIRED, 'wymagany nagłówek Content-Length')
+        try:
+            dlugosc = int(naglowki.get('content-length', '0'))
+        except ValueError:
+            raise BladZapytania(HTTPStatus.BAD_REQUEST, 'niepoprawny Content-Length')
+        if dlugosc > self.max_rozmiar:
+            raise BladZapytania(HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                                f'plik większy niż {self.max_rozmiar // (1024 * 1024)} MB')
+        return await reader.readexactly(dlugosc) if dlugosc else b''
+
+    async def _obsluz_zapytanie(self, metoda, sciezka, naglowki, cialo):
+        if sciezka == '/zdrowie' and metoda == 'GET':
+            return HTTPStatus.OK, {'status': 'ok', 'procesy': self.procesy, 'ceny': self.ceny.opis()}
+        if sciezka == '/depozyt' and metoda == 'POST':
+            return await self._depozyt(naglowki, cialo)
+        if sciezka in ('/zdrowie', '/depozyt'):
+            raise BladZapytania(HTTPStatus.METHOD_NOT_ALLOWED, f'metoda {metoda} nie jest obsługiwana')
+        raise BladZapytania(HTTPStatus.NOT_FOUND, f'nieznana ścieżka {sciezka}')
+
+    async def _depozyt(self, naglowki, cialo):
+        nazwa = None
+        typ = naglowki.get('content-type', '')
+        if typ.lower().startswith('multipart/form-data'):
+            nazwa, cialo = plik_z_formularza(typ, cialo)
+        if not cialo:
+            raise BladZapytania(HTTPStatus.BAD_REQUEST, 'brak pliku CSV w treści zapytania')
+        ceny = self.ceny
+        wynik = await asyncio.get_running_loop().run_in_executor(self.pula, oblicz_miesiecznie, cialo)
+        if 'blad' in wynik:
+            raise BladZapytania(HTTPStatus.UNPROCESSABLE_ENTITY, wynik['blad'])
+        return HTTPStatus.OK, {'plik': nazwa, **wynik, 'ceny': ceny.opis()}
+
+    @staticmethod
+    async def _odpowiedz(writer, status, odpowiedz, zamknij=False):
+        tresc = json.dumps(odpowiedz, ensure_ascii=False).encode('utf-8')
+        naglowek = (f'HTTP/1.1 {status.value} {status.phrase}\r\n'
+                    'Content-Type: application/json; charset=utf-8\r\n'
+                    f'Content-Length: {len(tresc)}\r\n'
+                    f"Connection: {'close' if zamknij else 'keep-alive'}\r\n\r\n")
+        writer.write(naglowek.encode('latin-1') + tresc)
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+
+async def uruchom(host, port, procesy=None, interwal=INTERWAL_S):
+    serwer = SerwerDepozytu(procesy=procesy, interwal=interwal)
+    gniazdo = await serwer.start(host, port)
+    opis = serwer.ceny.opis()
+    print(f"Serwer depozytu nasłuchuje na http://{host}:{gniazdo.sockets[0].getsockname()[1]} "
+          f"(ceny RCE {opis['od']} - {opis['do']}, {serwer.procesy} procesów).")
+    try:
+        await gniazdo.serve_forever()
+    finally:
+        await serwer.zamknij()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serwer HTTP liczący depozyt prosumencki z plików CSV eLicznika.')
+    parser.add_argument('--host', default='127.0.0.1', help='adres nasłuchiwania (domyślnie: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8080, help='port (domyślnie: 8080)')
+    parser.add_argument('--procesy', type=int, default=None,
+                        help='liczba procesów liczących (domyślnie: liczba rdzeni)')
+    parser.add_argument('--interwal', type=float, default=INTERWAL_S,
+                        help='co ile sekund sprawdzać zmiany plików cen (0 = nie sprawdzać)')
+    parser.add_argument('--metryki', metavar='PLIK',
+                        help="zapisuj czasy zapytań i przeładowań cen jako linie JSON ('-' = stderr)")
+    args = parser.parse_args(argv)
+    if args.metryki:
+        metrics.enable(args.metryki)
+    try:
+        asyncio.run(uruchom(args.host, args.port, args.procesy, args.interwal))
+    except KeyboardInterrupt:
+        print("\nZatrzymano serwer.")
+    finally:
+        metrics.disable()
+
+
+if __name__ == '__main__':
+    main()
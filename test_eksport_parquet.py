@@ -0,0 +1,49 @@
+import json
+from datetime import date
+
+import pytest
+
+import eksport_parquet as ep
+import kalkulator_depozytu as kd
+from magazyn_cen import MagazynCen
+from test_kalkulator_depozytu import _zapisz_ceny, _zapisz_csv
+
+ds = pytest.importorskip('pyarrow.dataset')
+
+
+def test_eksport_partycjonowany_po_miesiacu_i_liczniku(tmp_path):
+    _zapisz_ceny(tmp_path / 'rce.json', date(2025, 1, 30), 4, cena=0.4)
+    (tmp_path / 'rce_negative.json').write_text(json.dumps({'2025-01-31T10:00:00': -0.2}))
+    magazyn = MagazynCen(tmp_path / 'rce.json', tmp_path / 'cache.json', tmp_path / 'journal.jsonl')
+    _zapisz_csv(tmp_path / 'a.csv', date(2025, 1, 30), 72, kwh='0,5')
+    _zapisz_csv(tmp_path / 'b.csv', date(2025, 1, 31), 24, kwh='2,0')
+    pliki = [str(tmp_path / 'a.csv'), str(tmp_path / 'b.csv')]
+    wyjscie = tmp_path / 'parquet'
+
+    assert ep.eksportuj_szczegoly(pliki, wyjscie, magazyn, wierszy=10) == {'a': 72, 'b': 24}
+    # ponowny eksport zastępuje partycje licznika zamiast je dublować
+    _zapisz_csv(tmp_path / 'b.csv', date(2025, 2, 1), 12, kwh='2,0')
+    assert ep.eksportuj_szczegoly(pliki[1:], wyjscie, magazyn) == {'b': 12}
+
+    szczegoly = ds.dataset(wyjscie / 'szczegoly', partitioning='hive')
+    df = szczegoly.to_table().to_pandas()
+    assert set(df.columns) == {'DateTime', 'Energia_kWh', 'Cena_PLN_kWh', 'Wartosc_PLN', 'rok', 'miesiac', 'meter_id'}
+    sumy = df.groupby(['meter_id', 'miesiac'])['Energia_kWh'].sum().to_dict()
+    assert sumy == {('a', 1): 24.0, ('a', 2): 12.0, ('b', 2): 24.0}
+    # północ 1 lutego zamyka interwał styczniowy
+    styczen = df[(df['meter_id'] == 'a') & (df['miesiac'] == 1)]
+    assert styczen['DateTime'].max().isoformat() == '2025-02-01T00:00:00'
+
+    oczekiwane = kd.oblicz_depozyty_wielu(kd.wczytaj_wiele_licznikow(pliki), magazyn.ceny(date(2025, 1, 30),
+                                                                                         date(2025, 2, 2)))
+    assert df.groupby('meter_id')['Wartosc_PLN'].sum().tolist() == \
+        pytest.approx(oczekiwane.groupby('meter_id', observed=True)['Wartosc_PLN'].sum().tolist())
+    luty_a = szczegoly.to_table(columns=['Wartosc_PLN'], filter=(ds.field('meter_id') == 'a') &
+                                (ds.field('miesiac') == 2)).to_pandas()
+    assert luty_a['Wartosc_PLN'].sum() == pytest.approx(12 * 0.4)
+
+    assert ep.eksportuj_ceny(wyjscie, magazyn) == 4 * 96
+    ceny = ds.dataset(wyjscie / 'ceny', partitioning='hive').to_table().to_pandas()
+    surowa = ceny.loc[ceny['DateTime'] == '2025-01-31 10:00', ['Cena_PLN_kWh', 'Cena_surowa_PLN_kWh']]
+    assert surowa.values.tolist() == [[0.4, -0.2]]
+    assert sorted(ceny.groupby('miesiac').size().items()) == [(1, 2 * 96), (2, 2 * 96)]
@@ -0,0 +1,108 @@
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import http_client
+import metrics
+
+
+@pytest.fixture
+def serwer():
+    stan = {'zapytania': [], 'awarie': 0}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            stan['zapytania'].append((self.path, self.headers.get('If-None-Match'),
+                                      self.headers.get('If-Modified-Since')))
+            if self.path == '/awaria' and stan['awarie'] < 2:
+                stan['awarie'] += 1
+                self.send_response(503)
+                self.send_header('Retry-After', '0')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            if self.path == '/etag' and self.headers.get('If-None-Match') == '"v1"':
+                self.send_response(304)
+                self.send_header('ETag', '"v1"')
+                self.end_headers()
+                return
+            body = json.dumps({'sciezka': self.path}).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            if self.path == '/etag':
+                self.send_header('ETag', '"v1"')
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    stan['url'] = f'http://127.0.0.1:{httpd.server_address[1]}'
+    yield stan
+    httpd.shutdown()
+    httpd.server_close()
+    http_client.close()
+
+
+def test_rewalidacja_etag_i_ponowienia(tmp_path, monkeypatch, serwer):
+    monkeypatch.setattr(http_client, 'CACHE_DIR', tmp_path / 'http')
+    metrics.enable(str(tmp_path / 'metrics.jsonl'))
+    try:
+        pierwsza = http_client.get(serwer['url'] + '/etag')
+        druga = http_client.get(serwer['url'] + '/etag')
+        bez_walidatora = [http_client.get(serwer['url'] + '/zwykly') for _ in range(2)]
+        po_awarii = http_client.get(serwer['url'] + '/awaria', backoff=0)
+    finally:
+        metrics.disable()
+
+    assert pierwsza.json() == druga.json() == {'sciezka': '/etag'}
+    assert not getattr(pierwsza, 'from_cache', False) and druga.from_cache
+    assert druga.headers['Content-Type'] == 'application/json'
+    assert [z[1] for z in serwer['zapytania'][:2]] == [None, '"v1"']
+    assert [z[1] for z in serwer['zapytania'][2:4]] == [None, None]
+    assert all(r.status_code == 200 for r in bez_walidatora)
+    assert po_awarii.status_code == 200 and serwer['awarie'] == 2
+
+    zdarzenia = [json.loads(w) for w in (tmp_path / 'metrics.jsonl').read_text().splitlines()]
+    http = [z for z in zdarzenia if z['event'] == 'http']
+    assert [z.get('cache') for z in http[:4]] == ['stored', 'revalidated', 'miss', 'miss']
+    assert http[1]['bytes'] == 0
+    assert [z['attempt'] for z in http[4:]] == [1, 2, 3] and http[-1]['status'] == 200
+
+
+def test_bez_ponowien_i_limit_pamieci(tmp_path, monkeypatch, serwer):
+    monkeypatch.setattr(http_client, 'CACHE_DIR', tmp_path / 'http')
+    assert http_client.get(serwer['url'] + '/awaria', retries=0).status_code == 503
+    assert serwer['awarie'] == 1
+
+    class Odpowiedz:
+        status_code = 200
+        headers = {'ETag': '"v1"'}
+        content = b'{}'
+
+    pamiec = http_client.ResponseCache(tmp_path / 'limit', max_entries=2)
+    for i, url in enumerate(('a', 'b')):
+        pamiec.store(url, Odpowiedz())
+        for plik in pamiec._paths(url):
+            os.utime(plik, (i, i))
+    pamiec.body('a')  # odświeżony wpis przeżywa przycinanie
+    pamiec.store('c', Odpowiedz())
+
+    assert [u for u in 'abc' if pamiec.lookup(u)] == ['a', 'c']
+    assert len(list((tmp_path / 'limit').iterdir())) == 4
+
+
+def test_retry_after_ograniczony():
+    class Odpowiedz:
+        def __init__(self, retry_after):
+            self.headers = {'Retry-After': retry_after}
+
+    assert http_client._retry_delay(Odpowiedz('86400'), 1, 1.0) == http_client.MAX_RETRY_DELAY
+    assert http_client._retry_delay(Odpowiedz('5'), 1, 1.0) == 5.0
+    assert http_client._retry_delay(None, 30, 1.0) == http_client.MAX_RETRY_DELAY
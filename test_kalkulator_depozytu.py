@@ -0,0 +1,250 @@
+import json
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pytest
+
+import kalkulator_depozytu as kd
+import rce_bin
+import update_rce
+from magazyn_cen import MagazynCen
+
+
+def _zapisz_ceny(sciezka, od, dni, cena=0.5):
+    start = datetime.combine(od, datetime.min.time())
+    ceny = {(start + timedelta(minutes=15 * (i + 1))).isoformat(): cena for i in range(96 * dni)}
+    sciezka.write_text(json.dumps(ceny))
+
+
+def _zapisz_csv(sciezka, od, godzin, kwh='1,5'):
+    wiersze = ['Data; Wartość kWh;Rodzaj']
+    start = datetime.combine(od, datetime.min.time())
+    for h in range(1, godzin + 1):
+        t = start + timedelta(hours=h)
+        znacznik = f'{(t - timedelta(days=1)):%Y-%m-%d} 24:00' if t.hour == 0 else f'{t:%Y-%m-%d %H:%M}'
+        wiersze.append(f'{znacznik};{kwh};oddanie')
+    sciezka.write_text('\n'.join(wiersze) + '\n', encoding='utf-8')
+
+
+@pytest.fixture
+def magazyn(tmp_path):
+    _zapisz_ceny(tmp_path / 'rce.json', date(2025, 1, 1), 3)
+    return MagazynCen(tmp_path / 'rce.json', tmp_path / 'cache.json', tmp_path / 'journal.jsonl')
+
+
+def test_przetworz_wsadowo_streams_results(tmp_path, magazyn):
+    katalog = tmp_path / 'csv'
+    katalog.mkdir()
+    _zapisz_csv(katalog / 'a.csv', date(2025, 1, 1), 24)
+    _zapisz_csv(katalog / 'b.csv', date(2025, 1, 2), 24, kwh='2,0')
+    wyjscie = tmp_path / 'wyniki.jsonl'
+
+    wyniki = kd.przetworz_wsadowo(kd.znajdz_pliki(str(katalog)), procesy=1, wyjscie=str(wyjscie), magazyn=magazyn)
+
+    zapisane = [json.loads(w) for w in wyjscie.read_text(encoding='utf-8').splitlines()]
+    assert [w['nazwa_pliku'] for w in zapisane] == [w['nazwa_pliku'] for w in wyniki]
+    assert zapisane[0]['energia'] == pytest.approx(36.0)
+    assert zapisane[0]['wartosc'] == pytest.approx(18.0)
+    assert zapisane[1]['wartosc'] == pytest.approx(24.0)
+
+
+def test_szybkie_parsowanie_zgodne_z_klasycznym(tmp_path):
+    plik = tmp_path / 'dane.csv'
+    _zapisz_csv(plik, date(2024, 2, 28), 48)
+
+    szybko = kd.wczytaj_dane_uzytkownika(str(plik))
+    klasycznie = kd.wczytaj_dane_uzytkownika(str(plik), tryb='klasyczny')
+
+    assert szybko['DateTime'].tolist() == klasycznie['DateTime'].tolist()
+    assert szybko['DateTime'].iloc[23] == datetime(2024, 2, 29)
+    assert szybko.attrs['wierszy_na_s'] > 0
+    for znacznik in ('01.02.2024 10:00', '2025-01-01 10:00:30', '2025-01-01 10:00+01', '2025-01-01 24:15'):
+        with pytest.raises(ValueError):
+            kd.parsuj_znaczniki_szybko(['2025-01-01 09:45', znacznik])
+        with pytest.raises(ValueError):
+            kd._sekundy_znacznika(znacznik)
+    assert kd.parsuj_znaczniki_szybko(['2025-01-01 24:00'])[0] == np.datetime64('2025-01-02T00:00')
+
+
+def test_oblicz_depozyty_wielu_per_meter_per_month():
+    import pandas as pd
+
+    ceny = pd.DataFrame({'DateTime': pd.date_range('2025-01-31 22:00', periods=4, freq='h'),
+                         'Cena_PLN_kWh': [0.1, 0.2, 0.3, 0.4]})
+    liczniki = pd.DataFrame({
+        'meter_id': ['A', 'A', 'A', 'B', 'B'],
+        'DateTime': pd.to_datetime(['2025-01-31 22:00', '2025-02-01 00:00', '2025-02-01 01:00',
+                                    '2025-01-31 23:00', '2025-02-01 01:00']),
+        'Energia_kWh': [1.0, 2.0, 3.0, -5.0, 10.0],
+    })
+
+    wynik = kd.oblicz_depozyty_wielu(liczniki, ceny)
+
+    assert wynik['meter_id'].tolist() == ['A', 'A', 'B']
+    assert wynik['Miesiac'].astype(str).tolist() == ['2025-01', '2025-02', '2025-02']
+    assert wynik['Energia_kWh'].tolist() == [3.0, 3.0, 10.0]
+    assert wynik['Wartosc_PLN'].tolist() == pytest.approx([0.7, 1.2, 4.0])
+    wartosc, energia = kd.oblicz_wartosc_depozytu(liczniki[liczniki['meter_id'] == 'A'], ceny)
+    assert wartosc == pytest.approx(1.9) and energia == 6.0
+
+
+def test_zlaczenie_po_slotach_rozroznia_powtorzona_godzine(tmp_path):
+    import pandas as pd
+    import update_rce
+
+    # 27.10.2024: godzina 02 występuje dwa razy ('02a' w czasie letnim, '02b' w zimowym)
+    items = [{'dtime': f'2024-10-27 02{p}:{m:02d}:00', 'rce_pln': cena}
+             for p, cena in (('a', 100.0), ('b', 300.0)) for m in (15, 30, 45)]
+    ceny = dict(update_rce.item_to_kv(it) for it in items)
+    assert '2024-10-27T02:15:00+01:00' in ceny and ceny['2024-10-27T02:15:00'] == 0.1
+    (tmp_path / 'rce.json').write_text(json.dumps(ceny))
+    magazyn = MagazynCen(tmp_path / 'rce.json', tmp_path / 'cache.json', tmp_path / 'journal.jsonl')
+    magazyn._sprawdzone.add(date(2024, 10, 27))
+    indeks = kd.indeks_cen(date(2024, 10, 27), date(2024, 10, 27), magazyn, '15min')
+
+    energia = pd.DataFrame({
+        'DateTime': pd.to_datetime(['2024-10-27 02:15', '2024-10-27 02:30', '2024-10-27 02:45',
+                                    '2024-10-27 02:15', '2024-10-27 02:30', '2024-10-27 02:45',
+                                    '2024-10-27 05:00']),
+        'Energia_kWh': [1.0] * 7,
+    })
+    wartosc, oddana, niedopasowane = kd.oblicz_wartosc_depozytu_sloty(energia, indeks)
+
+    assert wartosc == pytest.approx(3 * 0.1 + 3 * 0.3)
+    assert oddana == 6.0
+    assert niedopasowane['DateTime'].tolist() == [pd.Timestamp('2024-10-27 05:00')]
+
+
+def test_strumieniowo_zgodne_z_obliczeniem_w_pamieci(tmp_path):
+    import pandas as pd
+
+    _zapisz_ceny(tmp_path / 'rce.json', date(2025, 1, 30), 4, cena=0.4)
+    magazyn = MagazynCen(tmp_path / 'rce.json', tmp_path / 'cache.json', tmp_path / 'journal.jsonl')
+    plik = tmp_path / 'dlugi.csv'
+    _zapisz_csv(plik, date(2025, 1, 30), 72, kwh='0,5')
+
+    miesiace = kd.oblicz_depozyt_strumieniowo(str(plik), magazyn=magazyn, wierszy=10)
+
+    df_liczniki = kd.wczytaj_wiele_licznikow([str(plik)])
+    oczekiwane = kd.oblicz_depozyty_wielu(df_liczniki, kd.pobierz_ceny_rynkowe(date(2025, 1, 30),
+                                                                             date(2025, 2, 2), magazyn))
+    assert miesiace['Miesiac'].tolist() == [pd.Period('2025-01'), pd.Period('2025-02')]
+    assert miesiace['Energia_kWh'].tolist() == pytest.approx(oczekiwane['Energia_kWh'].tolist())
+    assert miesiace['Wartosc_PLN'].tolist() == pytest.approx(oczekiwane['Wartosc_PLN'].tolist())
+    assert miesiace['Energia_kWh'].tolist() == pytest.approx([24.0, 12.0])
+    assert miesiace.attrs['wierszy'] == 72 and miesiace.attrs['rozdzielczosc'] == 'h'
+
+
+def test_scenariusze_w_jednym_przebiegu(tmp_path, capsys):
+    _zapisz_ceny(tmp_path / 'rce.json', date(2025, 1, 1), 2, cena=0.4)
+    ceny = json.loads((tmp_path / 'rce.json').read_text())
+    # kwadrans 10:00-10:15 miał cenę ujemną: w rce.json jest 0, surowa wartość osobno
+    ceny['2025-01-01T10:15:00'] = 0.0
+    (tmp_path / 'rce.json').write_text(json.dumps(ceny))
+    (tmp_path / 'rce_negative.json').write_text(json.dumps({'2025-01-01T10:15:00': -0.4}))
+    magazyn = MagazynCen(tmp_path / 'rce.json', tmp_path / 'cache.json', tmp_path / 'journal.jsonl')
+    plik = tmp_path / 'a.csv'
+    _zapisz_csv(plik, date(2025, 1, 1), 24, kwh='1,0')
+
+    wynik = kd.oblicz_scenariusze(kd.wczytaj_wiele_licznikow([str(plik)]), magazyn,
+                                  rcem={(2025 - 1970) * 12: 0.25})
+    wartosci = {(r.Ceny, r.Obciete, r.Z_mnoznikiem): r.Wartosc_PLN for r in wynik.itertuples()}
+
+    assert len(wynik) == 12 and set(wynik['meter_id']) == {'a'}
+    # godzina kończąca się o 11:00 ma średnią (0 + 3 * 0.4) / 4 lub (-0.4 + 3 * 0.4) / 4
+    assert wartosci[('RCE_15min', True, False)] == pytest.approx(23 * 0.4 + 0.3)
+    assert wartosci[('RCE_15min', False, False)] == pytest.approx(23 * 0.4 + 0.2)
+    assert wartosci[('RCEm', True, False)] == pytest.approx(24 * 0.25)
+    assert wartosci[('RCEm', True, True)] == pytest.approx(24 * 0.25 * 1.23)
+    assert wartosci[('RCE_h', False, False)] < wartosci[('RCE_h', True, False)]
+    assert 'Ostrzeżenie' not in capsys.readouterr().out
+
+    # bez surowej wartości wariant bez obcięcia liczy 0 - z ostrzeżeniem
+    (tmp_path / 'rce_negative.json').write_text('{}')
+    bez_surowych = MagazynCen(tmp_path / 'rce.json', tmp_path / 'cache.json', tmp_path / 'journal.jsonl')
+    assert bez_surowych.bez_surowych(date(2025, 1, 1), date(2025, 1, 2)) == ['2025-01-01T10:15:00']
+    kd.oblicz_scenariusze(kd.wczytaj_wiele_licznikow([str(plik)]), bez_surowych, rcem={})
+    assert '1 kwadransów z ceną 0' in capsys.readouterr().out
+
+
+def test_scenariusze_godzinowe_wyceniaja_te_sama_godzine(tmp_path):
+    start = datetime(2025, 1, 1)
+    # cena stała w każdej godzinie (kwadranse kończące się 00:15..01:00 to godzina kończąca się o 01:00)
+    ceny = {}
+    for i in range(96):
+        koniec = start + timedelta(minutes=15 * (i + 1))
+        ceny[koniec.isoformat()] = (i // 4 + 1) / 100
+    (tmp_path / 'rce.json').write_text(json.dumps(ceny))
+    magazyn = MagazynCen(tmp_path / 'rce.json', tmp_path / 'cache.json', tmp_path / 'journal.jsonl',
+                         pobieraj=False)
+    _zapisz_csv(tmp_path / 'h.csv', date(2025, 1, 1), 24, kwh='1,0')
+    wiersze = ['Data; Wartość kWh;Rodzaj'] + [
+        f"{start + timedelta(minutes=15 * (i + 1)):%Y-%m-%d %H:%M};0,25;oddanie" for i in range(95)]
+    (tmp_path / 'q.csv').write_text('\n'.join(wiersze) + '\n', encoding='utf-8')
+
+    wynik = kd.oblicz_scenariusze(kd.wczytaj_wiele_licznikow([str(tmp_path / 'h.csv'), str(tmp_path / 'q.csv')]),
+                                  magazyn, rcem={})
+    wartosci = {(r.meter_id, r.Ceny): r.Wartosc_PLN for r in wynik.itertuples() if r.Obciete and not r.Z_mnoznikiem}
+    for licznik in ('h', 'q'):
+        assert wartosci[(licznik, 'RCE_h')] == pytest.approx(wartosci[(licznik, 'RCE_15min')])
+    assert wartosci[('h', 'RCE_h')] == pytest.approx(sum(range(1, 25)) / 100)
+
+
+def test_pamiec_wynikow_liczy_ponownie_tylko_zmienione(tmp_path, magazyn):
+    katalog = tmp_path / 'csv'
+    katalog.mkdir()
+    _zapisz_csv(katalog / 'a.csv', date(2025, 1, 1), 24)
+    _zapisz_csv(katalog / 'b.csv', date(2025, 1, 2), 24, kwh='2,0')
+    pliki = kd.znajdz_pliki(str(katalog))
+    sciezka = tmp_path / 'wyniki_cache.json'
+
+    pierwsze = kd.przetworz_wsadowo(pliki, procesy=1, magazyn=magazyn, pamiec=kd.PamiecWynikow(sciezka))
+    drugie = kd.przetworz_wsadowo(pliki, procesy=1, magazyn=magazyn, pamiec=kd.PamiecWynikow(sciezka))
+    assert not any(w.get('z_pamieci') for w in pierwsze)
+    assert all(w['z_pamieci'] for w in drugie)
+    assert sorted((w['nazwa_pliku'], w['wartosc'], w['start_date']) for w in drugie) == \
+        sorted((w['nazwa_pliku'], w['wartosc'], w['start_date']) for w in pierwsze)
+
+    # zmieniony plik i korekta ceny w zakresie drugiego pliku: oba liczone od nowa
+    _zapisz_csv(katalog / 'a.csv', date(2025, 1, 1), 24, kwh='3,0')
+    ceny = json.loads((tmp_path / 'rce.json').read_text())
+    ceny['2025-01-02T12:00:00'] = 1.5
+    (tmp_path / 'rce.json').write_text(json.dumps(ceny))
+    magazyn = MagazynCen(tmp_path / 'rce.json', tmp_path / 'cache.json', tmp_path / 'journal.jsonl')
+    trzecie = {w['nazwa_pliku']: w for w in
+               kd.przetworz_wsadowo(pliki, procesy=1, magazyn=magazyn, pamiec=kd.PamiecWynikow(sciezka))}
+    assert not any(w.get('z_pamieci') for w in trzecie.values())
+    assert trzecie[str(katalog / 'a.csv')]['energia'] == pytest.approx(72.0)
+
+    mala = kd.PamiecWynikow(tmp_path / 'mala.json', max_wpisow=1)
+    kd.przetworz_wsadowo(pliki, procesy=1, magazyn=magazyn, pamiec=mala)
+    assert len(kd.PamiecWynikow(tmp_path / 'mala.json').wpisy) == 1
+
+
+def test_lekka_sciezka_zgodna_z_pandas(tmp_path):
+    start = datetime(2025, 1, 1)
+    ceny = {(start + timedelta(minutes=15 * (i + 1))).isoformat(): 0.1 + (i % 7) / 10 for i in range(96 * 3)}
+    del ceny['2025-01-02T10:15:00']  # luka w dobie, która wciąż ma komplet slotów
+    (tmp_path / 'rce.json').write_text(json.dumps(ceny))
+    rce_bin.write(ceny, tmp_path / 'rce.bin')
+    rce_bin.write(update_rce.aggregate(ceny, 'h'), tmp_path / 'rce_h.bin', slot_seconds=3600)
+    magazyn = MagazynCen(tmp_path / 'rce.json', tmp_path / 'cache.json', tmp_path / 'journal.jsonl', pobieraj=False)
+    _zapisz_csv(tmp_path / 'a.csv', date(2025, 1, 1), 24)
+    wiersze = ['Data;Wartość kWh;Rodzaj'] + [f'{start + timedelta(minutes=15 * i):%Y-%m-%d %H:%M};0,25;oddanie'
+                                             for i in range(1, 2 * 96 + 1)]
+    (tmp_path / 'b.csv').write_text('\n'.join(wiersze) + '\n', encoding='utf-8')
+    pliki = [str(tmp_path / 'a.csv'), str(tmp_path / 'b.csv')]
+
+    lekkie = kd.oblicz_lekko(pliki, katalog_cen=tmp_path)
+    pelne = kd.przetworz_wsadowo(pliki, procesy=1, magazyn=magazyn)
+
+    assert [w['rozdzielczosc'] for w in lekkie] == ['h', '15min']
+    for lekki, pelny in zip(lekkie, pelne):
+        assert {k: v for k, v in lekki.items() if k not in ('energia', 'wartosc', 'wierszy_na_s')} == \
+            {k: v for k, v in pelny.items() if k not in ('energia', 'wartosc', 'wierszy_na_s')}
+        assert lekki['energia'] == pytest.approx(pelny['energia'])
+        assert lekki['wartosc'] == pytest.approx(pelny['wartosc'])
+
+    (tmp_path / 'c.csv').write_text('Data,Wartość kWh\n2025-01-01 01:00,1.0\n', encoding='utf-8')
+    assert kd.oblicz_lekko(pliki + [str(tmp_path / 'c.csv')], katalog_cen=tmp_path) is None
+    assert kd.oblicz_lekko([str(tmp_path / 'a.csv')], katalog_cen=tmp_path / 'brak') is None
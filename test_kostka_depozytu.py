@@ -0,0 +1,74 @@
+import json
+from datetime import date, datetime, timedelta
+
+import pytest
+
+import kalkulator_depozytu as kd
+from kostka_depozytu import KostkaDepozytu
+from magazyn_cen import MagazynCen
+from test_kalkulator_depozytu import _zapisz_csv
+
+
+def test_kostka_przyrostowa_i_wycinki(tmp_path):
+    start = datetime(2025, 1, 31)
+    # cena 0 w kluczach 12:00-12:45 (godzinowo: wiersz kończący się o 12:00, godzina 11 doby)
+    ceny = {}
+    for i in range(96 * 3):
+        t = start + timedelta(minutes=15 * (i + 1))
+        ceny[t.isoformat()] = 0.0 if t.hour == 12 else 0.1 + t.hour / 100
+    (tmp_path / 'rce.json').write_text(json.dumps(ceny))
+    magazyn = MagazynCen(tmp_path / 'rce.json', tmp_path / 'cache.json', tmp_path / 'journal.jsonl', pobieraj=False)
+    _zapisz_csv(tmp_path / 'a.csv', date(2025, 1, 31), 48)  # piątek 31.01 i sobota 1.02
+    _zapisz_csv(tmp_path / 'b.csv', date(2025, 2, 1), 24, kwh='2,0')
+    pliki = [str(tmp_path / 'a.csv'), str(tmp_path / 'b.csv')]
+
+    kostka = KostkaDepozytu(tmp_path / 'kostka.npz')
+    assert kostka.aktualizuj(pliki, magazyn) == pliki
+    kostka.zamknij()
+
+    kostka = KostkaDepozytu(tmp_path / 'kostka.npz')
+    assert sorted(kostka.bloki) == [('a', '2025-01'), ('a', '2025-02'), ('b', '2025-02')]
+    wyniki = kd.przetworz_wsadowo(pliki, procesy=1, magazyn=magazyn)
+    razem = kostka.wycinek(['licznik'])
+    assert razem['Wartosc_PLN'].tolist() == pytest.approx([w['wartosc'] for w in wyniki])
+    assert razem['Energia_kWh'].tolist() == pytest.approx([w['energia'] for w in wyniki])
+    assert razem['Energia_zerowa_kWh'].tolist() == pytest.approx([3.0, 2.0])
+
+    dni = kostka.wycinek(['miesiac', 'dzien_tygodnia'], liczniki={'a'})
+    assert len(dni) == 2 * 7
+    dni = dni[dni['Energia_kWh'] > 0]
+    assert dni[['miesiac', 'dzien_tygodnia', 'Energia_kWh']].values.tolist() == \
+        [['2025-01', 4, 36.0], ['2025-02', 5, 36.0]]
+    poludnie = kostka.wycinek(['godzina'], godziny={11, 12})
+    assert poludnie['Energia_kWh'].tolist() == pytest.approx([5.0, 5.0])
+    assert poludnie['Wartosc_PLN'].tolist() == pytest.approx([0.0, 5.0 * 0.23])
+    assert poludnie['Energia_zerowa_kWh'].tolist() == pytest.approx([5.0, 0.0])
+    with pytest.raises(ValueError):
+        kostka.wycinek(['kwartal'])
+
+    # tylko zmieniony plik jest liczony ponownie, a jego bloki zastępują poprzednie
+    assert kostka.aktualizuj(pliki, magazyn) == []
+    _zapisz_csv(tmp_path / 'b.csv', date(2025, 2, 1), 24, kwh='1,0')
+    assert kostka.aktualizuj(pliki, magazyn) == [pliki[1]]
+    assert kostka.wycinek(['licznik'], liczniki={'b'})['Energia_kWh'].tolist() == pytest.approx([24.0])
+
+
+def test_kostka_odrzuca_ten_sam_licznik_z_dwoch_katalogow(tmp_path, capsys):
+    ceny = {(datetime(2025, 2, 1) + timedelta(minutes=15 * (i + 1))).isoformat(): 0.2 for i in range(96)}
+    (tmp_path / 'rce.json').write_text(json.dumps(ceny))
+    magazyn = MagazynCen(tmp_path / 'rce.json', tmp_path / 'cache.json', tmp_path / 'journal.jsonl', pobieraj=False)
+    for katalog, kwh in (('x', '1,0'), ('y', '2,0')):
+        (tmp_path / katalog).mkdir()
+        _zapisz_csv(tmp_path / katalog / 'licznik.csv', date(2025, 2, 1), 24, kwh=kwh)
+    x, y = str(tmp_path / 'x' / 'licznik.csv'), str(tmp_path / 'y' / 'licznik.csv')
+
+    kostka = KostkaDepozytu(tmp_path / 'kostka.npz')
+    assert kostka.aktualizuj([x, y], magazyn) == [x]
+    assert "ten sam identyfikator licznika 'licznik'" in capsys.readouterr().out
+    assert kostka.wycinek()['Energia_kWh'].tolist() == pytest.approx([24.0])
+
+    # gdy pierwszego pliku już nie ma, drugi zastępuje bloki licznika
+    (tmp_path / 'x' / 'licznik.csv').unlink()
+    assert kostka.aktualizuj([y], magazyn) == [y]
+    assert list(kostka.pliki) == [y] and sorted(kostka.bloki) == [('licznik', '2025-02')]
+    assert kostka.wycinek()['Energia_kWh'].tolist() == pytest.approx([48.0])
@@ -0,0 +1,88 @@
+import json
+from datetime import date, datetime, timedelta
+
+import pytest
+
+import update_rce
+from magazyn_cen import MagazynCen
+
+
+def _doba(d, cena):
+    # 96 kluczy końca interwału dla doby handlowej d (od 00:15 do 00:00 dnia następnego)
+    start = datetime.combine(d, datetime.min.time())
+    return {update_rce.iso(start + timedelta(minutes=15 * (i + 1))): cena for i in range(96)}
+
+
+def _items(d, cena):
+    return [{'dtime': k.replace('T', ' '), 'rce_pln': cena * 1000} for k in _doba(d, cena)]
+
+
+def test_magazyn_fetches_only_missing_days_once(tmp_path, monkeypatch):
+    plik_rce = tmp_path / 'rce.json'
+    plik_rce.write_text(json.dumps(_doba(date(2025, 3, 1), 0.5)))
+    wywolania = []
+
+    def fake_fetch(start, end, session=None, limiter=None):
+        wywolania.append((start, end))
+        return _items(start, 0.25)
+
+    monkeypatch.setattr(update_rce, 'fetch_range', fake_fetch)
+    magazyn = MagazynCen(plik_rce, tmp_path / 'cache.json')
+
+    df = magazyn.ceny_godzinowe(date(2025, 3, 1), date(2025, 3, 2))
+    assert wywolania == [(date(2025, 3, 2), date(2025, 3, 3))]
+    assert len(df) == 49
+    assert df['Cena_PLN_kWh'].iloc[1] == 0.5
+    assert df['Cena_PLN_kWh'].iloc[-1] == 0.25
+
+    # kolejne zapytanie o ten sam okres nie odpytuje już API
+    magazyn.ceny_godzinowe(date(2025, 3, 2), date(2025, 3, 2))
+    assert len(wywolania) == 1
+
+    # nowy magazyn korzysta z pamięci podręcznej zapisanej na dysku
+    drugi = MagazynCen(plik_rce, tmp_path / 'cache.json')
+    drugi.ceny_godzinowe(date(2025, 3, 1), date(2025, 3, 2))
+    assert len(wywolania) == 1
+
+
+def test_magazyn_reads_precomputed_level_without_loading_json(tmp_path, monkeypatch):
+    dane = {**_doba(date(2025, 3, 1), 0.5), **_doba(date(2025, 3, 2), 0.25)}
+    for poziom, (plik, slot) in update_rce.LEVEL_FILES.items():
+        update_rce.rce_bin.write(update_rce.aggregate(dane, poziom), tmp_path / plik.name, slot_seconds=slot)
+    # brak rce.json: każde cofnięcie się do danych 15-minutowych musiałoby odpytać API
+    monkeypatch.setattr(update_rce, 'fetch_range', lambda *a: (_ for _ in ()).throw(AssertionError('API')))
+    magazyn = MagazynCen(tmp_path / 'rce.json', tmp_path / 'cache.json', tmp_path / 'journal.jsonl')
+
+    godzinowe = magazyn.ceny(date(2025, 3, 1), date(2025, 3, 1), 'h')
+    assert len(godzinowe) == 25
+    assert godzinowe['Cena_PLN_kWh'].iloc[0] == 0.5
+    dobowe = magazyn.ceny(date(2025, 3, 1), date(2025, 3, 1), 'D')
+    assert dobowe['Cena_PLN_kWh'].tolist()[0] == 0.5
+    assert magazyn._ceny is None
+
+
+def test_poziomy_zgodne_z_resample_w_dobie_zmiany_czasu(tmp_path):
+    # 27.10.2024: godzina 02 występuje dwa razy, drugie przejście ma klucze z przesunięciem
+    dane = {k: 0.1 + i / 1000 for i, k in enumerate(_doba(date(2024, 10, 27), 0))}
+    dane.update({f'2024-10-27T02:{m}:00+01:00': 0.9 for m in ('15', '30', '45')})
+    dane['2024-10-27T03:00:00+01:00'] = 0.9
+    dane = {k: dane[k] for k in sorted(dane)}
+    update_rce.rce_bin.write(dane, tmp_path / 'rce.bin')
+    (tmp_path / 'rce.json').write_text(json.dumps(dane))
+    pliki = {}
+    for poziom, (plik, slot) in update_rce.LEVEL_FILES.items():
+        pliki[poziom] = tmp_path / plik.name
+        update_rce.rce_bin.write(update_rce.aggregate(dane, poziom), pliki[poziom], slot_seconds=slot)
+    (tmp_path / 'miesiace.json').write_text(json.dumps(update_rce.aggregate(dane, 'M')))
+
+    z_poziomow = MagazynCen(tmp_path / 'rce.json', tmp_path / 'cache.json', tmp_path / 'journal.jsonl',
+                            pliki_poziomow=pliki, plik_miesieczny=tmp_path / 'miesiace.json', pobieraj=False)
+    z_resample = MagazynCen(tmp_path / 'rce.json', tmp_path / 'cache.json', tmp_path / 'journal.jsonl',
+                            pliki_poziomow={}, plik_miesieczny=tmp_path / 'brak.json', pobieraj=False)
+    doba = date(2024, 10, 27)
+    for poziom in ('h', 'D', 'M'):
+        a = z_poziomow.ceny(doba, doba, poziom)
+        b = z_resample.ceny(doba, doba, poziom)
+        assert a['DateTime'].tolist() == b['DateTime'].tolist()
+        assert a['Cena_PLN_kWh'].tolist() == pytest.approx(b['Cena_PLN_kWh'].tolist())
+    assert z_poziomow._z_poziomu(doba, doba, 'h') is not None
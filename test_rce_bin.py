@@ -0,0 +1,25 @@
+import math
+from datetime import datetime
+
+import rce_bin
+
+
+def test_write_and_memory_map_range(tmp_path):
+    data = {
+        '2025-01-01T00:15:00': 0.5,
+        '2025-01-01T00:30:00': 0.25,
+        # 00:45 missing -> NaN
+        '2025-01-01T01:00:00': 0.75,
+    }
+    path = tmp_path / 'rce.bin'
+    rce_bin.write(data, path)
+
+    series = rce_bin.open_series(path)
+    assert len(series) == 4
+    assert series.epoch == datetime(2025, 1, 1, 0, 15)
+    view = series.range(datetime(2025, 1, 1, 0, 30), datetime(2025, 1, 1, 1, 15))
+    assert list(view[:1]) == [0.25]
+    assert math.isnan(view[1])
+    assert view[2] == 0.75
+    assert series.price(datetime(2025, 1, 1, 0, 15)) == 0.5
+    assert math.isnan(series.price(datetime(2024, 12, 31)))
@@ -0,0 +1,105 @@
+import asyncio
+import json
+import os
+from datetime import date
+
+import pytest
+
+import serwer_depozytu as sd
+from test_kalkulator_depozytu import _zapisz_ceny, _zapisz_csv
+
+
+async def _zapytanie(port, metoda, sciezka, cialo=b'', typ='text/csv'):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(f'{metoda} {sciezka} HTTP/1.1\r\nHost: x\r\nContent-Type: {typ}\r\n'
+                 f'Content-Length: {len(cialo)}\r\nConnection: close\r\n\r\n'.encode() + cialo)
+    odpowiedz = await reader.read()
+    writer.close()
+    naglowek, tresc = odpowiedz.split(b'\r\n\r\n', 1)
+    return int(naglowek.split()[1]), json.loads(tresc)
+
+
+def test_serwer_liczy_miesiace_i_przeladowuje_ceny(tmp_path):
+    _zapisz_ceny(tmp_path / 'rce.json', date(2025, 1, 30), 4, cena=0.4)
+    (tmp_path / 'rcem.json').write_text(json.dumps({'2025': {'1': 300.0}}))
+    pliki = {'rce': tmp_path / 'rce.json', 'cache': tmp_path / 'cache.json',
+             'dziennik': tmp_path / 'journal.jsonl', 'rcem': tmp_path / 'rcem.json'}
+    _zapisz_csv(tmp_path / 'a.csv', date(2025, 1, 30), 72, kwh='0,5')
+    csv = (tmp_path / 'a.csv').read_bytes()
+
+    async def przebieg():
+        serwer = sd.SerwerDepozytu(pliki, procesy=1, interwal=0)
+        port = (await serwer.start('127.0.0.1', 0)).sockets[0].getsockname()[1]
+        try:
+            wyniki = await asyncio.gather(*[_zapytanie(port, 'POST', '/depozyt', csv) for _ in range(4)])
+            granica = b'xYz'
+            formularz = (b'--xYz\r\nContent-Disposition: form-data; name="plik"; filename="a.csv"\r\n'
+                         b'Content-Type: text/csv\r\n\r\n' + csv + b'\r\n--xYz--\r\n')
+            z_formularza = await _zapytanie(port, 'POST', '/depozyt', formularz,
+                                            f'multipart/form-data; boundary={granica.decode()}')
+            bledy = [await _zapytanie(port, 'POST', '/depozyt', b''), await _zapytanie(port, 'GET', '/depozyt'),
+                     await _zapytanie(port, 'GET', '/nie-ma')]
+
+            _zapisz_ceny(tmp_path / 'rce.json', date(2025, 1, 30), 4, cena=0.8)
+            os.utime(tmp_path / 'rce.json', ns=(1, 1))
+            assert await serwer.przeladuj_jesli_zmienione()
+            assert not await serwer.przeladuj_jesli_zmienione()
+            po_zmianie = await _zapytanie(port, 'POST', '/depozyt', csv)
+            zdrowie = await _zapytanie(port, 'GET', '/zdrowie')
+        finally:
+            await serwer.zamknij()
+        return wyniki, z_formularza, bledy, po_zmianie, zdrowie
+
+    wyniki, z_formularza, bledy, po_zmianie, zdrowie = asyncio.run(przebieg())
+
+    status, wynik = wyniki[0]
+    assert all(w == wyniki[0] for w in wyniki) and status == 200
+    assert [m['miesiac'] for m in wynik['miesiace']] == ['2025-01', '2025-02']
+    assert [m['energia_kWh'] for m in wynik['miesiace']] == pytest.approx([24.0, 12.0])
+    assert wynik['suma']['wartosc_PLN'] == pytest.approx(36 * 0.4)
+    assert wynik['miesiace'][0]['wartosc_rcem_PLN'] == pytest.approx(24 * 0.3)
+    assert wynik['miesiace'][1]['cena_rcem_PLN_kWh'] is None
+    assert z_formularza[1]['plik'] == 'a.csv' and z_formularza[1]['suma'] == wynik['suma']
+    assert [status for status, _ in bledy] == [400, 405, 404]
+    assert po_zmianie[1]['suma']['wartosc_PLN'] == pytest.approx(36 * 0.8)
+    assert po_zmianie[1]['ceny']['wersja'] == 2 and zdrowie[1]['ceny']['wersja'] == 2
+
+
+def test_serwer_zwraca_500_i_znosi_zerwane_polaczenia(tmp_path):
+    import metrics
+
+    _zapisz_ceny(tmp_path / 'rce.json', date(2025, 1, 30), 1, cena=0.4)
+    pliki = {'rce': tmp_path / 'rce.json', 'cache': tmp_path / 'cache.json',
+             'dziennik': tmp_path / 'journal.jsonl', 'rcem': tmp_path / 'rcem.json'}
+
+    async def przebieg():
+        serwer = sd.SerwerDepozytu(pliki, procesy=1, interwal=0)
+        port = (await serwer.start('127.0.0.1', 0)).sockets[0].getsockname()[1]
+        try:
+            # klient zapowiada 100 bajtów treści i rozłącza się po 10
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(b'POST /depozyt HTTP/1.1\r\nContent-Length: 100\r\n\r\n' + b'x' * 10)
+            await writer.drain()
+            writer.close()
+
+            async def awaria(*args):
+                raise RuntimeError('pula w trakcie wymiany')
+
+            zapytanie = serwer._obsluz_zapytanie
+            serwer._obsluz_zapytanie = awaria
+            blad = await _zapytanie(port, 'POST', '/depozyt', b'a;b')
+            serwer._obsluz_zapytanie = zapytanie
+            zdrowie = await _zapytanie(port, 'GET', '/zdrowie')
+        finally:
+            await serwer.zamknij()
+        return blad, zdrowie
+
+    metrics.enable(str(tmp_path / 'metrics.jsonl'))
+    try:
+        blad, zdrowie = asyncio.run(przebieg())
+    finally:
+        metrics.disable()
+
+    assert blad == (500, {'blad': 'błąd serwera'}) and zdrowie[0] == 200
+    zdarzenia = [json.loads(w) for w in (tmp_path / 'metrics.jsonl').read_text().splitlines()]
+    assert [z['status'] for z in zdarzenia if z['event'] == 'request'] == [500, 200]
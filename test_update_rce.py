@@ -0,0 +1,233 @@
+import json
+from datetime import date, datetime, timedelta
+
+import requests
+
+import update_rce
+
+
+def test_fetch_chunks_retries_and_reports_failures(monkeypatch):
+    calls = {}
+
+    def fake_fetch(start, end, session=None, limiter=None):
+        calls[start] = calls.get(start, 0) + 1
+        if start == date(2025, 1, 1) and calls[start] == 1:
+            raise requests.exceptions.ConnectionError('reset')
+        if start == date(2025, 2, 1):
+            raise requests.exceptions.Timeout('slow')
+        return [{'dtime': f'{start} 00:15:00', 'rce_pln': 100}]
+
+    monkeypatch.setattr(update_rce, 'fetch_range', fake_fetch)
+    chunks = [(date(2025, 1, 1), date(2025, 2, 1)), (date(2025, 2, 1), date(2025, 3, 1)),
+              (date(2025, 3, 1), date(2025, 4, 1))]
+    results, summary = update_rce.fetch_chunks(chunks, workers=3, rate=0, retries=2, backoff=0)
+
+    assert [(s, e) for s, e, _ in results] == [chunks[0], chunks[2]]
+    assert summary['retried'] == [(date(2025, 1, 1), date(2025, 2, 1), 2)]
+    assert [(s, e) for s, e, _ in summary['failed']] == [chunks[1]]
+    assert calls[date(2025, 2, 1)] == 3
+
+
+def test_journal_appends_after_tail_and_compacts(tmp_path, monkeypatch):
+    monkeypatch.setattr(update_rce, 'OUT_FILE', tmp_path / 'rce.json')
+    monkeypatch.setattr(update_rce, 'BIN_FILE', tmp_path / 'rce.bin')
+    monkeypatch.setattr(update_rce, 'JOURNAL_FILE', tmp_path / 'rce_journal.jsonl')
+    monkeypatch.setattr(update_rce, 'LEVEL_FILES', {'h': (tmp_path / 'rce_h.bin', 3600)})
+    monkeypatch.setattr(update_rce, 'MONTHLY_FILE', tmp_path / 'rce_monthly.json')
+    monkeypatch.setattr(update_rce, 'SHARD_DIR', tmp_path / 'rce')
+    monkeypatch.setattr(update_rce, 'NEGATIVE_FILE', tmp_path / 'rce_negative.json')
+    monkeypatch.setattr(update_rce, 'write_changelog', lambda added: None)
+    update_rce.save({'2025-01-01T00:15:00': 0.1, '2025-01-01T00:30:00': 0.2})
+    assert update_rce.last_key() == '2025-01-01T00:30:00'
+
+    items = [{'dtime': '2025-01-01 00:30:00', 'rce_pln': 999},
+             {'dtime': '2025-01-01 00:45:00', 'rce_pln': 300}]
+    monkeypatch.setattr(update_rce, 'fetch_chunks', lambda chunks, **kw: ([(None, None, items)],
+                                                                          {'retried': [], 'failed': []}))
+    update_rce.main_journal(date(2025, 1, 1), date(2025, 1, 2))
+
+    assert update_rce.read_journal() == [('2025-01-01T00:45:00', 0.3)]
+    assert update_rce.last_key() == '2025-01-01T00:45:00'
+    assert update_rce.load_existing()['2025-01-01T00:30:00'] == 0.2
+    assert update_rce.rce_bin.read_header(update_rce.BIN_FILE)[2] == 3
+
+    update_rce.compact()
+    assert not update_rce.JOURNAL_FILE.exists()
+    assert list(update_rce.load_existing()) == ['2025-01-01T00:15:00', '2025-01-01T00:30:00',
+                                                '2025-01-01T00:45:00']
+
+
+def test_shards_split_by_business_month_and_rewrite_only_changes(tmp_path, monkeypatch):
+    monkeypatch.setattr(update_rce, 'SHARD_DIR', tmp_path / 'rce')
+    data = {'2025-01-31T23:45:00': 0.1, '2025-02-01T00:00:00': 0.2, '2025-02-01T00:15:00': 0.3}
+    assert update_rce.save_shards(data) == 2
+    manifest = json.loads((tmp_path / 'rce' / 'manifest.json').read_text())['shards']
+    # 00:00 closes the last business day of January
+    assert json.loads((tmp_path / 'rce' / '2025-01.json').read_text()) == {'2025-01-31T23:45:00': 0.1,
+                                                                           '2025-02-01T00:00:00': 0.2}
+    assert manifest['2025-01']['to'] == '2025-01-31'
+    assert manifest['2025-02']['count'] == 1
+
+    data['2025-02-01T00:30:00'] = 0.4
+    assert update_rce.save_shards(data) == 1
+    updated = json.loads((tmp_path / 'rce' / 'manifest.json').read_text())['shards']
+    assert updated['2025-01']['sha256'] == manifest['2025-01']['sha256']
+    assert updated['2025-02']['sha256'] != manifest['2025-02']['sha256']
+
+
+def test_repair_fetches_only_planned_gaps(tmp_path, monkeypatch):
+    for name, path in (('OUT_FILE', 'rce.json'), ('BIN_FILE', 'rce.bin'), ('JOURNAL_FILE', 'rce_journal.jsonl'),
+                       ('MONTHLY_FILE', 'rce_monthly.json'), ('SHARD_DIR', 'rce'),
+                       ('NEGATIVE_FILE', 'rce_negative.json')):
+        monkeypatch.setattr(update_rce, name, tmp_path / path)
+    monkeypatch.setattr(update_rce, 'LEVEL_FILES', {'h': (tmp_path / 'rce_h.bin', 3600)})
+    monkeypatch.setattr(update_rce, 'write_changelog', lambda added: None)
+
+    def day(d, skip=()):
+        start = datetime.combine(d, datetime.min.time())
+        return {update_rce.iso(start + timedelta(minutes=15 * (i + 1))): 0.1
+                for i in range(96) if i not in skip}
+
+    data = {}
+    for n in range(10):
+        d = date(2025, 1, 1) + timedelta(days=n)
+        data.update(day(d, skip=range(96) if n in (2, 3, 5) else (40,) if n == 8 else ()))
+    update_rce.save(data)
+    assert update_rce.plan_refetch(update_rce.Coverage(date(2025, 1, 1), date(2025, 1, 11), data).missing_days(),
+                                   bridge=1) == [(date(2025, 1, 3), date(2025, 1, 7)),
+                                                 (date(2025, 1, 9), date(2025, 1, 10))]
+
+    requested = []
+
+    def fake_chunks(chunks, **kw):
+        requested.extend(chunks)
+        items = [{'dtime': k.replace('T', ' '), 'rce_pln': 200}
+                 for s, e in chunks for n in range((e - s).days) for k in day(s + timedelta(days=n))]
+        return [(None, None, items)], {'retried': [], 'failed': []}
+
+    monkeypatch.setattr(update_rce, 'fetch_chunks', fake_chunks)
+    update_rce.main_repair(bridge=0)
+
+    assert requested == [(date(2025, 1, 3), date(2025, 1, 5)), (date(2025, 1, 6), date(2025, 1, 7)),
+                         (date(2025, 1, 9), date(2025, 1, 10))]
+    repaired = update_rce.load_existing()
+    assert update_rce.Coverage(date(2025, 1, 1), date(2025, 1, 11), repaired).missing_days() == []
+    assert repaired['2025-01-01T00:15:00'] == 0.1 and repaired['2025-01-09T10:15:00'] == 0.2
+
+
+def test_main_resumes_from_last_day_with_dst_keys(tmp_path, monkeypatch):
+    for name, path in (('OUT_FILE', 'rce.json'), ('BIN_FILE', 'rce.bin'), ('JOURNAL_FILE', 'rce_journal.jsonl'),
+                       ('MONTHLY_FILE', 'rce_monthly.json'), ('SHARD_DIR', 'rce'),
+                       ('NEGATIVE_FILE', 'rce_negative.json')):
+        monkeypatch.setattr(update_rce, name, tmp_path / path)
+    monkeypatch.setattr(update_rce, 'LEVEL_FILES', {'h': (tmp_path / 'rce_h.bin', 3600)})
+    monkeypatch.setattr(update_rce, 'write_changelog', lambda added: None)
+    # the second 02:15 of the autumn change is stored with an offset next to naive keys
+    update_rce.save({'2024-10-27T02:15:00': 0.1, '2024-10-27T02:15:00+01:00': 0.2,
+                     '2024-10-28T00:15:00': 0.3})
+
+    requested = []
+
+    def fake_chunks(chunks, **kw):
+        requested.extend(chunks)
+        return [], {'retried': [], 'failed': []}
+
+    monkeypatch.setattr(update_rce, 'fetch_chunks', fake_chunks)
+    update_rce.main(end_date=date(2024, 10, 29))
+
+    assert requested == [(date(2024, 10, 28), date(2024, 10, 29))]
+
+
+def test_negative_backfill_writes_only_raw_prices(tmp_path, monkeypatch):
+    for name, path in (('OUT_FILE', 'rce.json'), ('BIN_FILE', 'rce.bin'), ('JOURNAL_FILE', 'rce_journal.jsonl'),
+                       ('MONTHLY_FILE', 'rce_monthly.json'), ('SHARD_DIR', 'rce'),
+                       ('NEGATIVE_FILE', 'rce_negative.json')):
+        monkeypatch.setattr(update_rce, name, tmp_path / path)
+    monkeypatch.setattr(update_rce, 'LEVEL_FILES', {'h': (tmp_path / 'rce_h.bin', 3600)})
+    monkeypatch.setattr(update_rce, 'write_changelog', lambda added: None)
+    update_rce.save({'2025-01-01T10:15:00': 0.0, '2025-01-02T00:00:00': 0.1})
+    before = update_rce.OUT_FILE.read_bytes()
+
+    requested = []
+
+    def fake_chunks(chunks, **kw):
+        requested.extend(chunks)
+        items = [{'dtime': '2025-01-01 10:15:00', 'rce_pln': -40}, {'dtime': '2025-01-01 10:30:00', 'rce_pln': 0},
+                 {'dtime': '2025-01-01 10:45:00', 'rce_pln': 50}]
+        return [(None, None, items)], {'retried': [], 'failed': []}
+
+    monkeypatch.setattr(update_rce, 'fetch_chunks', fake_chunks)
+    update_rce.main_negative_backfill()
+
+    assert requested == [(date(2025, 1, 1), date(2025, 1, 2))]
+    assert json.loads(update_rce.NEGATIVE_FILE.read_text()) == {'2025-01-01T10:15:00': -0.04,
+                                                                '2025-01-01T10:30:00': 0.0}
+    assert update_rce.OUT_FILE.read_bytes() == before
+
+
+def test_fetch_range_emits_http_metrics(tmp_path, monkeypatch):
+    import metrics
+
+    pages = {None: {'value': [{'dtime': '2025-01-01 00:15:00', 'rce_pln': 1}], 'nextLink': 'page2'},
+             'page2': {'value': [{'dtime': '2025-01-01 00:30:00', 'rce_pln': 2}]}}
+
+    class FakeResponse:
+        status_code = 200
+        headers = {}
+
+        def __init__(self, body):
+            self.body = body
+            self.content = json.dumps(body).encode()
+
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return self.body
+
+    class FakeSession:
+        def get(self, url, **kw):
+            return FakeResponse(pages['page2' if url == 'page2' else None])
+
+    metrics.enable(str(tmp_path / 'metrics.jsonl'))
+    try:
+        items = update_rce.fetch_range(date(2025, 1, 1), date(2025, 1, 2), session=FakeSession())
+    finally:
+        metrics.disable()
+
+    events = [json.loads(line) for line in (tmp_path / 'metrics.jsonl').read_text().splitlines()]
+    assert len(items) == 2
+    assert [e['page'] for e in events if e['event'] == 'http'] == [1, 2]
+    assert all(e['bytes'] > 0 and e['status'] == 200 for e in events if e['event'] == 'http')
+    assert events[-1]['event'] == 'http_range' and events[-1]['pages'] == 2
+
+
+def test_items_to_columns_matches_item_to_kv_and_merges_sorted():
+    items = [{'dtime': '2024-10-27 01:45:00', 'rce_pln': 120.5},
+             {'dtime': '2024-10-27 02a:15:00', 'rce_pln': -35.1234567},
+             {'dtime': '2024-10-27 02b:15:00', 'rce_pln': 80},
+             {'dtime': '2024-10-27 02b:15:00', 'rce_pln': 99},
+             {'dtime': '2024-10-27T03:00:00', 'rce_pln': 0}]
+    keys, prices, raw = update_rce.items_to_columns(items)
+    expected = {}
+    for it in items:
+        k, v = update_rce.item_to_kv(it)
+        expected.setdefault(k, round(v, 6))
+    assert update_rce.first_wins(keys, prices) == expected
+    assert '2024-10-27T02:15:00+01:00' in keys and expected['2024-10-27T02:15:00+01:00'] == 0.08
+    assert update_rce.negative_prices(items) == {'2024-10-27T02:15:00': -0.035123, '2024-10-27T03:00:00': 0.0}
+    # an unusual dtime sends the whole batch through parse_dtime()
+    odd = update_rce.items_to_columns(items + [{'dtime': '2024-10-27 04:00:00.000', 'rce_pln': 1}])[0]
+    assert odd == keys + ['2024-10-27T04:00:00']
+
+    existing = {'2024-10-27T01:30:00': 0.1, '2024-10-27T01:45:00': 0.2}
+    merged, added = update_rce.merge_sorted(existing, update_rce.first_wins(keys, prices))
+    assert added == 3 and merged['2024-10-27T01:45:00'] == 0.2
+    assert list(merged) == sorted(merged)
+    earlier = {'2024-10-27T01:15:00': 0.3, '2024-10-27T03:15:00': 0.4}
+    merged, added = update_rce.merge_sorted(merged, earlier)
+    assert added == 2 and list(merged) == sorted(merged)
+    # a daily run only appends past the last key, in place
+    later = {'2024-10-27T03:30:00': 0.5, '2024-10-27T03:15:00': 0.9}
+    appended, added = update_rce.merge_sorted(merged, later)
+    assert appended is merged and added == 1 and list(merged)[-2:] == ['2024-10-27T03:15:00', '2024-10-27T03:30:00']
@@ -26,3 +26,27 @@ def test_parse_html_prefers_correction_when_later():
     assert jan == 480.01
     # february has correction with later date -> should prefer 440.0
     assert feb == 440.0
+
+
+def test_parse_archive_resolves_corrections_across_snapshots(tmp_path):
+    from update_rcem import parse_archive
+
+    (tmp_path / '2025-04.html').write_text(SAMPLE_HTML, encoding='utf-8')
+    later = SAMPLE_HTML.replace('<td>-</td><td>-</td>', '<td>475,50</td><td>12.05.2025</td>')
+    (tmp_path / 'snap').mkdir()
+    (tmp_path / 'snap' / '2025-05.html').write_text(later, encoding='utf-8')
+    # an older snapshot without february's correction must not override it
+    older = SAMPLE_HTML.replace('<tr><td>skorygowana RCEm*</td><td>440,00</td><td>11.04.2025</td></tr>', '')
+    (tmp_path / '2025-03.htm').write_text(older, encoding='utf-8')
+
+    data, files = parse_archive(tmp_path, workers=2)
+    assert files == 3
+    assert data == {'2025': {'1': 475.5, '2': 440.0}}
+
+
+def test_corrections_published_on_the_same_day_keep_the_higher_value():
+    same_day = SAMPLE_HTML.replace(
+        '<tr><td>skorygowana RCEm*</td><td>440,00</td><td>11.04.2025</td></tr>',
+        '<tr><td>skorygowana RCEm*</td><td>445,00</td><td>11.04.2025</td></tr>'
+        '<tr><td>skorygowana RCEm*</td><td>440,00</td><td>11.04.2025</td></tr>')
+    assert parse_html(same_day)['2025']['2'] == 445.0
@@ -12,19 +12,85 @@ Output format (rce.json):
 }
 
 Prices are stored in PLN/kWh (converted from zł/MWh by dividing by 1000).
-Negative prices are clamped to 0.
+Negative prices are clamped to 0; the raw values of all slots stored as 0 are kept in
+`rce_negative.json` ({iso: price}, updated by every fetch) for settlement scenarios
+without clamping, so a 0 without an entry there means the raw price was never fetched.
+`--negative-backfill` refetches a range and writes only that file, for history fetched
+before it existed. Keys are naive Polish wall-clock time, except the
+second pass of the repeated hour when DST ends ('02b' in the API), which carries an
+explicit offset, e.g. "2024-10-27T02:15:00+01:00".
+
+Fetched items are converted in bulk (`items_to_columns()`: key, price and raw price
+columns, the keys of a whole batch parsed from the joined `dtime` text) and merged
+into the sorted series with one ordered merge (`merge_sorted()`), which appends in
+place when the new keys all follow the stored ones.
+
+Every save also writes `rce.bin`, the same series as a fixed-stride binary array
+(see rce_bin.py) that consumers can memory-map instead of parsing the JSON, and
+precomputed mean levels: hourly `rce_h.bin`, daily `rce_d.bin` and monthly
+`rce_monthly.json` ({"YYYY-MM": mean}). Buckets are the floor of the key timestamp,
+the same as pandas `resample()` over the 15-minute series that MagazynCen.ceny_15min()
+returns, so the second-pass keys of the repeated hour (with an offset) are left out.
+
+Each save also publishes the series as monthly shards for the web page: `rce/YYYY-MM.json`
+holds the keys of one month of business days (the 00:00 key closes the previous day)
+and `rce/manifest.json` lists every shard with its SHA-256, coverage and entry count.
+Only shards whose content changed are rewritten.
+
+With `--journal` new entries are appended to `rce_journal.jsonl` (one `[iso, price]`
+array per line) and to `rce.bin` without loading the history; the last known
+timestamp is read from the file tails. `--compact` folds the journal back into a
+sorted `rce.json`. `load_existing()` always includes journal entries. Aggregate
+levels and shards are rebuilt on compaction; until then readers aggregate the journal tail.
 """
 from __future__ import annotations
-import requests
+import hashlib
 import json
-from datetime import datetime, date, timedelta
+import re
+from datetime import datetime, date, time as dtime_of_day, timedelta
 from pathlib import Path
+from zoneinfo import ZoneInfo
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import chain
+
+import http_client
+import metrics
+import rce_bin
+from lazy_imports import lazy_import
+
+requests = lazy_import('requests')
 
 API_BASE = 'https://api.raporty.pse.pl/api/rce-pln'
 OUT_FILE = Path(__file__).parent / 'rce.json'
+BIN_FILE = Path(__file__).parent / 'rce.bin'
+JOURNAL_FILE = Path(__file__).parent / 'rce_journal.jsonl'
+# precomputed aggregate levels: level -> (file, slot length in seconds)
+LEVEL_FILES = {
+    'h': (Path(__file__).parent / 'rce_h.bin', 3600),
+    'D': (Path(__file__).parent / 'rce_d.bin', 86400),
+}
+MONTHLY_FILE = Path(__file__).parent / 'rce_monthly.json'
+CHANGES_FILE = Path(__file__).parent / 'rce_changes.txt'
+SHARD_DIR = Path(__file__).parent / 'rce'
+# raw (unclamped) PLN/kWh of the slots stored as 0, i.e. published at or below zero: {iso: price}
+NEGATIVE_FILE = Path(__file__).parent / 'rce_negative.json'
+MANIFEST_NAME = 'manifest.json'
 
 DEFAULT_START = date(2024, 7, 1)
+TIMEOUT = http_client.TIMEOUT  # (connect, read) seconds per HTTP request
+
+# Concurrent backfill settings: worker threads over date chunks, a shared
+# per-host request rate and exponential backoff between retries of a chunk.
+# This is the only retry layer: pages are requested with http_client retries
+# off, so every attempt waits for the rate limiter and a failing page costs at
+# most RETRIES + 1 requests.
+WORKERS = 4
+RATE_LIMIT = 5.0  # requests per second to API_BASE, shared by all workers
+RETRIES = 4
+BACKOFF = 1.0  # seconds, doubled after every failed attempt
 
 
 def iso(dt: datetime) -> str:
@@ -32,47 +98,461 @@ def iso(dt: datetime) -> str:
 
 
 def load_existing() -> dict:
+    data = {}
     if OUT_FILE.exists():
         try:
-            return json.loads(OUT_FILE.read_text())
+            data = json.loads(OUT_FILE.read_text())
         except Exception:
-            return {}
-    return {}
+            data = {}
+    for k, v in read_journal():
+        data.setdefault(k, v)
+    return data
+
+
+def read_journal(path: Path | None = None) -> list:
+    """Return journal entries as [(iso, price)] in append order (skips a torn last line)."""
+    path = path or JOURNAL_FILE
+    if not path.exists():
+        return []
+    entries = []
+    with path.open(encoding='utf-8') as fh:
+        for line in fh:
+            try:
+                k, v = json.loads(line)
+            except ValueError:
+                continue
+            entries.append((k, v))
+    return entries
+
+
+def append_journal(entries: list, path: Path | None = None):
+    path = path or JOURNAL_FILE
+    with path.open('a', encoding='utf-8') as fh:
+        for k, v in entries:
+            fh.write(json.dumps([k, v]) + '\n')
+
+
+def _read_tail(path: Path, size: int = 4096) -> str:
+    with path.open('rb') as fh:
+        fh.seek(0, 2)
+        fh.seek(max(0, fh.tell() - size))
+        return fh.read().decode('utf-8', errors='ignore')
+
+
+_KEY_RE = re.compile(r'"(\d{4}-\d{2}-\d{2}T[^"]+)"\s*:')
+
+
+def last_key() -> str | None:
+    """Latest stored timestamp, read from the end of the journal or of rce.json in O(1).
+
+    Relies on rce.json being sorted, which save() and compact() guarantee.
+    """
+    if JOURNAL_FILE.exists():
+        for line in reversed(_read_tail(JOURNAL_FILE).splitlines()):
+            try:
+                return json.loads(line)[0]
+            except (ValueError, IndexError):
+                continue
+    if OUT_FILE.exists():
+        keys = _KEY_RE.findall(_read_tail(OUT_FILE))
+        if keys:
+            return keys[-1]
+    return None
+
+
+def compact():
+    """Rebuild the canonical sorted rce.json (and rce.bin) from rce.json plus the journal."""
+    data = load_existing()
+    journal = read_journal()
+    save({k: data[k] for k in sorted(data)})
+    if JOURNAL_FILE.exists():
+        JOURNAL_FILE.unlink()
+    print(f'Compacted {len(journal)} journal entries into {OUT_FILE.name} ({len(data)} entries)')
 
 
 def save(data: dict):
     tmp = OUT_FILE.with_suffix('.tmp.json')
     tmp.write_text(json.dumps(data, indent=2, ensure_ascii=False))
     tmp.replace(OUT_FILE)
+    rce_bin.write(data, BIN_FILE)
+    save_aggregates(data)
+    save_shards(data)
+
+
+# key prefix length that identifies a bucket, and the suffix completing it to an ISO key
+_BUCKETS = {'h': (13, ':00:00'), 'D': (10, 'T00:00:00'), 'M': (7, '')}
+
+
+def aggregate(data: dict, level: str) -> dict:
+    """Mean price per bucket ('h', 'D' or 'M') of the 15-minute `{iso: price}` series.
+
+    Keys with an offset (second pass of the repeated hour) are skipped, as in the
+    naive local series the resample() fallback averages.
+    """
+    width, suffix = _BUCKETS[level]
+    sums, counts = {}, {}
+    for k, v in data.items():
+        if len(k) != 19:
+            continue
+        b = k[:width] + suffix
+        sums[b] = sums.get(b, 0.0) + v
+        counts[b] = counts.get(b, 0) + 1
+    return {b: sums[b] / counts[b] for b in sorted(sums)}
+
 
+def save_aggregates(data: dict):
+    """Write the hourly/daily binary levels and the monthly JSON derived from `data`."""
+    for level, (path, slot_seconds) in LEVEL_FILES.items():
+        rce_bin.write(aggregate(data, level), path, slot_seconds=slot_seconds)
+    tmp = MONTHLY_FILE.with_suffix('.tmp.json')
+    monthly = {m: round(v, 6) for m, v in aggregate(data, 'M').items()}
+    tmp.write_text(json.dumps(monthly, indent=2))
+    tmp.replace(MONTHLY_FILE)
 
-def fetch_range(start: date, end: date) -> list:
+
+def business_day(key: str) -> str:
+    """ISO date of the business day a key belongs to (the 00:00 key closes the previous day)."""
+    if key[11:19] == '00:00:00':
+        return (date.fromisoformat(key[:10]) - timedelta(days=1)).isoformat()
+    return key[:10]
+
+
+def shard_month(key: str) -> str:
+    return business_day(key)[:7]
+
+
+def save_shards(data: dict) -> int:
+    """Write per-month shards of `data` and their manifest; returns the number of shards written.
+
+    Shard bodies are serialized deterministically, so an unchanged month keeps its hash
+    and its file is left untouched.
+    """
+    months = {}
+    for k in sorted(data):
+        months.setdefault(shard_month(k), {})[k] = data[k]
+    manifest_path = SHARD_DIR / MANIFEST_NAME
+    old = {}
+    if manifest_path.exists():
+        try:
+            old = json.loads(manifest_path.read_text()).get('shards', {})
+        except Exception:
+            old = {}
+    SHARD_DIR.mkdir(parents=True, exist_ok=True)
+    shards, written = {}, 0
+    for month, entries in months.items():
+        body = json.dumps(entries, separators=(',', ':')).encode()
+        digest = hashlib.sha256(body).hexdigest()
+        path = SHARD_DIR / f'{month}.json'
+        if old.get(month, {}).get('sha256') != digest or not path.exists():
+            path.write_bytes(body)
+            written += 1
+        keys = list(entries)
+        shards[month] = {'file': path.name, 'sha256': digest, 'bytes': len(body), 'count': len(keys),
+                         'from': business_day(keys[0]), 'to': business_day(keys[-1]),
+                         'first': keys[0], 'last': keys[-1]}
+    for month in old.keys() - shards.keys():
+        (SHARD_DIR / f'{month}.json').unlink(missing_ok=True)
+    tmp = manifest_path.with_suffix('.tmp.json')
+    tmp.write_text(json.dumps({'version': 1, 'shards': shards}, indent=2))
+    tmp.replace(manifest_path)
+    return written
+
+
+class RateLimiter:
+    """Thread-safe limiter spacing request starts at least 1/rate seconds apart."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next = 0.0
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+def make_session(pool_size: int = WORKERS) -> requests.Session:
+    """Session with a keep-alive connection pool large enough for all workers."""
+    return http_client.new_session(pool_size, {'Accept': 'application/json'})
+
+
+def fetch_range(start: date, end: date, session: requests.Session | None = None,
+                limiter: RateLimiter | None = None) -> list:
     # fetch business_date ge start and lt end (end exclusive)
     fmt = lambda d: d.isoformat()
     url = f"{API_BASE}?$filter=business_date ge '{fmt(start)}' and business_date lt '{fmt(end)}'"
     all_items = []
+    pages = 0
+    started = time.perf_counter()
     while url:
-        resp = requests.get(url, headers={'Accept': 'application/json'})
+        if limiter is not None:
+            limiter.wait()
+        pages += 1
+        resp = http_client.get(url, {'Accept': 'application/json'}, session=session, timeout=TIMEOUT, retries=0,
+                               page=pages)
         resp.raise_for_status()
         j = resp.json()
         if j.get('value'):
             all_items.extend(j['value'])
         url = j.get('nextLink')
+    metrics.emit('http_range', start=start, end=end, pages=pages, items=len(all_items),
+                 seconds=round(time.perf_counter() - started, 6))
     return all_items
 
 
-def item_to_kv(item):
-    # Convert item to (iso, price_pln_kwh)
-    dtime = item.get('dtime', '')
-    # remove trailing letters like 'a'/'b'
+def fetch_range_with_retry(start: date, end: date, session: requests.Session | None = None,
+                           limiter: RateLimiter | None = None, retries: int = RETRIES,
+                           backoff: float = BACKOFF) -> tuple[list, int]:
+    """fetch_range() retried with exponential backoff; returns (items, attempts used).
+
+    The last error is re-raised once all attempts are exhausted.
+    """
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            return fetch_range(start, end, session, limiter), attempt
+        except (requests.exceptions.RequestException, ValueError) as exc:
+            metrics.emit('http_retry', start=start, end=end, attempt=attempt, error=repr(exc),
+                         final=attempt > retries)
+            if attempt > retries:
+                raise
+            time.sleep(backoff * 2 ** (attempt - 1))
+
+
+def fetch_chunks(chunks: list, workers: int = WORKERS, rate: float = RATE_LIMIT,
+                 retries: int = RETRIES, backoff: float = BACKOFF):
+    """Fetch date chunks concurrently over one pooled session.
+
+    Returns (results, summary): `results` is a list of (start, end, items) in chunk
+    order, `summary` has 'retried' [(start, end, attempts)] and 'failed'
+    [(start, end, error)] entries.
+    """
+    session = make_session(workers)
+    limiter = RateLimiter(rate)
+    results = {}
+    summary = {'retried': [], 'failed': []}
+    try:
+        with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+            futures = {
+                pool.submit(fetch_range_with_retry, s, e, session, limiter, retries, backoff): (s, e)
+                for s, e in chunks
+            }
+            for fut in as_completed(futures):
+                s, e = futures[fut]
+                try:
+                    items, attempts = fut.result()
+                except Exception as exc:
+                    summary['failed'].append((s, e, exc))
+                    continue
+                if attempts > 1:
+                    summary['retried'].append((s, e, attempts))
+                results[(s, e)] = items
+    finally:
+        session.close()
+    ordered = [(s, e, results[(s, e)]) for s, e in chunks if (s, e) in results]
+    summary['retried'].sort()
+    summary['failed'].sort(key=lambda f: f[0])
+    return ordered, summary
+
+
+def print_summary(summary: dict):
+    for s, e, attempts in summary['retried']:
+        print(f'Retried {s}..{e}: succeeded after {attempts} attempts')
+    for s, e, exc in summary['failed']:
+        print(f'Failed {s}..{e}: {exc}', file=sys.stderr)
+    if summary['failed']:
+        print(f"{len(summary['failed'])} range(s) failed; run with --repair to fill the holes.",
+              file=sys.stderr)
+
+
+# On the night DST ends PSE labels the repeated hour '02a' (first pass, CEST) and
+# '02b' (second pass, CET). The first pass keeps the plain wall-clock key used for
+# every other slot; the second pass gets an explicit offset so both stay distinct.
+REPEATED_HOUR_OFFSET = '+01:00'
+
+
+def parse_dtime(dtime: str) -> tuple[datetime, bool]:
+    """Return (naive wall-clock datetime, is_second_pass) for an API `dtime` string."""
+    second = 'b' in dtime
     dtime = dtime.replace('a', '').replace('b', '')
     try:
         dt = datetime.fromisoformat(dtime)
     except Exception:
         # try space-separated
         dt = datetime.strptime(dtime, '%Y-%m-%d %H:%M:%S')
+    return dt, second
+
+
+def item_to_kv(item):
+    # Convert item to (iso, price_pln_kwh)
+    dt, second = parse_dtime(item.get('dtime', ''))
     price = max(0, item.get('rce_pln', 0) / 1000.0)
-    return iso(dt), price
+    key = iso(dt) + (REPEATED_HOUR_OFFSET if second else '')
+    return key, price
+
+
+# Bulk conversion of a batch of API items: the `dtime` strings of all items are joined
+# into one text, rewritten to keys with str.replace() (second pass of the repeated hour
+# by a regex, it occurs a few times a year) and validated by one anchored regex, so no
+# datetime objects are built per item.
+_SECOND_PASS_RE = re.compile(r'^(\d{4}-\d{2}-\d{2}[ T]\d{2})b:(\d{2}:\d{2})$', re.M)
+_KEY = r'\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}(?:' + re.escape(REPEATED_HOUR_OFFSET) + ')?'
+_KEYS_RE = re.compile(rf'(?:{_KEY}\n)*{_KEY}')
+
+
+def items_to_columns(items) -> tuple[list, list, list]:
+    """Columns (keys, prices, raw) of API items, in item order.
+
+    `keys` and `prices` are what item_to_kv() returns, with prices rounded to 6 places
+    as stored; `raw` is the unclamped PLN/kWh. If any `dtime` in the batch has another
+    format, the whole batch falls back to parse_dtime() per item.
+    """
+    items = items if isinstance(items, list) else list(items)
+    if not items:
+        return [], [], []
+    raw = [it.get('rce_pln', 0) / 1000.0 for it in items]
+    prices = [round(max(0, v), 6) for v in raw]
+    text = '\n'.join([it.get('dtime', '') for it in items])
+    if 'b:' in text:
+        text = _SECOND_PASS_RE.sub(rf'\1:\2{REPEATED_HOUR_OFFSET}', text)
+    text = text.replace('a:', ':').replace(' ', 'T')
+    keys = text.split('\n')
+    if len(keys) != len(items) or not _KEYS_RE.fullmatch(text):
+        keys = [k for k, _ in map(item_to_kv, items)]
+    return keys, prices, raw
+
+
+def first_wins(keys: list, values: list) -> dict:
+    """{key: value} keeping the first value of repeated keys (as repeated setdefault() would)."""
+    last_wins_reversed = dict(zip(reversed(keys), reversed(values)))
+    return dict(reversed(last_wins_reversed.items()))
+
+
+def merge_sorted(existing: dict, new: dict) -> tuple[dict, int]:
+    """Add the keys of `new` missing from `existing`; returns (merged dict in key order, added).
+
+    `existing` must be in key order, as load_existing() returns it and save() writes it.
+    Existing values win. When every added key is past the last existing key (a daily
+    run), the keys are appended to `existing` in place, touching only the new entries.
+    Otherwise the two sorted runs are merged (sorted() merges presorted runs in linear
+    time) into a new dict.
+    """
+    added = sorted(set(new).difference(existing))
+    if not added:
+        return existing, 0
+    last = next(reversed(existing), None)
+    if last is None or added[0] > last:
+        existing.update((k, new[k]) for k in added)
+        return existing, len(added)
+    values = {**new, **existing}
+    return {k: values[k] for k in sorted(chain(existing, added))}, len(added)
+
+
+SLOT = timedelta(minutes=15)
+SLOTS_PER_DAY = 96
+ZONE = ZoneInfo('Europe/Warsaw')
+# on the day DST starts PSE publishes 92 slots; depending on the year the gap in the
+# wall-clock labels is 02:15..03:00 or 02:00..02:45, so none of 02:00..03:00 is required
+_SKIPPED_HOUR = range(7, 12)
+
+
+def dst_change(day: date) -> int:
+    """+1 on the day DST starts, -1 on the day it ends, 0 otherwise."""
+    before = datetime.combine(day, dtime_of_day(0), ZONE).utcoffset()
+    after = datetime.combine(day, dtime_of_day(12), ZONE).utcoffset()
+    return (after > before) - (after < before)
+
+
+class Coverage:
+    """Bitmap of the 15-minute slots present for business days [start, end).
+
+    Bit `i` is the wall-clock key `start 00:15 + i * 15 min`, the grid of rce.bin, so
+    every business day is exactly 12 bytes. A day is complete when all of its slots
+    that exist are set and, on the day DST ends, at least one second-pass key (with
+    an explicit offset) is known.
+    """
+
+    def __init__(self, start: date, end: date, keys):
+        self.start, self.end = start, end
+        self.days = max((end - start).days, 0)
+        self.bits = bytearray(self.days * SLOTS_PER_DAY // 8)
+        self.second_pass = set()
+        base = datetime.combine(start, dtime_of_day(0)) + SLOT
+        for k in keys:
+            if len(k) > 19:
+                self.second_pass.add(business_day(k))
+                continue
+            i = (datetime.fromisoformat(k) - base) // SLOT
+            if 0 <= i < len(self.bits) * 8:
+                self.bits[i >> 3] |= 1 << (i & 7)
+
+    def _expected(self, day: date) -> bytes:
+        mask = bytearray(b'\xff' * (SLOTS_PER_DAY // 8))
+        if dst_change(day) > 0:
+            for i in _SKIPPED_HOUR:
+                mask[i >> 3] &= ~(1 << (i & 7))
+        return bytes(mask)
+
+    def missing_slots(self, day: date) -> int:
+        """Number of existing wall-clock slots of `day` with no price."""
+        j = (day - self.start).days * SLOTS_PER_DAY // 8
+        have = self.bits[j:j + SLOTS_PER_DAY // 8]
+        return sum(bin(m & ~h & 0xff).count('1') for m, h in zip(self._expected(day), have))
+
+    def missing_days(self) -> list:
+        """Business days with at least one missing slot, in order."""
+        out = []
+        for n in range(self.days):
+            day = self.start + timedelta(days=n)
+            if self.missing_slots(day) or (dst_change(day) < 0 and day.isoformat() not in self.second_pass):
+                out.append(day)
+        return out
+
+
+def plan_refetch(days: list, bridge: int = 1, max_days: int = 30) -> list:
+    """Merge missing business days into the fewest `[start, end)` request ranges.
+
+    Runs separated by at most `bridge` complete days are joined (refetching a known
+    day costs about one page, the same as starting another request); ranges are
+    capped at `max_days` so they can still be fetched concurrently.
+    """
+    ranges = []
+    for day in sorted(set(days)):
+        if ranges and (day - ranges[-1][1]).days <= bridge and (day - ranges[-1][0]).days < max_days:
+            ranges[-1][1] = day + timedelta(days=1)
+        else:
+            ranges.append([day, day + timedelta(days=1)])
+    return [tuple(r) for r in ranges]
+
+
+def negative_prices(items=None, columns: tuple | None = None) -> dict:
+    """{key: raw PLN/kWh} for the items stored as 0, i.e. published with a price <= 0.
+
+    Zero prices are recorded too, so that every 0 in rce.json with an entry here has
+    a known raw value. Pass `columns` from items_to_columns() instead of `items` to
+    avoid converting twice.
+    """
+    keys, prices, raw = columns if columns is not None else items_to_columns(items)
+    return {k: round(v, 6) for k, p, v in zip(keys, prices, raw) if p == 0}
+
+
+def save_negative(new: dict) -> int:
+    """Merge raw negative prices into NEGATIVE_FILE; returns the number of new or changed keys."""
+    old = json.loads(NEGATIVE_FILE.read_text()) if NEGATIVE_FILE.exists() else {}
+    changed = sum(1 for k, v in new.items() if old.get(k) != v)
+    if changed:
+        old.update(new)
+        tmp = NEGATIVE_FILE.with_suffix('.tmp.json')
+        tmp.write_text(json.dumps({k: old[k] for k in sorted(old)}, indent=2))
+        tmp.replace(NEGATIVE_FILE)
+    return changed
 
 
 def daterange_chunks(start: date, end: date, chunk_days=30):
@@ -83,19 +563,133 @@ def daterange_chunks(start: date, end: date, chunk_days=30):
         cur = nxt
 
 
-def main(start_date: date | None = None, end_date: date | None = None):
+def write_changelog(added: int):
+    # use timezone-aware UTC timestamp
+    from datetime import timezone
+    CHANGES_FILE.write_text(f'Appended {added} entries on {datetime.now(timezone.utc).isoformat()}\n')
+
+
+def main_journal(start_date: date | None = None, end_date: date | None = None, workers: int = WORKERS,
+                 rate: float = RATE_LIMIT):
+    """Append-only update: never loads the history, only entries newer than last_key()."""
+    last = last_key()
+    if start_date is None:
+        start_date = datetime.fromisoformat(last[:19]).date() if last else DEFAULT_START
+    if start_date < DEFAULT_START:
+        start_date = DEFAULT_START
+    if end_date is None:
+        end_date = date.today()
+
+    chunks = list(daterange_chunks(start_date, end_date, chunk_days=30))
+    results, summary = fetch_chunks(chunks, workers=workers, rate=rate)
+    columns = items_to_columns([it for _, _, items in results for it in items])
+    save_negative(negative_prices(columns=columns))
+    keys, prices, _ = columns
+    if last is not None:
+        keys, prices = [k for k in keys if k > last], [p for k, p in zip(keys, prices) if k > last]
+    new = first_wins(keys, prices)
+
+    if new:
+        entries = sorted(new.items())
+        append_journal(entries)
+        if BIN_FILE.exists():
+            rce_bin.append(new, BIN_FILE)
+        print(f'Appended {len(entries)} entries to {JOURNAL_FILE.name}')
+        write_changelog(len(entries))
+    else:
+        print('No new hourly entries to append.')
+    print_summary(summary)
+    return summary
+
+
+def main_repair(start_date: date | None = None, end_date: date | None = None, workers: int = WORKERS,
+                rate: float = RATE_LIMIT, bridge: int = 1):
+    """Fetch only the business days missing inside [start_date, end_date) and save them.
+
+    Defaults to the span between the first and the last known business day.
+    """
     existing = load_existing()
+    if not existing:
+        print('No data to repair; run a normal update first.')
+        return {'retried': [], 'failed': []}
+    keys = sorted(existing)
+    if start_date is None:
+        start_date = date.fromisoformat(business_day(keys[0]))
+    if end_date is None:
+        end_date = date.fromisoformat(business_day(keys[-1])) + timedelta(days=1)
+
+    days = Coverage(start_date, end_date, keys).missing_days()
+    ranges = plan_refetch(days, bridge=bridge)
+    print(f'{len(days)} incomplete business day(s) between {start_date} and {end_date}, '
+          f'{len(ranges)} request range(s)')
+    for s, e in ranges:
+        print(f'  {s}..{e}')
+    if not ranges:
+        return {'retried': [], 'failed': []}
+
+    results, summary = fetch_chunks(ranges, workers=workers, rate=rate)
+    columns = items_to_columns([it for _, _, items in results for it in items])
+    save_negative(negative_prices(columns=columns))
+    existing, added = merge_sorted(existing, first_wins(*columns[:2]))
+    if added:
+        save(existing)
+        if JOURNAL_FILE.exists():
+            JOURNAL_FILE.unlink()
+        print(f'Filled {added} missing entries in {OUT_FILE.name}')
+        write_changelog(added)
+    left = Coverage(start_date, end_date, existing).missing_days()
+    if left:
+        print(f'{len(left)} business day(s) still incomplete (not published by PSE?): '
+              + ', '.join(d.isoformat() for d in left[:10]) + (' ...' if len(left) > 10 else ''))
+    print_summary(summary)
+    return summary
+
+
+def main_negative_backfill(start_date: date | None = None, end_date: date | None = None,
+                           workers: int = WORKERS, rate: float = RATE_LIMIT):
+    """Refetch [start_date, end_date) and write only the raw prices of zero slots to NEGATIVE_FILE.
+
+    Defaults to the span between the first and the last known business day; rce.json
+    and the files derived from it are left untouched.
+    """
+    if start_date is None or end_date is None:
+        keys = sorted(load_existing())
+        if not keys:
+            print('No data to backfill; run a normal update first.')
+            return {'retried': [], 'failed': []}
+        if start_date is None:
+            start_date = date.fromisoformat(business_day(keys[0]))
+        if end_date is None:
+            end_date = date.fromisoformat(business_day(keys[-1])) + timedelta(days=1)
+
+    chunks = list(daterange_chunks(start_date, end_date, chunk_days=30))
+    results, summary = fetch_chunks(chunks, workers=workers, rate=rate)
+    raw = negative_prices(columns=items_to_columns([it for _, _, items in results for it in items]))
+    changed = save_negative(raw)
+    print(f'{len(raw)} zero-price slot(s) between {start_date} and {end_date}, '
+          f'{changed} new or changed in {NEGATIVE_FILE.name}')
+    print_summary(summary)
+    return summary
+
+
+def main(start_date: date | None = None, end_date: date | None = None, workers: int = WORKERS,
+         rate: float = RATE_LIMIT):
+    with metrics.stage('load') as m:
+        existing = load_existing()
+        m['rows'] = len(existing)
     if start_date is None:
         # If we already have data, fetch incrementally from the last recorded day
         # to avoid re-downloading everything on every run. If rce.json is empty,
         # fall back to DEFAULT_START.
         if existing:
             try:
-                last_dt = max(datetime.fromisoformat(k) for k in existing.keys())
+                # compare the naive 'YYYY-MM-DDTHH:MM:SS' part only: DST second-pass keys
+                # carry '+01:00' and cannot be ordered against naive datetimes
+                last_dt = datetime.fromisoformat(max(k[:19] for k in existing))
                 # start from the date of the last known entry (will re-fetch that day but
                 # duplicates are skipped). This keeps a small overlap as safety.
                 start_date = last_dt.date()
-            except Exception:
+            except ValueError:
                 start_date = DEFAULT_START
         else:
             start_date = DEFAULT_START
@@ -107,39 +701,72 @@ def main(start_date: date | None = None, end_date: date | None = None):
 
     # If existing has entries, we can skip already present hours
     # We'll fetch in chunks from start_date to end_date but only insert keys not present
-    added = 0
-    for s, e in daterange_chunks(start_date, end_date, chunk_days=30):
-        try:
-            items = fetch_range(s, e)
-        except Exception as exc:
-            print(f'Error fetching {s}..{e}:', exc)
-            continue
-        for it in items:
-            k, v = item_to_kv(it)
-            if k not in existing:
-                existing[k] = round(v, 6)
-                added += 1
+    chunks = list(daterange_chunks(start_date, end_date, chunk_days=30))
+    with metrics.stage('fetch', start=start_date, end=end_date, chunks=len(chunks)) as m:
+        results, summary = fetch_chunks(chunks, workers=workers, rate=rate)
+        m['items'] = sum(len(items) for _, _, items in results)
+    with metrics.stage('merge') as m:
+        columns = items_to_columns([it for _, _, items in results for it in items])
+        save_negative(negative_prices(columns=columns))
+        merged, added = merge_sorted(existing, first_wins(*columns[:2]))
+        m['rows'] = added
 
-    # sort keys
     if added > 0:
-        sorted_obj = {k: existing[k] for k in sorted(existing.keys())}
-        save(sorted_obj)
+        with metrics.stage('save', rows=len(merged)):
+            save(merged)
+        # journal entries (if any) were loaded by load_existing() and are now in rce.json
+        if JOURNAL_FILE.exists():
+            JOURNAL_FILE.unlink()
         print(f'Appended {added} hourly entries to {OUT_FILE.name}')
         # write short changes log
-        changelog = Path(__file__).parent / 'rce_changes.txt'
-        # use timezone-aware UTC timestamp
-        from datetime import timezone
-        changelog.write_text(f'Appended {added} entries on {datetime.now(timezone.utc).isoformat()}\n')
+        write_changelog(added)
     else:
         print('No new hourly entries to append.')
+        if existing and not BIN_FILE.exists():
+            rce_bin.write(existing, BIN_FILE)
+            print(f'Wrote {BIN_FILE.name} from existing {OUT_FILE.name}')
+        if existing and not all(path.exists() for path, _ in LEVEL_FILES.values()):
+            save_aggregates(existing)
+            print(f'Wrote aggregate levels from existing {OUT_FILE.name}')
+        if existing and not (SHARD_DIR / MANIFEST_NAME).exists():
+            save_shards(existing)
+            print(f'Wrote monthly shards from existing {OUT_FILE.name}')
+    print_summary(summary)
+    return summary
 
 
 if __name__ == '__main__':
-    # optional args: start_date end_date in YYYY-MM-DD
-    sd = None
-    ed = None
-    if len(sys.argv) >= 2:
-        sd = datetime.strptime(sys.argv[1], '%Y-%m-%d').date()
-    if len(sys.argv) >= 3:
-        ed = datetime.strptime(sys.argv[2], '%Y-%m-%d').date()
-    main(sd, ed)
+    import argparse
+
+    parse_day = lambda v: datetime.strptime(v, '%Y-%m-%d').date()
+    parser = argparse.ArgumentParser(description='Fetch RCE prices from PSE into rce.json.')
+    parser.add_argument('start_date', nargs='?', type=parse_day, help='YYYY-MM-DD (default: last known day)')
+    parser.add_argument('end_date', nargs='?', type=parse_day, help='YYYY-MM-DD, exclusive (default: today)')
+    parser.add_argument('--workers', type=int, default=WORKERS, help='concurrent chunk downloads (1 = serial)')
+    parser.add_argument('--rate', type=float, default=RATE_LIMIT, help='max requests per second to PSE')
+    parser.add_argument('--journal', action='store_true',
+                        help=f'append new entries to {JOURNAL_FILE.name} without rewriting {OUT_FILE.name}')
+    parser.add_argument('--compact', action='store_true',
+                        help=f'fold {JOURNAL_FILE.name} into a sorted {OUT_FILE.name} and exit')
+    parser.add_argument('--repair', action='store_true',
+                        help='refetch only the business days with missing slots (default: whole known span)')
+    parser.add_argument('--negative-backfill', action='store_true',
+                        help=f'refetch the range (default: whole known span) and update only {NEGATIVE_FILE.name}')
+    parser.add_argument('--bridge', type=int, default=1,
+                        help='with --repair, join holes separated by at most this many complete days')
+    parser.add_argument('--metrics', metavar='FILE', help="write stage and HTTP metrics as JSON lines ('-' = stderr)")
+    parser.add_argument('--profile', metavar='FILE', help='dump cProfile stats of the run to FILE')
+    args = parser.parse_args()
+    if args.metrics:
+        metrics.enable(args.metrics)
+    with metrics.profile(args.profile):
+        if args.compact:
+            compact()
+        elif args.negative_backfill:
+            main_negative_backfill(args.start_date, args.end_date, workers=args.workers, rate=args.rate)
+        elif args.repair:
+            main_repair(args.start_date, args.end_date, workers=args.workers, rate=args.rate, bridge=args.bridge)
+        elif args.journal:
+            main_journal(args.start_date, args.end_date, workers=args.workers, rate=args.rate)
+        else:
+            main(args.start_date, args.end_date, workers=args.workers, rate=args.rate)
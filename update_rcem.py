@@ -9,13 +9,21 @@ Scrapes RCEm table from PSE and writes `rcem.json` with structure:
 }
 
 Designed to run in GitHub Actions monthly. Commits only if file changed.
+
+`--archive DIR` rebuilds the history from saved snapshots of the page instead:
+every *.html file under DIR is parsed (in parallel), corrections are resolved by
+publication date across all of them and the result is merged into `rcem.json`.
 """
-import requests
-from bs4 import BeautifulSoup
 import re
+import io
 import json
+import os
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from datetime import datetime
+from datetime import date, datetime
+
+import http_client
+import metrics
 
 URL = 'https://www.pse.pl/oire/rcem-rynkowa-miesieczna-cena-energii-elektrycznej'
 OUT_FILE = Path(__file__).parent / 'rcem.json'
@@ -69,139 +77,169 @@ def parse_date(s):
 
 def scrape():
     headers = {'User-Agent': 'rcem-updater/1.0 (+https://github.com)'}
-    resp = requests.get(URL, headers=headers, timeout=15)
+    with metrics.stage('fetch', url=URL) as m:
+        resp = http_client.get(URL, headers)
+        m.update(status=resp.status_code, bytes=len(resp.content), cache=getattr(resp, 'from_cache', False))
     resp.raise_for_status()
 
-    return parse_html(resp.text)
+    with metrics.stage('parse') as m:
+        result = parse_html(resp.text)
+        m['rows'] = sum(len(v) for v in result.values())
+    return result
 
 
-def parse_html(html_text):
-    """Parse HTML and return dict like { '2025': { '1': 480.01, ... }, ... }
+# one alternation over all month spellings, longest first so 'stycznia' wins over shorter forms
+MONTH_RE = re.compile('|'.join(sorted(map(re.escape, MONTH_MAP), key=len, reverse=True)))
+YEAR_RE = re.compile(r'^\d{4}$')
 
-    Also uses publication dates to prefer corrected values only when correction
-    publication date is later than original RCEm publication.
+
+def _cell_texts(tr):
+    return [''.join(c.itertext()).strip() for c in tr if c.tag in ('td', 'th')]
+
+
+def iter_observations(source):
+    """Stream (year, month, kind, value, publication date) tuples from an RCEm page.
+
+    `source` is a path or a binary file object. Rows are parsed with lxml's iterparse
+    and discarded as soon as they are read, so memory does not grow with the page.
+    `kind` is 'rcem' for the row right after a month header and 'korekta' for the
+    'skorygowana RCEm' rows that follow it. Tables without a year in their first four
+    rows are skipped.
     """
-    soup = BeautifulSoup(html_text, 'lxml')
-    results = {}
+    from lxml import etree
 
-    tables = soup.find_all('table')
-    for table in tables:
-        rows = table.find_all('tr')
-        if not rows:
+    year = None
+    pending = []  # first rows of a table, kept until its year is known
+    skip = False
+    month = None
+    after_month = False
+    for event, el in etree.iterparse(source, events=('start', 'end'), tag=('table', 'tr'), html=True,
+                                     encoding='utf-8'):
+        if el.tag == 'table':
+            if event == 'start':
+                year, pending, skip, month, after_month = None, [], False, None, False
             continue
-        year = None
-        for r in rows[:4]:
-            for cell in r.find_all(['th', 'td']):
-                txt = cell.get_text(strip=True)
-                if re.match(r'^\d{4}$', txt):
-                    year = txt
-                    break
-            if year:
-                break
-        if not year:
+        if event != 'end':
             continue
-
-        i = 0
-        while i < len(rows):
-            tr = rows[i]
-            cols = [c.get_text(strip=True) for c in tr.find_all(['td', 'th'])]
+        cols = _cell_texts(el)
+        el.clear()
+        while el.getprevious() is not None:
+            del el.getparent()[0]
+        if skip:
+            continue
+        if year is None:
+            pending.append(cols)
+            year = next((c for c in cols if YEAR_RE.match(c)), None)
+            if year is None:
+                skip = len(pending) >= 4
+                continue
+            rows, pending = pending, []
+        else:
+            rows = [cols]
+        for cols in rows:
             if not cols:
-                i += 1
                 continue
             first = cols[0].lower()
-            month_found = None
-            for k in MONTH_MAP.keys():
-                if k in first:
-                    month_found = MONTH_MAP[k]
-                    break
-            if month_found:
-                # immediate next row should be RCEm (if present)
-                rcem_val = None
-                rcem_date = None
-                skoryg_list = []  # list of tuples (val, date)
-                next_idx = i + 1
-                if next_idx < len(rows):
-                    row_next = rows[next_idx]
-                    cells_next = [c.get_text(strip=True) for c in row_next.find_all(['td', 'th'])]
-                    if cells_next:
-                        lbl = cells_next[0].lower()
-                        if 'rcem' in lbl:
-                            if len(cells_next) > 1:
-                                rcem_val = text_to_number(cells_next[1])
-                            if len(cells_next) > 2:
-                                rcem_date = parse_date(cells_next[2])
-                    # collect following skorygowana rows until next month occurs
-                    m = next_idx + 1
-                    while m < len(rows):
-                        rowm = rows[m]
-                        cellsm = [c.get_text(strip=True) for c in rowm.find_all(['td', 'th'])]
-                        if not cellsm:
-                            m += 1
-                            continue
-                        first_cell = cellsm[0].lower()
-                        # stop on next month
-                        if any(k in first_cell for k in MONTH_MAP.keys()):
-                            break
-                        if 'skorygowana' in first_cell and 'rcem' in first_cell:
-                            val = None
-                            date = None
-                            if len(cellsm) > 1:
-                                val = text_to_number(cellsm[1])
-                            if len(cellsm) > 2:
-                                date = parse_date(cellsm[2])
-                            if val is not None:
-                                skoryg_list.append((val, date))
-                        m += 1
-
-                # decide which value to use
-                chosen = None
-                if skoryg_list:
-                    # prefer a correction whose date is later than base rcem_date
-                    # find corrections with date > rcem_date
-                    later_corr = []
-                    for val, date in skoryg_list:
-                        if date and rcem_date:
-                            if date > rcem_date:
-                                later_corr.append((date, val))
-                        elif date and not rcem_date:
-                            # no base date, accept correction
-                            later_corr.append((date, val))
-                        else:
-                            # no date info - keep as fallback
-                            later_corr.append((date, val))
-                    if later_corr:
-                        # choose correction with the latest date (or last if dates missing)
-                        later_corr.sort()
-                        chosen = later_corr[-1][1]
-                if chosen is None and rcem_val is not None:
-                    chosen = rcem_val
-
-                if chosen is not None:
-                    chosen = round(chosen, 2)
-                    results.setdefault(year, {})[str(month_found)] = chosen
-                i += 1
+            m = MONTH_RE.search(first)
+            if m:
+                month, after_month = MONTH_MAP[m.group(0)], True
                 continue
-            i += 1
+            if month is None:
+                continue
+            value = text_to_number(cols[1]) if len(cols) > 1 else None
+            published = parse_date(cols[2]) if len(cols) > 2 else None
+            if after_month and 'rcem' in first:
+                yield year, month, 'rcem', value, published
+            elif 'skorygowana' in first and 'rcem' in first and value is not None:
+                yield year, month, 'korekta', value, published
+            after_month = False
+
 
+def choose_value(base, base_date, corrections):
+    """Pick the published value: the latest correction issued after the base RCEm, else the base.
+
+    Corrections without a date, or any correction when the base has no date, are
+    accepted; among accepted ones the latest date wins, ties going to the higher value.
+    """
+    later = [(d or date.min, v) for v, d in corrections if not (d and base_date) or d > base_date]
+    if later:
+        return max(later)[1]
+    return base
+
+
+def resolve(observations):
+    """Merge observations (possibly from many snapshots) into {year: {month: value}}.
+
+    For each month the base RCEm with the latest publication date is kept and
+    corrections are deduplicated across snapshots before `choose_value()`.
+    """
+    months = {}
+    for year, month, kind, value, published in observations:
+        entry = months.setdefault((year, month), {'rcem': None, 'korekty': {}})
+        if kind == 'rcem':
+            if value is None:
+                continue
+            old = entry['rcem']
+            if old is None or (published or date.min) >= (old[1] or date.min):
+                entry['rcem'] = (value, published)
+        else:
+            entry['korekty'][(value, published)] = None
+    results = {}
+    for (year, month), entry in sorted(months.items(), key=lambda kv: (kv[0][0], kv[0][1])):
+        base, base_date = entry['rcem'] or (None, None)
+        chosen = choose_value(base, base_date, list(entry['korekty']))
+        if chosen is not None:
+            results.setdefault(year, {})[str(month)] = round(chosen, 2)
     return results
 
-def main():
-    print('Scraping RCEm from PSE...')
-    try:
-        new = scrape()
-    except Exception as e:
-        print('Error scraping:', e)
-        raise
 
-    if not new:
-        print('No data parsed from page.')
-        return 1
+def parse_html(html_text):
+    """Parse HTML and return dict like { '2025': { '1': 480.01, ... }, ... }
+
+    Also uses publication dates to prefer corrected values only when correction
+    publication date is later than original RCEm publication.
+    """
+    return resolve(iter_observations(io.BytesIO(html_text.encode('utf-8'))))
+
+
+def _file_observations(path):
+    return list(iter_observations(str(path)))
+
+
+def parse_archive(directory, workers=None):
+    """Parse every saved page (*.html, *.htm) under `directory` in parallel and merge them.
 
+    Corrections are resolved by publication date across all snapshots, so the
+    order in which the pages were saved does not matter.
+    """
+    paths = sorted(p for p in Path(directory).rglob('*') if p.suffix.lower() in ('.html', '.htm'))
+    if not paths:
+        return {}, 0
+    workers = min(workers or os.cpu_count() or 1, len(paths))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(_file_observations, paths, chunksize=max(1, len(paths) // (workers * 4))))
+    else:
+        parts = [_file_observations(p) for p in paths]
+    return resolve(o for part in parts for o in part), len(paths)
+
+
+def write_result(new, merge=False):
+    """Write `new` to rcem.json if it differs and log changed months; returns 0.
+
+    With `merge=True` months already in rcem.json but absent from `new` are kept.
+    """
     # If file exists, compare and update only if different
     if OUT_FILE.exists():
         old = json.loads(OUT_FILE.read_text(encoding='utf-8'))
     else:
         old = {}
+    if merge:
+        merged = {y: dict(v) for y, v in old.items()}
+        for y, months in new.items():
+            merged.setdefault(y, {}).update(months)
+        new = {y: dict(sorted(merged[y].items(), key=lambda kv: int(kv[0])))
+               for y in sorted(merged, reverse=True)}
 
     if old == new:
         print('No changes in RCEm data.')
@@ -229,5 +267,44 @@ def main():
         print(f'Wrote changes log to {CHANGES_FILE} ({len(changes)} items)')
     return 0
 
+
+def main_archive(directory, workers=None):
+    print(f'Parsing archived RCEm pages from {directory}...')
+    with metrics.stage('parse_archive', directory=str(directory)) as m:
+        new, files = parse_archive(directory, workers)
+        m.update(files=files, rows=sum(len(v) for v in new.values()))
+    if not new:
+        print('No data parsed from archive.')
+        return 1
+    print(f'Parsed {files} page(s), {sum(len(v) for v in new.values())} months')
+    return write_result(new, merge=True)
+
+
+def main():
+    print('Scraping RCEm from PSE...')
+    try:
+        new = scrape()
+    except Exception as e:
+        print('Error scraping:', e)
+        raise
+
+    if not new:
+        print('No data parsed from page.')
+        return 1
+    return write_result(new)
+
+
 if __name__ == '__main__':
-    raise SystemExit(main())
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Scrape RCEm from PSE into rcem.json.')
+    parser.add_argument('--archive', metavar='DIR', help='rebuild from saved HTML snapshots under DIR')
+    parser.add_argument('--workers', type=int, default=None, help='processes for --archive (default: CPU count)')
+    parser.add_argument('--metrics', metavar='FILE', help="write stage metrics as JSON lines ('-' = stderr)")
+    parser.add_argument('--profile', metavar='FILE', help='dump cProfile stats of the run to FILE')
+    args = parser.parse_args()
+    if args.metrics:
+        metrics.enable(args.metrics)
+    with metrics.profile(args.profile):
+        code = main_archive(args.archive, args.workers) if args.archive else main()
+    raise SystemExit(code)